@@ -1,11 +1,27 @@
-import socket
+import os
 import sys
-import numpy as np
-import time
+import queue
 import multiprocessing as mp
-from multiprocessing import shared_memory
+from multiprocessing import resource_tracker
 import csv
 
+# Shared project files live in the "Version 1.0" folder
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Version 1.0")
+
+sys.path.insert(0, PROJECT_DIR)
+from M_Supp_Loader import load_project_module
+
+protocol = load_project_module("[M][Com]Stream_Protocol.py")
+async_ingest = load_project_module("[M][Com]Async_Ingest.py")
+shared_ring = load_project_module("[M][Supp]Shared_Ring.py")
+rolling_stats = load_project_module("[M][Supp]Rolling_Stats.py")
+feature_pool = load_project_module("[M][Supp]Feature_Pool.py")
+clean_stage = load_project_module("[M][Supp]Clean_Stage.py")
+decimate_stage = load_project_module("[M][Supp]Decimate_Stage.py")
+feature_registry = load_project_module("[M][Supp]Feature_Registry.py")
+stage_supervisor = load_project_module("[M][Supp]Stage_Supervisor.py")
+core_layout = load_project_module("[M][Supp]Core_Layout.py")
+
 def write_average_to_csv(avg, file_name, csv_lock):
     """
     Writes the computed average (an array-like of two values) to a CSV file.
@@ -16,222 +32,268 @@ def write_average_to_csv(avg, file_name, csv_lock):
             writer.writerow(avg)
         print(f"[ProcAverage] Average written to {file_name}")
 
-def ReceiveProcess(host, port, stop_event, RawLock, DistributorLock, update_chunk, shm_shape, shm_name):
+def ProcSplit(stop_event, ring_name, doorbell=None, heartbeat=None):
     """
-    Connects to a TCP server, receives comma‐separated float data, collects a new update chunk,
-    and then updates shared memory by removing the oldest rows and appending the new ones.
+    Waits for a chunk to be published, then splits the new samples into one array per
+    channel, by the names the ring was created with. Work is proportional to the new
+    data. Beats heartbeat (when supervised) every pass.
+
+    The ring is channel-major, so each channel's new samples are read in place as
+    contiguous views instead of being copied out and split by column.
     """
-    shm_arry = shared_memory.SharedMemory(name=shm_name)
-    shm_np = np.ndarray(shm_shape, dtype=np.float64, buffer=shm_arry.buf)
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((host, port))
-    
-    temp_arry = []  # temporary storage until update_chunk rows are collected
-    print("Process 1: Receiving Data")
+    if heartbeat is not None:
+        heartbeat.watch(doorbell)
+    ring = shared_ring.SharedRing.attach(ring_name, doorbell)
+    reader = ring.reader()
+    print(f"Process 2: Splitting Data into {ring.channel_names}")
 
     try:
         while not stop_event.is_set():
-            # (Optionally block/wait for new data)
-            data = client_socket.recv(1024)
-            if not data:
-                break
-            rows = data.decode('utf-8').strip().split('\n')
-            for row in rows:
-                try:
-                    values = list(map(float, row.split(',')))
-                except ValueError as ve:
-                    print(f"Skipping row due to conversion error: {row}")
-                    continue
-                temp_arry.append(values)
-                if len(temp_arry) == update_chunk:
-                    # Always acquire locks in the same order: DistributorLock then RawLock.
-                    DistributorLock.acquire()
-                    print("P1 took DistributorLock")
-                    RawLock.acquire()
-                    print("P1 took RawLock")
-                    
-                    # Shift the rolling window:
-                    # Discard the oldest update_chunk rows
-                    shm_np[:-update_chunk] = shm_np[update_chunk:]
-                    # Append new data at the end of the buffer
-                    shm_np[-update_chunk:] = np.array(temp_arry)
-                    print("P1: Shared Memory Updated (rolled window)")
-                    
-                    # Release locks in reverse order.
-                    RawLock.release()
-                    print("P1 released RawLock")
-                    DistributorLock.release()
-                    print("P1 released DistributorLock")
-                    
-                    temp_arry = []
-    except socket.timeout:
-        print("Timeout occurred, no data received within the specified time.")
-    except Exception as e:
-        print(f"Process 1 produced the following error:\n\n{e}")
-    finally:
-        client_socket.close()
-
-def ProcSplit(stop_event, RawLock, DistributorLock, shm_shape, shm_name, buffer_length):
-    """
-    Reads the entire rolling window from shared memory and splits it into two arrays
-    while acquiring locks in a consistent order.
-    """
-    shm_arry = shared_memory.SharedMemory(name=shm_name)
-    shm_np = np.ndarray(shm_shape, dtype=np.float64, buffer=shm_arry.buf)
-    print("Process 2: Splitting Data")
+            if heartbeat is not None:
+                heartbeat.keep_up(reader)
+            # Sleep until Process 1 publishes (the timeout re-checks stop_event)
+            if not reader.wait(timeout=0.5):
+                continue
+            # Views of the samples published since the previous pass, one per channel
+            # (two segments when the range wraps around the end of the ring).
+            first_segments, first_seq, end_seq = reader.view_new(channel=ring.channel_names[0])
+            if end_seq > first_seq:
+                segments = {ring.channel_names[0]: first_segments}
+                for name in ring.channel_names[1:]:
+                    segments[name] = reader.view_range(first_seq, end_seq, channel=name)
 
-    # Allocate full buffers based on the rolling window size
-    temp_arry = np.zeros(shm_shape, dtype=np.float64)
-    eda_data = np.zeros(buffer_length, dtype=np.float64)
-    rsp_data = np.zeros(buffer_length, dtype=np.float64)
+                # (Further processing on the segments of each channel can be done here.)
 
-    try:
-        while not stop_event.is_set():
-            # Clear arrays
-            temp_arry.fill(0)
-            eda_data.fill(0)
-            rsp_data.fill(0)
-            
-            # Acquire locks in the same order.
-            DistributorLock.acquire()
-            print("P2 took DistributorLock")
-            RawLock.acquire()
-            print("P2 took RawLock")
-            
-            # Copy the full data chunk (the rolling window).
-            temp_arry[:] = shm_np[:]
-            
-            # Release the locks.
-            RawLock.release()
-            print("P2 released RawLock")
-            DistributorLock.release()
-            print("P2 released DistributorLock")
-            
-            # Split the data into two arrays (one for each column).
-            eda_data[:] = temp_arry[:, 0]
-            rsp_data[:] = temp_arry[:, 1]
-            
-            # (Further processing on eda_data and rsp_data can be done here.)
-            time.sleep(0.5)  # Optional delay to slow down busy-looping.
+                # Discard the result if the writer overwrote the range meanwhile.
+                if not reader.intact(first_seq):
+                    reader.missed += end_seq - first_seq
+                del segments
+            del first_segments
     except Exception as e:
         print(f"Process 2 produced the following error:\n\n{e}")
     finally:
+        print(f"Process 2: {reader.missed} samples missed")
+        ring.close()
         print("Process 2 finished.")
 
-def ProcAverage(stop_event, RawLock, DistributorLock, shm_shape, shm_name, buffer_length, csv_lock):
+def ProcAverage(stop_event, ring_name, buffer_length, csv_lock, doorbell=None, heartbeat=None):
     """
-    Reads the entire rolling window from shared memory, computes the column-wise average,
-    prints the result, and writes it to a CSV file.
+    Waits for each newly published chunk and feeds it into a RollingStats window of
+    buffer_length samples, prints the column-wise average, and writes it to a CSV file.
+    Each pass costs O(chunk) however long the window is.
+
+    When supervised, the CSV and doorbell locks are taken through the heartbeat so the
+    supervisor can release them if this process dies while holding one.
     """
-    shm_arry = shared_memory.SharedMemory(name=shm_name)
-    shm_np = np.ndarray(shm_shape, dtype=np.float64, buffer=shm_arry.buf)
+    if heartbeat is not None:
+        csv_lock = heartbeat.guard(csv_lock, "csv")
+        heartbeat.watch(doorbell)
+    ring = shared_ring.SharedRing.attach(ring_name, doorbell)
+    reader = ring.reader()
+    stats = rolling_stats.RollingStats(buffer_length, ring.n_channels)
     print("Process 3: Average Calculation")
 
     try:
         while not stop_event.is_set():
-            # Acquire locks in the same order.
-            DistributorLock.acquire()
-            print("P3 took DistributorLock")
-            RawLock.acquire()
-            print("P3 took RawLock")
-            
-            # Make a local copy of the entire rolling window.
-            local_chunk = np.copy(shm_np[:])
-            
-            RawLock.release()
-            print("P3 released RawLock")
-            DistributorLock.release()
-            print("P3 released DistributorLock")
-            
-            # Compute the column-wise average over the full 10-second window.
-            avg = np.mean(local_chunk, axis=0)
-            print("Process 3: Average of rolling window:", avg)
-            
-            # Write the average to a CSV file.
-            write_average_to_csv(avg, "Example_product_csv.csv", csv_lock)
-            
-            time.sleep(1)  # Pause before processing the next chunk.
+            if heartbeat is not None:
+                heartbeat.keep_up(reader)
+            # Sleep until Process 1 publishes (the timeout re-checks stop_event)
+            if not reader.wait(timeout=0.5):
+                continue
+            # Only the samples published since the previous pass.
+            new_data, first_seq, end_seq = reader.read_new()
+            if len(new_data):
+                stats.update(new_data)
+                
+                # Column-wise average over the full 10-second window.
+                avg = stats.mean
+                print("Process 3: Average of rolling window:", avg)
+                
+                # Write the average to a CSV file.
+                write_average_to_csv(avg, "Example_product_csv.csv", csv_lock)
     except Exception as e:
         print(f"Process 3 produced the following error:\n\n{e}")
     finally:
+        ring.close()
         print("Process 3 finished.")
 
 if __name__ == '__main__':
-    host = 'localhost'
-    port = 12345
+    # Process 1 connects out to the sender (the emulator or the BIOPAC bridge). Add one
+    # address per participant; this example processes the first stream that opens.
+    senders = [('localhost', 12345)]
+    connect_timeout = 10.0  # Seconds to wait for the first stream.
 
     # Set up parameters for a 10-second rolling window at 2000 Hz.
     buffer_length = 20000  # Total rows to store 10 seconds worth of data.
     update_chunk = 2000    # New data chunk size (e.g., we update the window every 1 second).
-    shape = (buffer_length, 2)  # Two columns of data.
+    channel_names = ["EDA", "RSP"]  # Names for a CSV stream, used when it has as many columns.
+    srate = 2000           # Sample rate of a CSV stream; binary streams announce their own.
+
+    # Request binary frames from the sender; it falls back to CSV if unsupported.
+    stream_mode = protocol.MODE_BINARY
 
-    dtype = np.float64
+    # Core placement (Linux): Process 1 gets a reserved core of its own, feature workers run
+    # niced on the remaining cores so neurokit bursts cannot delay socket reads. Set
+    # ingest_fifo to e.g. 10 to also run Process 1 under SCHED_FIFO (needs CAP_SYS_NICE).
+    reserve = core_layout.DEFAULT_RESERVE
+    ingest_fifo = None
+    layout = core_layout.plan_layout(reserve, ingest_fifo=ingest_fifo)
+    print(f"[Layout] {core_layout.describe(reserve)}")
+    for line in core_layout.describe_layout(layout):
+        print(f"[Layout] {line}")
 
-    # Locks for synchronizing shared memory and CSV access.
-    RawLock = mp.Lock()
-    DistributorLock = mp.Lock()
+    # Lock for CSV access. Shared memory needs no lock: the ring is lock-free.
     csv_lock = mp.Lock()
     stop_event = mp.Event()
+    # Rung by Process 1 on every publish; Processes 2 & 3 wait on it instead of sleeping.
+    doorbell = shared_ring.Doorbell()
+    # Process 1 announces every stream it opens (and closes) with the name of its ring.
+    announce_queue = mp.Queue()
+
+    # Process 1 (Receiver): the ingest negotiates the stream format and writes each stream,
+    # in chunks of 'update_chunk' rows, into a channel-major ring of 'buffer_length' rows
+    # that it creates from what the sender announces.
+    p1 = mp.Process(target=async_ingest.run_ingest,
+                    args=(senders, buffer_length, stream_mode, None, channel_names, srate, update_chunk,
+                          announce_queue, stop_event, doorbell))
+    # Process 1 creates the rings this process attaches to; starting the resource tracker
+    # first makes them share it, so a ring Process 1 frees is not reported as leaked here.
+    resource_tracker.ensure_running()
+    p1.start()
+    print(f"[Layout] Process 1 (pid {p1.pid}): {layout['ingest'].apply(p1.pid)}")
+
+    # The rest of the pipeline is sized from the stream, so wait for it to open.
+    try:
+        stream = announce_queue.get(timeout=connect_timeout)
+    except queue.Empty:
+        print(f"Could not open a stream from {senders} within {connect_timeout:g} s")
+        stop_event.set()
+        p1.join(timeout=5)
+        sys.exit(1)
+    channel_names = stream["channel_names"]
+    srate = stream["sample_rate"]
+    print(f"Stream: {stream['n_channels']} channels {channel_names} at {srate:g} Hz "
+          f"({'binary' if stream['mode'] == protocol.MODE_BINARY else 'CSV'} mode)")
 
-    # Create shared memory.
-    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape) * np.dtype(dtype).itemsize))
-    shared_array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    # The ring holding the rolling window. Channel-major layout keeps each channel
+    # contiguous so feature processes can work on it without copying.
+    ring = shared_ring.SharedRing.attach(stream["ring_name"])
+    # The cleaning stage filters every sample once into a second ring with its own doorbell.
+    clean_doorbell = shared_ring.Doorbell()
+    clean_ring = shared_ring.SharedRing.create(buffer_length, channel_names=channel_names,
+                                               layout=shared_ring.LAYOUT_CHANNEL_MAJOR)
+    # Channels the sender names after a signal get its neurokit cleaner; others pass through.
+    chains = {name: clean_stage.NEUROKIT_CHAINS[name] for name in channel_names if name in clean_stage.NEUROKIT_CHAINS}
+    # Registered streaming extractors; their metadata gives the rate each channel is needed at.
+    # Only those whose channels the sender announced are run.
+    specs = []
+    for spec in feature_registry.load_plugin("[M][Feat]EDA_Stream.py") + feature_registry.load_plugin("[M][Feat]RSP_Stream.py"):
+        missing = [name for name in spec.channels if name not in channel_names]
+        if missing:
+            print(f"Feature {spec.name} skipped: the stream has no {', '.join(missing)} channel")
+        else:
+            specs.append(spec)
+    # The decimation stage resamples each cleaned channel to the rate its features are written
+    # for and publishes it as a one-channel derived ring; the feature workers read those.
+    rates = feature_registry.channel_rates(specs)
+    derived_doorbell = shared_ring.Doorbell()
+    derived_rings = {name: shared_ring.SharedRing.create(int(buffer_length * rate / srate), channel_names=[name],
+                                                         layout=shared_ring.LAYOUT_CHANNEL_MAJOR)
+                     for name, rate in rates.items()}
 
-    # Create processes.
-    # Process 1 (Receiver) updates using 'update_chunk' rows.
-    p1 = mp.Process(target=ReceiveProcess, args=(host, port, stop_event, RawLock, DistributorLock,
-                                                   update_chunk, shape, shm.name))
+    # The processing stages run under a supervisor: a stage that crashes or stops beating is
+    # restarted and reattaches to the rings by name, while Process 1 keeps receiving.
+    supervisor = stage_supervisor.StageSupervisor(stop_event=stop_event)
+    for name, bell in (("doorbell", doorbell), ("clean doorbell", clean_doorbell),
+                       ("derived doorbell", derived_doorbell)):
+        supervisor.register_lock(name, bell.lock)
+    supervisor.register_lock("csv", csv_lock)
+    # Cleaning stage: raw ring -> clean ring, with per-channel filter state.
+    supervisor.add(stage_supervisor.Stage(
+        "Cleaning", clean_stage.cleaning_process,
+        args=(stop_event, ring.name, clean_ring.name, chains, srate, doorbell, clean_doorbell), source=ring,
+        placement=layout["stage"]))
+    # Decimation stage: clean ring -> one derived ring per channel, so the features read
+    # the cleaned signal at their own rate.
+    supervisor.add(stage_supervisor.Stage(
+        "Decimation", decimate_stage.decimation_process,
+        args=(stop_event, clean_ring.name, {name: derived.name for name, derived in derived_rings.items()},
+              rates, srate, clean_doorbell, derived_doorbell), source=clean_ring, placement=layout["stage"]))
     # Processes 2 & 3 operate on the full rolling window ('buffer_length' rows).
-    p2 = mp.Process(target=ProcSplit, args=(stop_event, RawLock, DistributorLock, shape, shm.name, buffer_length))
-    p3 = mp.Process(target=ProcAverage, args=(stop_event, RawLock, DistributorLock, shape, shm.name, buffer_length, csv_lock))
+    # Process 2 splits the cleaned signal.
+    supervisor.add(stage_supervisor.Stage("Process 2", ProcSplit, args=(stop_event, clean_ring.name, clean_doorbell),
+                                          source=clean_ring, placement=layout["stage"]))
+    supervisor.add(stage_supervisor.Stage("Process 3", ProcAverage,
+                                          args=(stop_event, ring.name, buffer_length, csv_lock, doorbell), source=ring,
+                                          placement=layout["stage"]))
+    # Feature workers: each attaches to a derived ring by name and runs a streaming extractor
+    # in its own process, so the extractors run in parallel instead of sharing the GIL.
+    # The derived rings are already cleaned, so the RSP engine skips its own cleaning filter.
+    params = {"RSP": {"window": 60, "clean": False}}
+    jobs = [feature_pool.FeatureJob.from_spec(spec, ring=derived_rings[spec.channels[0]].name,
+                                              params=params.get(spec.name)) for spec in specs]
+    features = feature_pool.FeaturePool(ring.name, jobs, srate, derived_doorbell, reserve=reserve,
+                                        placement=layout["worker"])
 
     try:
-        # Start processes.
-        p1.start()
-        time.sleep(0.1)  # Ensure Process 1 initializes first.
-        p2.start()
-        p3.start()
-
-        # Keep the main process running.
-        while True:
-            time.sleep(1)
+        # Start processes (Process 1 is already receiving).
+        supervisor.start()
+        features.start()
+        # Processes started from here on get their own placement explicitly
+        print(f"[Layout] Main process (pid {os.getpid()}): {layout['ui'].apply()}")
+
+        # Keep the main process running, printing feature results as they arrive, until
+        # the stream ends, the pipeline is stopped or Ctrl+C.
+        while not stop_event.is_set():
+            result = features.get(timeout=1)
+            if result is not None and "error" in result:
+                print(f"Feature {result['job']} failed: {result['error']}")
+            elif result is not None:
+                print(f"Feature {result['job']} (samples {result['first_seq']}-{result['end_seq']}):",
+                      {name: round(float(value), 3) for name, value in result["features"].items()})
+            # Streams opened later (other senders, or a reconnect) are not processed here
+            try:
+                update = announce_queue.get_nowait()
+            except queue.Empty:
+                continue
+            if update["stream_id"] == stream["stream_id"] and update.get("closed"):
+                break
+        print("\nThe stream ended or the pipeline was stopped. Cleaning up...")
     except KeyboardInterrupt:
         print("\n[Ctrl+C] detected! Cleaning up...")
-
-        # Signal all processes to stop.
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
         stop_event.set()
-        p1.join(timeout=5)
-        print("Force killing Process 1..." if p1.is_alive() else "Process 1 terminated.")
-        p2.join(timeout=5)
-        print("Force killing Process 2..." if p2.is_alive() else "Process 2 terminated.")
-        p3.join(timeout=5)
-        print("Force killing Process 3..." if p3.is_alive() else "Process 3 terminated.")
+        features.stop(timeout=0.1)
+        supervisor.stop(timeout=0.1)
+        # Process 1 owns the stream's ring and frees it when it stops
+        p1.join(timeout=1)
         if p1.is_alive():
             p1.terminate()
-        if p2.is_alive():
-            p2.terminate()
-        if p3.is_alive():
-            p3.terminate()
-
-        # Clean up shared memory.
-        try:
-            shm.close()
-            shm.unlink()
-            print("Clearing Memory")
-        except Exception as e:
-            print(f"Error cleaning shared memory: {e}")
-
-        print("All processes terminated and shared memory cleaned up. Exiting...")
-        sys.exit(0)
+        ring.close()
+        clean_ring.close()
+        for derived in derived_rings.values():
+            derived.close()
+        sys.exit(1)
 
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        stop_event.set()
-        time.sleep(0.1)
+    # Signal all processes to stop.
+    stop_event.set()
+    features.stop()
+    supervisor.stop(timeout=5)
+    p1.join(timeout=5)
+    print("Force killing Process 1..." if p1.is_alive() else "Process 1 terminated.")
+    if p1.is_alive():
         p1.terminate()
-        p2.terminate()
-        p3.terminate()
-        time.sleep(0.1)
-        shm.close()
-        shm.unlink()
-        sys.exit(1)
+
+    # Clean up shared memory.
+    try:
+        ring.close()
+        clean_ring.close()
+        for derived in derived_rings.values():
+            derived.close()
+        print("Clearing Memory")
+    except Exception as e:
+        print(f"Error cleaning shared memory: {e}")
+
+    print("All processes terminated and shared memory cleaned up. Exiting...")
+    sys.exit(0)
@@ -1,36 +1,130 @@
-import socket
-import csv
-import time
-
-def send_csv_data(filename, client_socket):
-    with open(filename, 'r') as file:
-        reader = csv.reader(file)
-        for row in reader:
-            message = ','.join(row) + '\n'
-            client_socket.sendall(message.encode('utf-8'))
-            time.sleep(0.0005)  # Set 2000hz sample rate
-
-def start_server(host, port, filename):
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind((host, port))
-    server_socket.listen(1)
-    print(f"Server listening on {host}:{port}")
-
-    while True:
-        client_socket, client_address = server_socket.accept()
-        print(f"Connection from {client_address}")
-        try:
-            send_csv_data(filename, client_socket)
-        except:
-            print("An Error Occured")
-            server_socket.close()
-            client_socket.close()
-        finally:
-            server_socket.close()
-            client_socket.close()
-
-if __name__ == '__main__':
-    host = 'localhost'
-    port = 12345
-    filename = "C:\\Users\\brhei\\Desktop\\PythonWork\\Realtime_Work\\Threaf&feature\\liveData.csv"  # Replace with your CSV file name
-    start_server(host, port, filename)
+import os
+import sys
+import socket
+import time
+import threading
+
+# Shared project files live in the "Version 1.0" folder
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Version 1.0")
+
+sys.path.insert(0, PROJECT_DIR)
+from M_Supp_Loader import load_project_module
+
+protocol = load_project_module("[M][Com]Stream_Protocol.py")
+
+class ReplayEngine:
+    """
+    Device emulator: replays a recording to any number of clients as if it came
+    from the acquisition hardware.
+
+    The recording is read and parsed once. Each client gets its own replay that
+    sends `block_samples` samples per sendall on an absolute schedule (block k is
+    due at start + k * block duration), so sleep overshoot never accumulates.
+
+    Args:
+        filename (str): CSV recording, one sample per line. A non-numeric first line is
+                        taken as the channel names.
+        srate (float): Sample rate of the recording in Hz.
+        speed (float or None): Replay speed multiplier (1 = real time, 10 = ten times
+                               faster). None or 0 sends as fast as the client reads.
+        block_samples (int): Samples per sendall.
+        loop (bool): Restart from the first sample when the recording ends.
+        report_interval (float): Seconds between achieved-rate reports.
+        channel_names (list of str or None): Names announced to binary clients. Defaults to
+                                             the recording's header line, else CH0, CH1, ...
+    """
+    def __init__(self, filename, srate=2000, speed=1.0, block_samples=100, loop=False, report_interval=5.0,
+                 channel_names=None):
+        with open(filename, 'rb') as file:
+            # Keep the original text lines for CSV clients and a parsed array for binary clients
+            self.lines = [line.strip() + b'\n' for line in file if line.strip()]
+        n_channels = self.lines[0].count(b',') + 1
+        if not protocol.parse_csv_rows(self.lines[0], n_channels)[0].size:
+            # Header line: never sent to CSV clients, which expect numbers only
+            header_names = self.lines.pop(0).decode('utf-8').strip().split(',')
+            channel_names = channel_names or [name.strip() for name in header_names]
+        self.samples, skipped = protocol.parse_csv_rows(b''.join(self.lines), n_channels)
+        if skipped:
+            raise ValueError(f"{len(skipped)} malformed rows in {filename}, first: {skipped[0]!r}")
+        self.header = protocol.StreamHeader(n_channels, srate, channel_names=channel_names)
+        self.srate = srate
+        self.speed = speed
+        self.block_samples = block_samples
+        self.loop = loop
+        self.report_interval = report_interval
+        print(f"Loaded {len(self.samples)} samples x {n_channels} channels {self.header.channel_names} from {filename}")
+
+    def stream(self, client_socket, client_address):
+        """Replay the recording to one client until it ends (or forever when looping)."""
+        # Offer the binary protocol; clients that do not ask for it keep receiving CSV text
+        mode = protocol.negotiate_stream_mode(client_socket, self.header)
+        print(f"{client_address}: streaming in {'binary' if mode == protocol.MODE_BINARY else 'CSV'} mode")
+
+        n_total = len(self.samples)
+        sample_time = 1.0 / (self.srate * self.speed) if self.speed else 0.0
+        seq = 0
+        start = time.monotonic()
+        next_report = start + self.report_interval
+        while True:
+            # Position within the recording (wraps around when looping)
+            pos = seq % n_total
+            if seq and pos == 0 and not self.loop:
+                break
+            end = min(pos + self.block_samples, n_total)
+            if mode == protocol.MODE_BINARY:
+                payload = protocol.pack_frames(self.samples[pos:end], seq, self.header)
+            else:
+                payload = b''.join(self.lines[pos:end])
+            client_socket.sendall(payload)
+            seq += end - pos
+
+            now = time.monotonic()
+            if now >= next_report:
+                print(f"{client_address}: {seq / (now - start):.1f} Hz achieved vs. "
+                      f"{self.srate * self.speed if self.speed else 'max'} Hz target")
+                next_report += self.report_interval
+            if sample_time:
+                # Drift correction: sleep to the absolute due time of the next block
+                due = start + seq * sample_time
+                if due > now:
+                    time.sleep(due - now)
+        print(f"{client_address}: recording finished after {seq} samples")
+
+def serve_client(engine, client_socket, client_address):
+    try:
+        engine.stream(client_socket, client_address)
+    except (ConnectionError, OSError) as e:
+        print(f"{client_address}: client disconnected ({e})")
+    finally:
+        client_socket.close()
+
+def start_server(host, port, filename, srate=2000, speed=1.0, block_samples=100, loop=False, channel_names=None):
+    engine = ReplayEngine(filename, srate, speed, block_samples, loop, channel_names=channel_names)
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((host, port))
+    server_socket.listen(8)
+    print(f"Server listening on {host}:{port}")
+
+    try:
+        while True:
+            # Every client gets its own independent replay
+            client_socket, client_address = server_socket.accept()
+            print(f"Connection from {client_address}")
+            threading.Thread(target=serve_client, args=(engine, client_socket, client_address),
+                             daemon=True).start()
+    except KeyboardInterrupt:
+        print("\nServer stopped")
+    finally:
+        server_socket.close()
+
+if __name__ == '__main__':
+    host = 'localhost'
+    port = 12345
+    filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), "[E][Full]Sample_EDA_RSP.csv")  # Replace with your CSV file name
+    srate = 2000          # Sample rate of the recording
+    speed = 1.0           # 1.0 = real time, 10.0 = ten times faster, None = as fast as possible
+    block_samples = 100   # Samples per send (50 ms at 2000 Hz and 1x speed)
+    loop = True           # Restart the recording when it ends
+    channel_names = None  # Names announced to binary clients (e.g. ["EDA"]); None: the CSV header line or CH0, CH1, ...
+    start_server(host, port, filename, srate, speed, block_samples, loop, channel_names)
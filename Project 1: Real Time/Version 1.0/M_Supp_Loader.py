@@ -0,0 +1,47 @@
+"""
+Loader for the project's own files.
+
+Project files carry bracketed names (e.g. "[M][Com]Stream_Protocol.py") that cannot be
+used in an import statement, so they are loaded by path and registered in sys.modules
+under a mangled name ("M_Com_Stream_Protocol"). This file has a plain name so that
+every other file can import it:
+
+    from M_Supp_Loader import load_project_module
+    protocol = load_project_module("[M][Com]Stream_Protocol.py")
+
+Files in "Version 1.0" find it next to themselves. Scripts elsewhere (the examples)
+put PROJECT_DIR on sys.path before importing it.
+"""
+import os
+import re
+import sys
+import importlib.util
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def module_name_for(file_name):
+    """Name a project file is registered under in sys.modules ("[M][Feat]X.py" -> "M_Feat_X")."""
+    return re.sub(r"[\[\]]+", "_", os.path.splitext(os.path.basename(file_name))[0]).strip("_")
+
+
+def load_project_module(file_name):
+    """
+    Load a project file (a name in PROJECT_DIR, or a path) and return the module.
+
+    The file is executed only the first time it is loaded in this process; later calls
+    return the module kept in sys.modules. A file that fails to execute is not kept.
+    """
+    module_name = module_name_for(file_name)
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(PROJECT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
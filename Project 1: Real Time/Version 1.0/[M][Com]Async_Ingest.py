@@ -0,0 +1,220 @@
+"""
+asyncio ingest for multi-participant sessions.
+
+Every sender in this project (the BIOPAC bridge, the device emulator) is a listening
+server, so the ingest side connects out: it is given the address of every device
+(one per participant or recording source) and keeps one connection to each. Each
+connection is served by its own coroutine, negotiates the stream mode
+([M][Com]Stream_Protocol.py) and writes its samples straight into a dedicated
+SharedRing ([M][Supp]Shared_Ring.py). No Manager proxy sits in the data path:
+consumers attach to a ring by name and read it directly.
+
+When a stream starts, a description of its ring is announced so other processes
+can attach:
+    {"stream_id": 0, "address": ("10.0.0.5", 12345), "ring_name": "...",
+     "n_channels": 2, "channel_names": ["EDA", "RSP"], "sample_rate": 2000.0}
+
+When it ends, the same description is announced again with "closed": True and the
+ring is freed. Readers already attached keep their mapping until they close it, but
+no new reader can attach. A sender that is not up yet, or that closes its stream,
+is connected to again after retry_interval seconds; the new stream gets a new ring
+and does not leak the old one.
+
+Rings are channel-major, so each channel can be mapped as one contiguous array.
+"""
+import time
+import socket
+import asyncio
+import numpy as np
+
+from M_Supp_Loader import load_project_module
+
+protocol = load_project_module("[M][Com]Stream_Protocol.py")
+shared_ring = load_project_module("[M][Supp]Shared_Ring.py")
+
+
+class AsyncIngest:
+    """
+    Connects to any number of senders and serves their streams concurrently.
+
+    Args:
+        senders (list of (host, port)): Address of every sender to read from.
+        capacity (int): Samples held by each stream's ring.
+        stream_mode (int): Mode requested from every sender (MODE_BINARY falls back to CSV).
+        n_channels (int or None): Channel count for CSV streams; None infers it from the first row.
+        channel_names (list of str or None): Names for a CSV stream, used when it has as many columns.
+        sample_rate (float or None): Announced sample rate of a CSV stream (CSV does not carry it).
+        update_chunk (int or None): Rows collected before each ring write; None writes every read.
+        announce_queue (multiprocessing.Queue or None): Receives a dict for every new and closed stream.
+        stop_event (multiprocessing.Event or None): Shuts the ingest down when set.
+        doorbell (Doorbell or None): Rung after every write to any stream's ring, so
+                                     consumers can block instead of polling.
+        retry_interval (float): Seconds between connection attempts to a sender.
+    """
+    def __init__(self, senders, capacity=20000, stream_mode=protocol.MODE_BINARY, n_channels=None,
+                 channel_names=None, sample_rate=None, update_chunk=None, announce_queue=None,
+                 stop_event=None, doorbell=None, retry_interval=1.0):
+        self.senders = [tuple(address) for address in senders]
+        self.capacity = capacity
+        self.stream_mode = stream_mode
+        self.n_channels = n_channels
+        self.channel_names = channel_names
+        self.sample_rate = sample_rate
+        self.update_chunk = update_chunk
+        self.announce_queue = announce_queue
+        self.stop_event = stop_event
+        self.doorbell = doorbell
+        self.retry_interval = retry_interval
+        self.streams = {}  # stream_id -> description dict, while the stream is open
+        self.rings = {}    # stream_id -> SharedRing owned by this process, while the stream is open
+        self._next_id = 0
+
+    async def serve(self):
+        """Serve every sender until stop_event is set or the task is cancelled."""
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.ensure_future(self._follow(loop, address)) for address in self.senders]
+        try:
+            while not all(task.done() for task in tasks):
+                if self.stop_event is not None and self.stop_event.is_set():
+                    break
+                await asyncio.sleep(0.2)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _follow(self, loop, address):
+        """Keep one connection to a sender, connecting again whenever it is refused or closed."""
+        waiting = False
+        while True:
+            conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            conn.setblocking(False)
+            try:
+                await loop.sock_connect(conn, address)
+            except OSError as e:
+                conn.close()
+                if not waiting:
+                    print(f"[Ingest] {address[0]}:{address[1]} not reachable ({e}); retrying "
+                          f"every {self.retry_interval:g} s")
+                    waiting = True
+                await asyncio.sleep(self.retry_interval)
+                continue
+            waiting = False
+            stream_id = self._next_id
+            self._next_id += 1
+            await self._handle(loop, conn, address, stream_id)
+            await asyncio.sleep(self.retry_interval)
+
+    async def _handle(self, loop, conn, addr, stream_id):
+        """Serve one stream: handshake, then decode every read into the stream's ring."""
+        print(f"[Ingest] Stream {stream_id}: connected to {addr}")
+        ring = None
+        reader = None
+        pending = None  # rows collected towards the next update_chunk write
+        pending_fill = 0
+        try:
+            header, leftover = await protocol.request_stream_mode_async(loop, conn, self.stream_mode)
+            reader = protocol.StreamReader(conn, self.n_channels, header)
+            rows = None
+            if leftover:
+                # Legacy senders may already have delivered rows during the handshake
+                reader.free_space()[:len(leftover)] = leftover
+                rows = reader.decode(len(leftover))
+            while True:
+                if rows is not None and len(rows):
+                    if ring is None:
+                        ring = self._open_stream(stream_id, addr, reader.n_channels, header)
+                        if self.update_chunk:
+                            pending = np.empty((self.update_chunk, reader.n_channels), dtype=np.float64)
+                    if pending is None:
+                        ring.write(rows)
+                    while pending is not None and len(rows):
+                        take = min(len(rows), self.update_chunk - pending_fill)
+                        pending[pending_fill:pending_fill + take] = rows[:take]
+                        pending_fill += take
+                        rows = rows[take:]
+                        if pending_fill == self.update_chunk:
+                            ring.write(pending)
+                            pending_fill = 0
+                count = await loop.sock_recv_into(conn, reader.free_space())
+                rows = reader.decode(count)
+                if rows is None:
+                    break
+        except (ConnectionError, OSError) as e:
+            print(f"[Ingest] Stream {stream_id}: connection error: {e}")
+        finally:
+            conn.close()
+            if pending_fill:
+                # Rows short of a full chunk when the stream ended
+                ring.write(pending[:pending_fill])
+            if reader is not None:
+                print(f"[Ingest] Stream {stream_id}: closed after {reader.rows_read} rows "
+                      f"({reader.rows_skipped} skipped, {reader.frames_missed} frames missed)")
+            self._close_stream(stream_id)
+
+    def _open_stream(self, stream_id, addr, n_channels, header):
+        """Create the ring for a new stream and announce it."""
+        if header is not None:
+            channel_names, sample_rate = header.channel_names, header.sample_rate
+        else:
+            channel_names, sample_rate = self.channel_names, self.sample_rate
+            if channel_names is not None and len(channel_names) != n_channels:
+                channel_names = None
+        ring = shared_ring.SharedRing.create(self.capacity, n_channels, channel_names=channel_names,
+                                             layout=shared_ring.LAYOUT_CHANNEL_MAJOR,
+                                             doorbell=self.doorbell)
+        self.rings[stream_id] = ring
+        self.streams[stream_id] = {
+            "stream_id": stream_id,
+            "address": addr,
+            "ring_name": ring.name,
+            "n_channels": n_channels,
+            "channel_names": ring.channel_names,
+            "sample_rate": sample_rate,
+            "mode": protocol.MODE_BINARY if header is not None else protocol.MODE_CSV,
+            "opened": time.time(),
+        }
+        print(f"[Ingest] Stream {stream_id}: writing {n_channels} channels to ring {ring.name}")
+        self._announce(self.streams[stream_id])
+        return ring
+
+    def _close_stream(self, stream_id):
+        """Announce that a stream ended and free its ring."""
+        description = self.streams.pop(stream_id, None)
+        if description is not None:
+            self._announce(dict(description, closed=True))
+        ring = self.rings.pop(stream_id, None)
+        if ring is not None:
+            ring.close()
+
+    def _announce(self, description):
+        if self.announce_queue is not None:
+            self.announce_queue.put(description)
+
+    def close(self):
+        """Free the rings of the streams still open."""
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
+
+
+def run_ingest(senders, capacity=20000, stream_mode=protocol.MODE_BINARY, n_channels=None, channel_names=None,
+               sample_rate=None, update_chunk=None, announce_queue=None, stop_event=None, doorbell=None,
+               retry_interval=1.0):
+    """
+    Process target: run an AsyncIngest until stop_event is set or Ctrl+C.
+    Rings stay valid for attached readers until this function returns.
+    """
+    ingest = AsyncIngest(senders, capacity, stream_mode, n_channels, channel_names, sample_rate, update_chunk,
+                         announce_queue, stop_event, doorbell, retry_interval)
+    try:
+        asyncio.run(ingest.serve())
+    except KeyboardInterrupt:
+        print("\n[Ingest] Keyboard interrupt received. Shutting down.")
+    finally:
+        ingest.close()
+
+
+if __name__ == "__main__":
+    # One emulator or BIOPAC bridge per participant
+    run_ingest([("localhost", 12345)])
@@ -0,0 +1,437 @@
+"""
+Wire protocol shared by every end of the sample stream:
+    - the BIOPAC bridge        ([E][3rd]BiopacNDT_TCP.py.py)
+    - the device emulator      ([E][Full]Server_Simple_System.py)
+    - the receiving processes  ([E][Anlys]Client_Simple_System.py)
+
+Two modes are supported and chosen per connection:
+    MODE_CSV:    The original format, one comma-separated text line per sample.
+    MODE_BINARY: A handshake header followed by fixed-width frames, one frame per sample.
+
+Negotiation:
+    1. The client connects and sends a REQUEST packet naming the mode it wants.
+    2. The sender waits a short time for the request. Older clients never send one,
+       so a missing or malformed request falls back to MODE_CSV.
+    3. In MODE_BINARY the sender answers with a HEADER packet (channel count, dtype,
+       sample rate, channel names) and then streams frames. In MODE_CSV nothing is answered.
+
+Frame layout (little endian):
+    | sequence number (uint64) | channel 0 | channel 1 | ... | channel N-1 |
+    Channel values are float32 or float64 as stated in the header.
+"""
+import time
+import socket
+import struct
+import warnings
+import numpy as np
+
+# Protocol constants
+PROTOCOL_VERSION = 2
+REQUEST_MAGIC = b"RTPQ"
+HEADER_MAGIC = b"RTPH"
+
+MODE_CSV = 0
+MODE_BINARY = 1
+
+# Packet layouts: magic, version, mode, reserved
+REQUEST_STRUCT = struct.Struct("<4sBBH")
+# Packet layouts: magic, version, dtype code, channel count, sample rate, names length.
+# The header is followed by the channel names (utf-8, comma separated).
+HEADER_STRUCT = struct.Struct("<4sBBHdH")
+
+# Dtype codes carried in the header
+DTYPE_CODES = {0: np.dtype("<f4"), 1: np.dtype("<f8")}
+
+
+class StreamHeader:
+    """
+    Describes a binary stream: how many channels each frame holds, their names, the
+    dtype of the channel values and the nominal sample rate of the source.
+    Channel names default to CH0, CH1, ...
+    """
+    def __init__(self, n_channels, sample_rate, dtype=np.float64, channel_names=None):
+        self.n_channels = int(n_channels)
+        self.sample_rate = float(sample_rate)
+        if channel_names is None:
+            channel_names = [f"CH{i}" for i in range(self.n_channels)]
+        self.channel_names = [str(name) for name in channel_names]
+        if len(self.channel_names) != self.n_channels:
+            raise ValueError(f"{len(self.channel_names)} channel names given for {self.n_channels} channels")
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        if self.dtype not in DTYPE_CODES.values():
+            raise ValueError(f"Unsupported stream dtype: {self.dtype}")
+        # Structured dtype used to view raw bytes as frames without copying
+        self.frame_dtype = np.dtype([("seq", "<u8"), ("values", self.dtype, (self.n_channels,))])
+
+    @property
+    def frame_size(self):
+        """Number of bytes in one frame."""
+        return self.frame_dtype.itemsize
+
+    def pack(self):
+        """Serialize the header for transmission."""
+        code = [c for c, d in DTYPE_CODES.items() if d == self.dtype][0]
+        names = ",".join(self.channel_names).encode("utf-8")
+        return HEADER_STRUCT.pack(HEADER_MAGIC, PROTOCOL_VERSION, code, self.n_channels,
+                                  self.sample_rate, len(names)) + names
+
+    @classmethod
+    def unpack(cls, payload):
+        """Rebuild a header from the bytes produced by pack()."""
+        magic, version, code, n_channels, sample_rate, names_length = \
+            HEADER_STRUCT.unpack(payload[:HEADER_STRUCT.size])
+        if magic != HEADER_MAGIC:
+            raise ValueError(f"Bad stream header magic: {magic!r}")
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"Unsupported protocol version: {version}")
+        if code not in DTYPE_CODES:
+            raise ValueError(f"Unknown dtype code in header: {code}")
+        names = payload[HEADER_STRUCT.size:HEADER_STRUCT.size + names_length].decode("utf-8")
+        return cls(n_channels, sample_rate, DTYPE_CODES[code], names.split(",") if names else None)
+
+    def __repr__(self):
+        return (f"StreamHeader(n_channels={self.n_channels}, sample_rate={self.sample_rate}, "
+                f"dtype={self.dtype.name}, channel_names={self.channel_names})")
+
+
+def recv_exact(sock, n_bytes):
+    """
+    Receive exactly n_bytes from the socket.
+
+    Raises:
+        ConnectionError: If the peer closes the connection before n_bytes arrive.
+    """
+    buf = bytearray(n_bytes)
+    view = memoryview(buf)
+    received = 0
+    while received < n_bytes:
+        count = sock.recv_into(view[received:], n_bytes - received)
+        if count == 0:
+            raise ConnectionError("Connection closed during handshake")
+        received += count
+    return bytes(buf)
+
+
+def request_stream_mode(sock, mode=MODE_BINARY):
+    """
+    Client side of the handshake. Sends the mode request and, for MODE_BINARY,
+    waits for the sender's header. A sender that predates this protocol ignores
+    the request and starts sending CSV text, in which case the client falls back
+    to MODE_CSV and the bytes already read are handed back.
+
+    Args:
+        sock (socket.socket): A connected socket.
+        mode (int): MODE_CSV or MODE_BINARY.
+
+    Returns:
+        (header, leftover):
+            header:   StreamHeader if binary framing was agreed, otherwise None.
+            leftover: Stream bytes read during the handshake that belong to the data stream.
+    """
+    sock.sendall(REQUEST_STRUCT.pack(REQUEST_MAGIC, PROTOCOL_VERSION, mode, 0))
+    if mode != MODE_BINARY:
+        return None, b""
+    payload = recv_exact(sock, HEADER_STRUCT.size)
+    if not _is_header(payload):
+        # Legacy sender: what we read is the start of the CSV stream
+        return None, payload
+    names = recv_exact(sock, HEADER_STRUCT.unpack(payload)[-1])
+    return StreamHeader.unpack(payload + names), b""
+
+
+async def request_stream_mode_async(loop, sock, mode=MODE_BINARY):
+    """
+    asyncio version of request_stream_mode() for non-blocking sockets.
+
+    Args:
+        loop (asyncio.AbstractEventLoop): The running event loop.
+        sock (socket.socket): A connected, non-blocking socket.
+        mode (int): MODE_CSV or MODE_BINARY.
+
+    Returns:
+        (header, leftover), as request_stream_mode().
+    """
+    await loop.sock_sendall(sock, REQUEST_STRUCT.pack(REQUEST_MAGIC, PROTOCOL_VERSION, mode, 0))
+    if mode != MODE_BINARY:
+        return None, b""
+    payload = await _recv_exact_async(loop, sock, HEADER_STRUCT.size)
+    if not _is_header(payload):
+        # Legacy sender: what we read is the start of the CSV stream
+        return None, payload
+    names = await _recv_exact_async(loop, sock, HEADER_STRUCT.unpack(payload)[-1])
+    return StreamHeader.unpack(payload + names), b""
+
+
+async def _recv_exact_async(loop, sock, n_bytes):
+    """asyncio version of recv_exact()."""
+    buf = bytearray(n_bytes)
+    view = memoryview(buf)
+    received = 0
+    while received < n_bytes:
+        count = await loop.sock_recv_into(sock, view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed during handshake")
+        received += count
+    return bytes(buf)
+
+
+def _is_header(payload):
+    """True if the sender answered a MODE_BINARY request with a header."""
+    return payload[:len(HEADER_MAGIC)] == HEADER_MAGIC
+
+
+def csv_stream_header(sock, sample_rate, initial=b"", channel_names=None, timeout=5.0):
+    """
+    Describe a CSV stream, which carries no header, from its first complete row.
+
+    The row is peeked (MSG_PEEK), so nothing is taken from the socket and the reader
+    still receives the whole stream.
+
+    Args:
+        sock (socket.socket): A connected socket in MODE_CSV.
+        sample_rate (float): Nominal sample rate of the sender (CSV does not carry it).
+        initial (bytes): Stream bytes already read, e.g. the leftover of request_stream_mode().
+        channel_names (list of str or None): Names to use when their number matches the row.
+        timeout (float): Seconds to wait for the first row.
+
+    Returns:
+        StreamHeader with the channel count of the first row.
+
+    Raises:
+        ConnectionError: If the peer closes the connection before a row arrives.
+        socket.timeout: If no complete row arrives within timeout seconds.
+    """
+    previous_timeout = sock.gettimeout()
+    sock.settimeout(timeout)
+    try:
+        data = initial
+        size = 1024
+        while b"\n" not in data:
+            peeked = sock.recv(size, socket.MSG_PEEK)
+            if not peeked:
+                raise ConnectionError("Connection closed before the first row")
+            if b"\n" not in peeked and len(peeked) == size:
+                size *= 2
+            elif b"\n" not in peeked:
+                # Part of a row: let more arrive before peeking again
+                time.sleep(0.01)
+            data = initial + peeked
+    finally:
+        sock.settimeout(previous_timeout)
+    n_channels = data[:data.find(b"\n")].count(b",") + 1
+    if channel_names is not None and len(channel_names) != n_channels:
+        channel_names = None
+    return StreamHeader(n_channels, sample_rate, channel_names=channel_names)
+
+
+def negotiate_stream_mode(client_socket, header, timeout=0.5):
+    """
+    Sender side of the handshake. Waits up to `timeout` seconds for the client's
+    request and answers it.
+
+    Args:
+        client_socket (socket.socket): The accepted client connection.
+        header (StreamHeader): Description of the stream this sender can offer.
+        timeout (float): Seconds to wait for a request before assuming a CSV client.
+
+    Returns:
+        MODE_BINARY or MODE_CSV.
+    """
+    previous_timeout = client_socket.gettimeout()
+    client_socket.settimeout(timeout)
+    try:
+        request = recv_exact(client_socket, REQUEST_STRUCT.size)
+        magic, version, mode, _ = REQUEST_STRUCT.unpack(request)
+        if magic != REQUEST_MAGIC or version != PROTOCOL_VERSION:
+            mode = MODE_CSV
+    except (socket.timeout, ConnectionError):
+        # Older clients never send a request: stay in CSV mode
+        mode = MODE_CSV
+    finally:
+        client_socket.settimeout(previous_timeout)
+
+    if mode == MODE_BINARY:
+        client_socket.sendall(header.pack())
+        return MODE_BINARY
+    return MODE_CSV
+
+
+def pack_frames(samples, first_seq, header):
+    """
+    Pack a block of samples into consecutive frames.
+
+    Args:
+        samples (array-like): Shape (n_samples, n_channels) or a single sample of shape (n_channels,).
+        first_seq (int): Sequence number of the first sample in the block.
+        header (StreamHeader): Header negotiated for this connection.
+
+    Returns:
+        bytes ready for sendall().
+    """
+    samples = np.asarray(samples, dtype=header.dtype).reshape(-1, header.n_channels)
+    frames = np.empty(len(samples), dtype=header.frame_dtype)
+    frames["seq"] = np.arange(first_seq, first_seq + len(samples), dtype=np.uint64)
+    frames["values"] = samples
+    return frames.tobytes()
+
+
+def unpack_frames(buffer, header):
+    """
+    Decode every complete frame at the start of `buffer`.
+
+    Args:
+        buffer (bytes-like): Received bytes, possibly ending in a partial frame.
+        header (StreamHeader): Header negotiated for this connection.
+
+    Returns:
+        (seq, values, consumed):
+            seq:      uint64 array of sequence numbers.
+            values:   Array of shape (n_frames, n_channels).
+            consumed: Number of bytes used; the caller keeps the remainder for the next read.
+    """
+    n_frames = len(buffer) // header.frame_size
+    consumed = n_frames * header.frame_size
+    frames = np.frombuffer(buffer, dtype=header.frame_dtype, count=n_frames)
+    return frames["seq"], frames["values"], consumed
+
+
+
+def parse_csv_rows(block, n_channels):
+    """
+    Parse a block of complete CSV rows (ending in a newline) with one vectorized call.
+    Blocks containing malformed rows fall back to row-by-row parsing so only the bad
+    rows are skipped. A block is only parsed in bulk when every row holds exactly
+    n_channels - 1 commas, so a short row next to a long one is not merged into
+    plausible samples.
+
+    Args:
+        block (bytes): Complete rows, each terminated by b"\\n".
+        n_channels (int): Expected number of values per row.
+
+    Returns:
+        (values, skipped): float64 array of shape (n_rows, n_channels) and the list of rejected rows.
+    """
+    n_rows = block.count(b"\n")
+    raw = np.frombuffer(block, dtype=np.uint8)
+    commas_per_row = np.diff(np.cumsum(raw == ord(","))[raw == ord("\n")], prepend=0)
+    if np.all(commas_per_row == n_channels - 1):
+        try:
+            with warnings.catch_warnings():
+                # fromstring only warns when it stops early on unparsable text
+                warnings.simplefilter("error", DeprecationWarning)
+                values = np.fromstring(block.replace(b"\n", b","), dtype=np.float64, sep=",")
+            if values.size == n_rows * n_channels:
+                return values.reshape(n_rows, n_channels), []
+        except (ValueError, DeprecationWarning):
+            pass
+
+    # Slow path: keep every row that parses to the right width
+    parsed, skipped = [], []
+    for row in block.split(b"\n")[:-1]:
+        try:
+            values = [float(v) for v in row.split(b",")]
+        except ValueError:
+            values = []
+        if len(values) == n_channels:
+            parsed.append(values)
+        else:
+            skipped.append(row)
+    return np.array(parsed, dtype=np.float64).reshape(-1, n_channels), skipped
+
+
+class StreamReader:
+    """
+    Reads samples from a connected socket in either stream mode.
+
+    Data is received with recv_into() into one preallocated buffer. Every complete
+    row (CSV) or frame (binary) is decoded in a single vectorized call, and the
+    incomplete tail is moved to the front of the buffer for the next read, so rows
+    split across TCP packets are reassembled instead of dropped.
+
+    n_channels may be None for CSV streams, in which case it is taken from the
+    first complete row. Callers that do their own socket I/O (e.g. asyncio) fill
+    free_space() themselves and hand the byte count to decode().
+    """
+    def __init__(self, sock, n_channels, header=None, buffer_size=1 << 16, initial=b""):
+        self.sock = sock
+        self.header = header
+        self.n_channels = header.n_channels if header is not None else n_channels
+        self.buffer = bytearray(max(buffer_size, 2 * len(initial)))
+        self.view = memoryview(self.buffer)
+        self.fill = len(initial)  # bytes currently held in the buffer
+        self.buffer[:self.fill] = initial
+
+        # Counters for monitoring
+        self.rows_read = 0
+        self.rows_skipped = 0
+        self.frames_missed = 0
+        self.expected_seq = None
+
+    def read(self):
+        """
+        Block until at least one socket read completes and decode what it completed.
+
+        Returns:
+            float64 array of shape (n_rows, n_channels), possibly with zero rows when
+            the read only delivered part of a row. None once the peer closes the connection.
+        """
+        return self.decode(self.sock.recv_into(self.free_space()))
+
+    def free_space(self):
+        """Writable view of the unused end of the buffer, for the next recv_into()."""
+        if self.fill == len(self.buffer):
+            # A single row longer than the buffer: grow instead of deadlocking
+            self.view.release()
+            self.buffer.extend(bytes(len(self.buffer)))
+            self.view = memoryview(self.buffer)
+        return self.view[self.fill:]
+
+    def decode(self, count):
+        """
+        Account for `count` new bytes written into free_space() and decode them.
+
+        Returns:
+            As read(): an array of complete rows, or None when count is 0 (connection closed).
+        """
+        if count == 0:
+            return None
+        self.fill += count
+        return self._decode_binary() if self.header is not None else self._decode_csv()
+
+    def _carry_tail(self, end):
+        """Move the unparsed bytes after `end` to the front of the buffer."""
+        tail = self.fill - end
+        self.buffer[:tail] = self.buffer[end:self.fill]
+        self.fill = tail
+
+    def _decode_csv(self):
+        end = self.buffer.rfind(b"\n", 0, self.fill) + 1
+        if end == 0:
+            return np.empty((0, self.n_channels or 0), dtype=np.float64)
+        if self.n_channels is None:
+            # Channel count not configured: infer it from the first complete row
+            first_row = self.buffer[:self.buffer.find(b"\n")]
+            self.n_channels = first_row.count(b",") + 1
+        values, skipped = parse_csv_rows(bytes(self.view[:end]), self.n_channels)
+        self._carry_tail(end)
+        for row in skipped:
+            print(f"Skipping row due to conversion error: {row!r}")
+        self.rows_skipped += len(skipped)
+        self.rows_read += len(values)
+        return values
+
+    def _decode_binary(self):
+        seq, values, consumed = unpack_frames(self.view[:self.fill], self.header)
+        # Copy out before the buffer is reused by the next read
+        values = values.astype(np.float64)
+        if len(seq):
+            # Frames missing between the previous read and the end of this one
+            first = self.expected_seq if self.expected_seq is not None else int(seq[0])
+            missed = int(seq[-1]) + 1 - first - len(seq)
+            if missed:
+                self.frames_missed += missed
+                print(f"Sequence gap: {missed} frames missing before sequence {int(seq[-1])}")
+            self.expected_seq = int(seq[-1]) + 1
+        self._carry_tail(consumed)
+        self.rows_read += len(values)
+        return values
@@ -0,0 +1,276 @@
+"""
+Offline feature extraction over every sliding window of a recording.
+
+For backfills and validation: instead of one neurokit call per window, each channel
+is decomposed once over the whole recording and the per-window features are then
+computed for all windows together:
+
+    - Every channel: mean, std, min and max of the raw signal.
+    - EDA channels:  one nk.eda_phasic pass; tonic/phasic mean, min and max per window,
+                     standardized per window like EDA_features() (see [M][Feat]EDA_Stream.py
+                     for why standardizing the statistics is equivalent).
+    - RSP channels:  one nk.rsp_process pass; mean breath rate and median amplitude per window.
+    - ECG channels:  one nk.ecg_peaks pass; RMSSD, SDNN and pNN50 of the RR intervals
+                     inside each window, from cumulative sums over the beats.
+
+Window means and standard deviations come from cumulative sums; minima, maxima and
+medians are reduced over strided sliding_window_view()s, which index the decomposed
+signal without copying it. The per-channel decompositions and the window blocks are
+spread over all cores with a ProcessPoolExecutor. Channel types are taken from the
+channel names (a name starting with EDA, RSP or ECG).
+
+The result is one row per window, written as CSV:
+    window, first_sample, start_s, end_s, <channel>_<feature>, ...
+
+Usage:
+    python "[M][Lead]Offline_Features.py" recording.csv --srate 2000 --window 10 --step 1 \\
+        --channels EDA,RSP --out features.csv
+"""
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from M_Supp_Loader import load_project_module
+
+protocol = load_project_module("[M][Com]Stream_Protocol.py")
+
+# Windows reduced per task; bounds the temporary memory of the median reductions
+BLOCK_WINDOWS = 256
+
+
+def load_recording(filename, channel_names=None):
+    """
+    Read a CSV recording (one sample per line). A non-numeric first line is taken as
+    the channel names.
+
+    Returns:
+        (samples, channel_names): float64 array (n_samples, n_channels) and its names.
+    """
+    with open(filename, 'rb') as file:
+        lines = [line.strip() + b'\n' for line in file if line.strip()]
+    n_channels = lines[0].count(b',') + 1
+    if not protocol.parse_csv_rows(lines[0], n_channels)[0].size:
+        header_names = [name.strip() for name in lines.pop(0).decode('utf-8').split(',')]
+        channel_names = channel_names or header_names
+    samples, skipped = protocol.parse_csv_rows(b''.join(lines), n_channels)
+    if skipped:
+        print(f"[Offline] Skipped {len(skipped)} malformed rows, first: {skipped[0]!r}")
+    channel_names = channel_names or [f"CH{i}" for i in range(n_channels)]
+    if len(channel_names) != n_channels:
+        raise ValueError(f"{len(channel_names)} channel names given for {n_channels} channels")
+    return samples, list(channel_names)
+
+
+def channel_kind(name):
+    """'EDA', 'RSP', 'ECG' or None, from the start of a channel name."""
+    upper = name.upper()
+    for kind in ("EDA", "RSP", "ECG"):
+        if upper.startswith(kind):
+            return kind
+    return None
+
+
+def decompose(kind, signal, sampling_rate):
+    """
+    One full-recording neurokit pass for a channel.
+
+    Returns:
+        dict: Full-length arrays ("tonic"/"phasic", "rate"/"amplitude") or, for ECG,
+              the R-peak sample indices under "peaks".
+    """
+    import neurokit2 as nk
+    if kind == "EDA":
+        decomposed = nk.eda_phasic(signal, sampling_rate=sampling_rate)
+        return {"tonic": decomposed["EDA_Tonic"].to_numpy(), "phasic": decomposed["EDA_Phasic"].to_numpy()}
+    if kind == "RSP":
+        signals, _ = nk.rsp_process(signal, sampling_rate=sampling_rate)
+        return {"rate": signals["RSP_Rate"].to_numpy(), "amplitude": signals["RSP_Amplitude"].to_numpy()}
+    if kind == "ECG":
+        _, info = nk.ecg_peaks(signal, sampling_rate=sampling_rate)
+        return {"peaks": np.asarray(info["ECG_R_Peaks"], dtype=np.int64)}
+    return {}
+
+
+def _decompose_task(args):
+    kind, signal, sampling_rate = args
+    return decompose(kind, signal, sampling_rate)
+
+
+def window_moments(signal, starts, window):
+    """Mean and standard deviation (ddof=1) of every window, from cumulative sums."""
+    centred = signal - signal.mean()  # limits cancellation in the sum of squares
+    cumsum = np.concatenate(([0.0], np.cumsum(centred)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(centred ** 2)))
+    total = cumsum[starts + window] - cumsum[starts]
+    total_sq = cumsum_sq[starts + window] - cumsum_sq[starts]
+    mean = total / window
+    var = np.maximum(total_sq - total * mean, 0.0) / (window - 1)
+    return mean + signal.mean(), np.sqrt(var)
+
+
+def window_block_features(kind, name, arrays, offset, starts, window, step):
+    """
+    Min/max/median features of a block of windows, reduced over sliding window views.
+
+    Args:
+        arrays (dict): Slices of the channel's full-length arrays, starting at sample `offset`.
+        starts (np.ndarray): First sample of each window in the block.
+    """
+    local = starts - offset
+    columns = {}
+
+    def windows(values):
+        # Strided view: one row per window of the block, no copy
+        return sliding_window_view(values, window)[local[0]:local[-1] + 1:step]
+
+    raw = windows(arrays["raw"])
+    columns[f"{name}_Min"] = raw.min(axis=1)
+    columns[f"{name}_Max"] = raw.max(axis=1)
+    if kind == "EDA":
+        for component in ("tonic", "phasic"):
+            views = windows(arrays[component])
+            columns[f"{name}_{component.title()}_Min"] = views.min(axis=1)
+            columns[f"{name}_{component.title()}_Max"] = views.max(axis=1)
+    elif kind == "RSP":
+        columns[f"{name}_Amplitude"] = np.nanmedian(windows(arrays["amplitude"]), axis=1)
+    return columns
+
+
+def _block_task(args):
+    return window_block_features(*args)
+
+
+def hrv_windows(peaks, starts, window, sampling_rate):
+    """
+    RMSSD, SDNN and pNN50 of the RR intervals lying inside each window, vectorized
+    over windows with cumulative sums over the beats.
+    """
+    rr = np.diff(peaks) * 1000.0 / sampling_rate
+    diffs = np.diff(rr)
+    rr_centred = rr - rr.mean() if len(rr) else rr
+    c_rr = np.concatenate(([0.0], np.cumsum(rr_centred)))
+    c_rr2 = np.concatenate(([0.0], np.cumsum(rr_centred ** 2)))
+    c_d2 = np.concatenate(([0.0], np.cumsum(diffs ** 2)))
+    c_nn50 = np.concatenate(([0], np.cumsum(np.abs(diffs) > 50)))
+
+    # Peaks i0..i1-1 lie in the window: intervals i0..i1-2, differences i0..i1-3
+    i0 = np.searchsorted(peaks, starts)
+    i1 = np.searchsorted(peaks, starts + window)
+    n_rr = np.maximum(i1 - i0 - 1, 0)
+    n_d = np.maximum(n_rr - 1, 0)
+    rr_end = i0 + n_rr
+    d_end = i0 + n_d
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s = c_rr[rr_end] - c_rr[i0]
+        s2 = c_rr2[rr_end] - c_rr2[i0]
+        sdnn = np.sqrt(np.maximum(s2 - s ** 2 / n_rr, 0.0) / (n_rr - 1))
+        rmssd = np.sqrt((c_d2[d_end] - c_d2[i0]) / n_d)
+        # nk.hrv_time divides by the number of intervals, not of differences
+        pnn50 = 100.0 * (c_nn50[d_end] - c_nn50[i0]) / n_rr
+    sdnn[n_rr < 2] = np.nan
+    rmssd[n_d < 1] = np.nan
+    pnn50[n_d < 1] = np.nan
+    return {"HRV_RMSSD": rmssd, "HRV_SDNN": sdnn, "HRV_pNN50": pnn50}
+
+
+def extract_features(samples, channel_names, sampling_rate, window, step, workers=None):
+    """
+    Features of every window of a recording.
+
+    Args:
+        samples (np.ndarray): Shape (n_samples, n_channels).
+        channel_names (list of str): One name per column.
+        sampling_rate (float): Sample rate in Hz.
+        window (float): Window length in seconds.
+        step (float): Seconds between window starts.
+        workers (int or None): Worker processes; defaults to os.cpu_count().
+
+    Returns:
+        pandas.DataFrame: One row per window.
+    """
+    window_n = int(round(window * sampling_rate))
+    step_n = max(1, int(round(step * sampling_rate)))
+    n_samples = len(samples)
+    if n_samples < window_n:
+        raise ValueError(f"Recording has {n_samples} samples, shorter than one {window_n}-sample window")
+    starts = np.arange(0, n_samples - window_n + 1, step_n)
+    table = {"window": np.arange(len(starts)), "first_sample": starts,
+             "start_s": starts / sampling_rate, "end_s": (starts + window_n) / sampling_rate}
+    kinds = [channel_kind(name) for name in channel_names]
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 1. One full-recording decomposition per channel, channels in parallel
+        decompositions = list(executor.map(
+            _decompose_task, [(kind, samples[:, c], sampling_rate) for c, kind in enumerate(kinds)]))
+
+        # 2. Window statistics
+        block_tasks = []
+        for c, (name, kind) in enumerate(zip(channel_names, kinds)):
+            raw = samples[:, c]
+            arrays = dict(decompositions[c], raw=raw)
+            mean, std = window_moments(raw, starts, window_n)
+            table[f"{name}_Mean"], table[f"{name}_Std"] = mean, std
+            if kind == "EDA":
+                # Standardize the window statistics with the raw window mean and std
+                for component in ("tonic", "phasic"):
+                    table[f"{name}_{component.title()}_Mean"] = window_moments(arrays[component], starts, window_n)[0]
+            elif kind == "RSP":
+                rate = arrays["rate"]
+                table[f"{name}_Rate"] = window_moments(np.nan_to_num(rate, nan=np.nanmean(rate)), starts, window_n)[0]
+            elif kind == "ECG":
+                for feature, values in hrv_windows(arrays["peaks"], starts, window_n, sampling_rate).items():
+                    table[f"{name}_{feature}"] = values
+                del arrays["peaks"]
+
+            # Min/max/median in blocks of windows, each block sent only the samples it covers
+            for b in range(0, len(starts), BLOCK_WINDOWS):
+                block = starts[b:b + BLOCK_WINDOWS]
+                lo, hi = block[0], block[-1] + window_n
+                sliced = {key: values[lo:hi] for key, values in arrays.items()}
+                block_tasks.append((c, executor.submit(
+                    _block_task, (kind, name, sliced, lo, block, window_n, step_n))))
+
+        for c in range(len(channel_names)):
+            parts = [future.result() for channel, future in block_tasks if channel == c]
+            for key in parts[0]:
+                table[key] = np.concatenate([part[key] for part in parts])
+
+    # EDA features standardized per window, as EDA_features() does with nk.standardize
+    for name, kind in zip(channel_names, kinds):
+        if kind != "EDA":
+            continue
+        mean, sd = table[f"{name}_Mean"], table[f"{name}_Std"]
+        for stat in ("Mean", "Min", "Max"):
+            table[f"{name}_Tonic_{stat}"] = (table[f"{name}_Tonic_{stat}"] - mean) / sd
+            table[f"{name}_Phasic_{stat}"] = table[f"{name}_Phasic_{stat}"] / sd
+
+    return pd.DataFrame(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-window features of a recorded session.")
+    parser.add_argument("recording", help="CSV recording, one sample per line")
+    parser.add_argument("--srate", type=float, default=2000, help="Sample rate in Hz")
+    parser.add_argument("--window", type=float, default=10, help="Window length in seconds")
+    parser.add_argument("--step", type=float, default=1, help="Seconds between window starts")
+    parser.add_argument("--channels", default=None, help="Comma separated channel names (e.g. EDA,RSP)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--out", default=None, help="Output CSV (default: <recording>_features.csv)")
+    args = parser.parse_args()
+
+    channel_names = args.channels.split(",") if args.channels else None
+    samples, channel_names = load_recording(args.recording, channel_names)
+    print(f"[Offline] {len(samples)} samples x {len(channel_names)} channels {channel_names}")
+    features = extract_features(samples, channel_names, args.srate, args.window, args.step, args.workers)
+    out = args.out or os.path.splitext(args.recording)[0] + "_features.csv"
+    features.to_csv(out, index=False)
+    print(f"[Offline] {len(features)} windows written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Shared-memory multi-producer multi-consumer chunk queue.
+
+UniqueFunctionProcessor and Echo ([M][Supp]Class_Support.py) used to share a
+Manager().list(), so every pop/append/len was a round trip to the Manager server
+process, and a `% 2` turn flag let only one processor run at a time. ChunkQueue keeps
+the chunks themselves in one shared memory segment:
+
+    | header (8 x int64) | slot descriptors (slots x 3 int64) | claims (slots^2 x 4 int64) |
+    | slot data (slots x max_rows x n_channels) |
+
+Header fields:
+    SLOTS, MAX_ROWS, CHANNELS: Geometry.
+    ENQUEUE:  Next position a producer will claim.
+    DEQUEUE:  Next position a consumer will claim.
+
+Descriptor fields (one per slot):
+    SEQUENCE: Turn of the slot. Position p may be written when SEQUENCE == p and read
+              when SEQUENCE == p + 1; the consumer hands it back with p + slots.
+    ROWS:     Rows stored in the slot (ABANDONED if its producer died before publishing).
+    TAG:      Caller-defined integer travelling with the chunk (e.g. producer id).
+
+Claim fields (one row per position, row = position % slots^2):
+    PRODUCER_POSITION, PRODUCER_PID: The write claimed at that position and by whom.
+    CONSUMER_POSITION, CONSUMER_PID: The read claimed at that position and by whom.
+    A slot can have several claimants waiting for their turns at once (position p, then
+    p + slots, ...), so claims are recorded per position, not per slot. At most `slots`
+    positions are claimed and not yet handed back (the semaphores count them), so two
+    of them are always less than slots^2 apart and never share a row.
+
+A position is claimed by bumping ENQUEUE or DEQUEUE under a lock held only for that
+increment; copying into and out of the slot happens outside the lock, so producers
+and consumers work on different slots at the same time. Two semaphores count the free
+and filled slots, so a full queue blocks producers (backpressure) and an empty one
+blocks consumers, without polling. Any idle consumer takes the next chunk.
+
+A process that is killed between claiming a position and finishing with its slot
+would leave every later turn of that slot waiting. Waiters back off while a peer is
+still copying, and after STALL seconds check whether the claimant of the slot's
+current turn is still alive; repair() (also run by the StageSupervisor when a stage
+dies) steps the slot past a dead one. An unpublished write becomes an ABANDONED slot
+that consumers skip, and an unfinished read hands the slot back; the chunk involved
+is lost. A put() or get() whose timeout runs out while it waits for its turn gives
+its claim up, and the turn is then stepped past as if its claimant had died.
+"""
+import os
+import time
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+
+# Header layout (int64 slots)
+HEADER_SLOTS = 8
+HEADER_BYTES = HEADER_SLOTS * np.dtype(np.int64).itemsize
+SLOTS = 0
+MAX_ROWS = 1
+CHANNELS = 2
+ENQUEUE = 3
+DEQUEUE = 4
+
+# Descriptor layout (int64 fields per slot)
+DESCRIPTOR_FIELDS = 3
+SEQUENCE = 0
+ROWS = 1
+TAG = 2
+
+# Claim layout (int64 fields per claims row): (position, pid) of a write and of a read
+CLAIM_FIELDS = 4
+PRODUCER_POSITION = 0
+PRODUCER_PID = 1
+CONSUMER_POSITION = 2
+CONSUMER_PID = 3
+
+# Pid of a claim given up by a put() or get() that timed out
+GIVEN_UP = 0
+
+# Fields of a producer's and a consumer's claim: (position field, pid field)
+PRODUCER_CLAIM = (PRODUCER_POSITION, PRODUCER_PID)
+CONSUMER_CLAIM = (CONSUMER_POSITION, CONSUMER_PID)
+
+# ROWS of a slot whose producer died after claiming it
+ABANDONED = -1
+
+# Seconds a turn may be late before its claimant is checked, and the longest backoff sleep
+STALL = 1.0
+MAX_BACKOFF = 0.005
+
+
+def _alive(pid):
+    """True unless no process with this pid exists (GIVEN_UP counts as dead)."""
+    if pid <= GIVEN_UP:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class QueueSync:
+    """
+    The lock and semaphores of one ChunkQueue.
+
+    Like the Doorbell of a SharedRing these cannot be looked up by name, so they are
+    created with the queue and handed to every process that attaches.
+    """
+    def __init__(self, slots, context=None):
+        context = context or multiprocessing
+        self.claim_lock = context.Lock()
+        self.filled = context.Semaphore(0)
+        self.free = context.Semaphore(slots)
+
+
+class ChunkQueue:
+    """
+    Bounded FIFO of float64 chunks of up to max_rows x n_channels in shared memory.
+
+    Use ChunkQueue.create() in the owning process. Other processes either receive the
+    queue as a Process argument or call ChunkQueue.attach(name, sync).
+    """
+    def __init__(self, shm, sync, owner=False):
+        self.shm = shm
+        self.sync = sync
+        self.owner = owner  # the owner unlinks the segment on close()
+        self._owner_pid = os.getpid()
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        self.slots = int(self.header[SLOTS])
+        self.max_rows = int(self.header[MAX_ROWS])
+        self.n_channels = int(self.header[CHANNELS])
+        self.descriptors = np.ndarray((self.slots, DESCRIPTOR_FIELDS), dtype=np.int64, buffer=shm.buf,
+                                      offset=HEADER_BYTES)
+        self.claims = np.ndarray((self.slots ** 2, CLAIM_FIELDS), dtype=np.int64, buffer=shm.buf,
+                                 offset=HEADER_BYTES + self.descriptors.nbytes)
+        self.data = np.ndarray((self.slots, self.max_rows, self.n_channels), dtype=np.float64, buffer=shm.buf,
+                               offset=HEADER_BYTES + self.descriptors.nbytes + self.claims.nbytes)
+
+    @classmethod
+    def create(cls, slots, max_rows, n_channels=1, name=None, context=None):
+        """
+        Allocate a new empty queue.
+
+        Args:
+            slots (int): Chunks the queue holds before producers block (at least 2).
+            max_rows (int): Largest chunk, in rows.
+            n_channels (int): Values per row.
+            name (str or None): Shared memory segment name, chosen by the OS when None.
+            context (multiprocessing context or None): Context for the lock and semaphores.
+
+        Raises:
+            ValueError: For fewer than 2 slots, where a published slot and one handed
+                        back would carry the same sequence.
+        """
+        if slots < 2:
+            raise ValueError(f"A ChunkQueue needs at least 2 slots, not {slots}")
+        size = (HEADER_BYTES + (slots * DESCRIPTOR_FIELDS + slots ** 2 * CLAIM_FIELDS) * np.dtype(np.int64).itemsize
+                + slots * max_rows * n_channels * np.dtype(np.float64).itemsize)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[SLOTS] = slots
+        header[MAX_ROWS] = max_rows
+        header[CHANNELS] = n_channels
+        descriptors = np.ndarray((slots, DESCRIPTOR_FIELDS), dtype=np.int64, buffer=shm.buf, offset=HEADER_BYTES)
+        descriptors[:] = 0
+        descriptors[:, SEQUENCE] = np.arange(slots)
+        claims = np.ndarray((slots ** 2, CLAIM_FIELDS), dtype=np.int64, buffer=shm.buf,
+                            offset=HEADER_BYTES + descriptors.nbytes)
+        claims[:] = -1  # no position claimed yet
+        del header, descriptors, claims
+        return cls(shm, QueueSync(slots, context), owner=True)
+
+    @classmethod
+    def attach(cls, name, sync):
+        """Attach to a queue created by another process, with its QueueSync."""
+        return cls(shared_memory.SharedMemory(name=name), sync, owner=False)
+
+    def __reduce__(self):
+        # Sent to a child process: attach there instead of copying the arrays
+        return (self.attach, (self.name, self.sync))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def qsize(self):
+        """Chunks claimed by producers and not yet claimed by consumers (approximate)."""
+        return int(self.header[ENQUEUE] - self.header[DEQUEUE])
+
+    def _claim(self, counter, fields):
+        """Take the next position of `counter`, recording it and this process in its claims row."""
+        with self.sync.claim_lock:
+            position = int(self.header[counter])
+            # Recorded before the position is taken, so a claimed position always names its claimant
+            self.claims[position % len(self.claims), list(fields)] = (position, os.getpid())
+            self.header[counter] = position + 1
+        return position
+
+    def _give_up(self, position, fields):
+        """Mark a claim this process will not finish, so _repair() steps its turn past it."""
+        with self.sync.claim_lock:
+            self.claims[position % len(self.claims), fields[1]] = GIVEN_UP
+
+    def _claimant(self, position, fields):
+        """Pid recorded for a claimed position, or None if that row holds another position."""
+        row = self.claims[position % len(self.claims)]
+        return int(row[fields[1]]) if row[fields[0]] == position else None
+
+    def _acquire(self, semaphore, deadline=None):
+        """
+        Take a free or filled token. Tokens held by a dead claimant's slot only come back
+        once the slot is repaired, so every STALL seconds without one the slots are repaired.
+
+        Returns:
+            False if `deadline` (time.monotonic()) passed first.
+        """
+        while True:
+            wait = STALL if deadline is None else min(STALL, max(deadline - time.monotonic(), 0.0))
+            if semaphore.acquire(timeout=wait):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self.repair()
+
+    def _wait_turn(self, slot, turn, deadline=None):
+        """
+        Wait until `slot` reaches `turn`. A slow peer may still be copying the previous
+        turn: yield first, then sleep longer and longer (up to MAX_BACKOFF), and every
+        STALL seconds check whether the peer died (_repair).
+
+        Returns:
+            False if `deadline` (time.monotonic()) passed first.
+        """
+        delay = 0.0
+        stall_at = time.monotonic() + STALL
+        while self.descriptors[slot, SEQUENCE] != turn:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return False
+            if now >= stall_at:
+                self._repair(slot)
+                stall_at = now + STALL
+                continue
+            time.sleep(delay)
+            delay = min(MAX_BACKOFF, delay * 2 or 1e-5)
+        return True
+
+    def _repair(self, slot):
+        """
+        Step `slot` past the process its current turn waits for, if that process is dead.
+
+        Returns:
+            True if the slot was repaired.
+        """
+        with self.sync.claim_lock:
+            sequence = int(self.descriptors[slot, SEQUENCE])
+            if sequence % self.slots == slot:
+                # Writable: waiting for the producer that claimed position `sequence`
+                if sequence >= self.header[ENQUEUE]:
+                    return False
+                claimant = self._claimant(sequence, PRODUCER_CLAIM)
+                if claimant is None or _alive(claimant):
+                    return False
+                # Published empty, with the filled token the producer never gave
+                self.descriptors[slot, ROWS] = ABANDONED
+                self.descriptors[slot, SEQUENCE] = sequence + 1
+                self.sync.filled.release()
+            else:
+                # Published: waiting for the consumer that claimed position `sequence - 1`
+                if sequence - 1 >= self.header[DEQUEUE]:
+                    return False
+                claimant = self._claimant(sequence - 1, CONSUMER_CLAIM)
+                if claimant is None or _alive(claimant):
+                    return False
+                # Handed back, with the free token the consumer never gave
+                self.descriptors[slot, SEQUENCE] = sequence - 1 + self.slots
+                self.sync.free.release()
+        return True
+
+    def repair(self):
+        """
+        Step every slot past a claimant that died (see the module docstring). Call it
+        once the dead process has been joined.
+
+        Returns:
+            Number of slots repaired.
+        """
+        return sum(self._repair(slot) for slot in range(self.slots))
+
+    def put(self, chunk, tag=0, timeout=None):
+        """
+        Copy a chunk of shape (rows, n_channels) or (rows,) into the queue.
+
+        Blocks while the queue is full. Returns False if timeout seconds pass first,
+        including while waiting for a slow peer to free the claimed slot.
+
+        Raises:
+            ValueError: If the chunk has more than max_rows rows.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(len(chunk), -1)
+        if len(chunk) > self.max_rows:
+            raise ValueError(f"Chunk of {len(chunk)} rows does not fit in slots of {self.max_rows}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._acquire(self.sync.free, deadline):
+            return False
+        position = self._claim(ENQUEUE, PRODUCER_CLAIM)
+        slot = position % self.slots
+        if not self._wait_turn(slot, position, deadline):
+            self._give_up(position, PRODUCER_CLAIM)
+            return False
+        self.data[slot, :len(chunk)] = chunk
+        self.descriptors[slot, ROWS] = len(chunk)
+        self.descriptors[slot, TAG] = tag
+        # Publish: the slot is readable once its sequence moves on
+        self.descriptors[slot, SEQUENCE] = position + 1
+        self.sync.filled.release()
+        return True
+
+    def get(self, timeout=None):
+        """
+        Take the next chunk.
+
+        Blocks while the queue is empty. Slots abandoned by a dead producer are skipped.
+        A get() that times out after claiming a chunk whose producer has not published
+        it yet gives the claim up, and that chunk is dropped once it is published.
+
+        Returns:
+            (chunk, tag) with chunk a copy of shape (rows, n_channels), or None if
+            timeout seconds pass first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not self._acquire(self.sync.filled, deadline):
+                return None
+            position = self._claim(DEQUEUE, CONSUMER_CLAIM)
+            slot = position % self.slots
+            if not self._wait_turn(slot, position + 1, deadline):
+                self._give_up(position, CONSUMER_CLAIM)
+                return None
+            rows = int(self.descriptors[slot, ROWS])
+            if rows != ABANDONED:
+                chunk = self.data[slot, :rows].copy()
+                tag = int(self.descriptors[slot, TAG])
+            # Hand the slot back to the producer that will claim it next time round
+            self.descriptors[slot, SEQUENCE] = position + self.slots
+            self.sync.free.release()
+            if rows != ABANDONED:
+                return chunk, tag
+
+    def close(self):
+        """Detach from the segment; the owner also frees it."""
+        # numpy views must be released before the segment can be closed
+        del self.header
+        del self.descriptors
+        del self.claims
+        del self.data
+        self.shm.close()
+        # A forked child inherits the owner flag; only the creating process unlinks
+        if self.owner and os.getpid() == self._owner_pid:
+            self.shm.unlink()
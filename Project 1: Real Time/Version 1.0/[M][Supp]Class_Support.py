@@ -1,5 +1,6 @@
 import ast
 import time
+import queue
 import numpy as np
 import random
 import multiprocessing
@@ -8,70 +9,101 @@ import importlib
 import sys
 import os
 import socket
+import threading
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
     QWidget, QTextEdit, QPushButton, QMessageBox, QLabel, QListWidget, QFileDialog
 )
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QObject, pyqtSignal, pyqtSlot
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 
+from M_Supp_Loader import load_project_module
+
+feature_registry = load_project_module("[M][Supp]Feature_Registry.py")
+chunk_queue = load_project_module("[M][Supp]Chunk_Queue.py")
+ChunkQueue = chunk_queue.ChunkQueue
+stage_supervisor = load_project_module("[M][Supp]Stage_Supervisor.py")
+Stage = stage_supervisor.Stage
+StageSupervisor = stage_supervisor.StageSupervisor
+ScalingGroup = stage_supervisor.ScalingGroup
+core_layout = load_project_module("[M][Supp]Core_Layout.py")
+
+
 class UniqueFunctionProcessor(multiprocessing.Process):
     """
-    A process class that processes data from a buffer repeatedly, using a token-passing system.
+    A worker process that takes chunks from a shared ChunkQueue ([M][Supp]Chunk_Queue.py)
+    and processes them. Any number of processors can share one queue; whichever is idle
+    takes the next chunk, so throughput grows with the number of processors.
+
+    Under a StageSupervisor ([M][Supp]Stage_Supervisor.py) it is created inside the
+    stage process with a heartbeat, which it beats on every pass; it exits between
+    chunks when the supervisor retires it.
     """
-    def __init__(self, process_id, buffer, __ReadLock, __ReadFlag, result_queue):
+    def __init__(self, process_id, chunk_queue, result_queue, stop_event=None, heartbeat=None):
         super().__init__()
         self.process_id = process_id  # Unique ID for this process
-        self.buffer = buffer  # Shared buffer
-        self.ReadLock = __ReadLock  # Mutex lock
-        self.ReadFlag = __ReadFlag  # Shared flag to control lock ownership
+        self.chunk_queue = chunk_queue  # Shared chunk queue
         self.result_queue = result_queue
+        self.stop_event = stop_event or multiprocessing.Event()
+        self.heartbeat = heartbeat
 
     def run(self):
-        while True:
-            with self.lock:
-                # Only proceed if it's this process's turn
-                if self.flag.value == self.process_id:
-                    if not self.buffer:
-                        print(f"Process {self.process_id}: Buffer is empty. Exiting...")
+        if self.heartbeat is not None:
+            # The claim lock is marked while held, so the supervisor can free it if this process dies
+            self.heartbeat.watch(self.chunk_queue.sync, "claim_lock")
+        try:
+            while not self.stop_event.is_set():
+                if self.heartbeat is not None:
+                    self.heartbeat.beat()
+                    if self.heartbeat.retiring:
                         break
-
-                    # Consume a data chunk from the buffer
-                    data_chunk = self.buffer.pop(0)
-                    print(f"Process {self.process_id}: Processing data chunk: {data_chunk}")
-                    
-                    # Simulate processing and generate a result
-                    result = sum(data_chunk)  # Example: Summing the chunk
-                    self.result_queue.put((self.process_id, result))
-                    print(f"Process {self.process_id}: Processed data chunk. Result: {result}")
-
-                    # Pass control to the next process
-                    self.flag.value = ((self.flag.value + 1) % 2)  # Assume 2 processes for simplicity
-                    print(f"Set flag to {self.flag.value}")
-
-            time.sleep(0.01)  # Simulate some delay to avoid tight loops
+                # Block until a chunk is available (the timeout re-checks stop_event)
+                item = self.chunk_queue.get(timeout=0.5)
+                if item is None:
+                    continue
+                data_chunk, producer = item
+                print(f"Process {self.process_id}: Processing data chunk: {data_chunk.ravel()}")
+
+                # Simulate processing and generate a result
+                result = float(data_chunk.sum())  # Example: Summing the chunk
+                self.result_queue.put((self.process_id, result))
+                print(f"Process {self.process_id}: Processed data chunk. Result: {result}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.chunk_queue.close()
 
 
 class Echo(multiprocessing.Process):
     """
-    A process class responsible for adding new data to the buffer.
+    A process class responsible for adding new data to the queue. put() blocks while
+    the queue is full, so a slow consumer side holds the producer back.
     """
-    def __init__(self, buffer, lock, flag):
+    def __init__(self, chunk_queue, stop_event=None, interval=1.0, chunk_size=3, producer_id=0, heartbeat=None):
         super().__init__()
-        self.buffer = buffer
-        self.lock = lock
-        self.flag = flag
+        self.chunk_queue = chunk_queue
+        self.stop_event = stop_event or multiprocessing.Event()
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.producer_id = producer_id
+        self.heartbeat = heartbeat
+
     def run(self):
-        while True:
-            with self.lock:
-                if len(self.buffer) < 10:  # Prevent buffer overflow
-                    new_data = [random.randint(1, 20) for _ in range(3)]
-                    print(f"Echo: Adding new data to buffer: {new_data}")
-                    self.buffer.append(new_data)
-                    self.flag.value = ((self.flag.value + 1) % 2)
-                    print(f"Set flag to {self.flag.value}")
-            time.sleep(1)  # Simulate delay between additions
+        if self.heartbeat is not None:
+            self.heartbeat.watch(self.chunk_queue.sync, "claim_lock")
+        try:
+            while not self.stop_event.is_set():
+                if self.heartbeat is not None:
+                    self.heartbeat.beat()
+                new_data = [random.randint(1, 20) for _ in range(self.chunk_size)]
+                if self.chunk_queue.put(new_data, tag=self.producer_id, timeout=0.5):
+                    print(f"Echo: Adding new data to queue: {new_data}")
+                time.sleep(self.interval)  # Simulate delay between additions
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.chunk_queue.close()
 
 class FileManagerWidget(QWidget):
     """Enhanced File Manager Component with Function Extraction"""
@@ -124,11 +156,8 @@ class FileManagerWidget(QWidget):
                     self.disp_function_list.clear()
                     self.disp_function_list.addItems(functions)
                     self.terminal_view.append(f"[{self.title}_Added] {file_path}")
-                        # Example usage:
-                    # module_path = "/path/to/neuro_utils.py"
-                    # neuro_utils = dynamic_import("neuro_utils", module_path)
-
-                    # data = [your_data_here]
+                    # Example usage:
+                    # neuro_utils = self.dynamic_import("/path/to/neuro_utils.py")
                     # result = neuro_utils.Neuro_RSP_features(data)
                 else:
                     self.terminal_view.append(f"[File_Error] {self.title} Already included\n")
@@ -168,21 +197,51 @@ class FileManagerWidget(QWidget):
             self.terminal_view.append(f"\tWarning\n\tInvalid {self.title} selected to save mapping!")
 
 
-    def dynamic_import(module_name, path):
-        sys.path.append(os.path.dirname(path))  # Add module directory to path
-        module = importlib.import_module(module_name)  # Load module
-        importlib.reload(module)  # Reload to ensure latest version is used
-        return module
-    
+    def feature_specs(self):
+        """
+        FeatureSpecs of the saved mappings whose function is a registered feature
+        ([M][Supp]Feature_Registry.py), ready for FeatureJob.from_spec.
+        """
+        specs = []
+        for file_path, name in self.user_file_functions:
+            target = getattr(self.dynamic_import(file_path), name, None)
+            spec = getattr(target, "feature_spec", None)
+            if spec is not None:
+                specs.append(spec)
+            else:
+                self.terminal_view.append(f"[Feature_Error] {name} in {file_path} is not a registered feature")
+        return specs
+
+    @staticmethod
+    def dynamic_import(path):
+        """
+        Load a script by path through the feature registry and return the module.
+        The script is executed once per process; later calls return the same module.
+        """
+        feature_registry.load_plugin(os.path.abspath(path))
+        return sys.modules[feature_registry.module_name_for(path)]
+
     @staticmethod
     def extract_functions(file_path):
-        """Extract function names from the given Python file"""
+        """
+        Names of the top-level functions and classes a Python file defines, without
+        executing it. Registered features (decorated with feature_registry.feature) are
+        listed first.
+        """
         try:
             with open(file_path, "r") as file:
                 tree = ast.parse(file.read())
-            return [node.name for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
         except Exception as e:
             return []
+        features, others = [], []
+        for node in tree.body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            registered = any(isinstance(decorator, ast.Call) and
+                             getattr(decorator.func, "attr", getattr(decorator.func, "id", None)) == "feature"
+                             for decorator in node.decorator_list)
+            (features if registered else others).append(node.name)
+        return features + others
 
 class DynamicGraphWidget(QWidget):
     def __init__(self, parent=None):
@@ -224,10 +283,97 @@ class DynamicGraphWidget(QWidget):
         self.canvas.draw()
         
 
+class PipelineSupervisor(QObject):
+    """
+    Starts, monitors and stops a processing pipeline away from the Qt event loop.
+
+    Move it to a QThread and connect the thread's started signal to run(). The pipeline
+    object must provide start_processes(), stop_processes() (returning any results it
+    drained while stopping), a `processes` list and a `result_queue`; a `chunk_queue`
+    is reported on when present. Results are collected
+    continuously, but the UI only hears about them every emit_interval seconds:
+
+        status(str):      lifecycle messages and processes that exited
+        throughput(dict): results/s overall and per process, queue depth, live processes
+        results(list):    the newest results since the last emit (at most max_batch)
+
+    so a busy pipeline cannot flood the event loop with signals.
+    """
+    status = pyqtSignal(str)
+    throughput = pyqtSignal(dict)
+    results = pyqtSignal(list)
+    finished = pyqtSignal()
+
+    def __init__(self, pipeline, emit_interval=0.25, max_batch=50):
+        super().__init__()
+        self.pipeline = pipeline
+        self.emit_interval = emit_interval
+        self.max_batch = max_batch
+        self._stop = threading.Event()
+
+    @pyqtSlot()
+    def run(self):
+        """Supervisor loop; returns (and emits finished) once stop() is called."""
+        try:
+            self.pipeline.start_processes()
+        except Exception as e:
+            self.status.emit(f"[Supervisor] Failed to start processing: {e}")
+            self.finished.emit()
+            return
+        self.status.emit(f"[Supervisor] Started {len(self.pipeline.processes)} processes")
+        batch = []
+        counts = {}
+        exited = set()
+        last_emit = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                # Block briefly on the results so the loop does not spin
+                try:
+                    process_id, result = self.pipeline.result_queue.get(timeout=0.05)
+                    batch.append((process_id, result))
+                    counts[process_id] = counts.get(process_id, 0) + 1
+                except queue.Empty:
+                    pass
+                now = time.monotonic()
+                if now - last_emit < self.emit_interval:
+                    continue
+                elapsed = now - last_emit
+                last_emit = now
+                for process in self.pipeline.processes:
+                    # Keyed by pid: a restarted process keeps its name
+                    if not process.is_alive() and process.pid not in exited:
+                        exited.add(process.pid)
+                        self.status.emit(f"[Supervisor] {process.name} exited with code {process.exitcode}")
+                chunk_queue = getattr(self.pipeline, "chunk_queue", None)
+                self.throughput.emit({
+                    "results_per_s": sum(counts.values()) / elapsed,
+                    "per_process": {process_id: count / elapsed for process_id, count in counts.items()},
+                    "queue_depth": chunk_queue.qsize() if chunk_queue is not None else None,
+                    "alive": sum(process.is_alive() for process in self.pipeline.processes)})
+                if batch:
+                    self.results.emit(batch[-self.max_batch:])
+                batch = []
+                counts = {}
+        finally:
+            batch += self.pipeline.stop_processes() or []
+            if batch:
+                self.results.emit(batch[-self.max_batch:])
+            self.status.emit("[Supervisor] Processing stopped")
+            self.finished.emit()
+
+    def stop(self):
+        """Ask the loop to stop; safe to call from the GUI thread."""
+        self._stop.set()
+
+
 def tcp_read_to_shared_array(shared_array, host='', port=9999):
     """
     Listens on the specified TCP port and appends incoming data as strings 
     to the given shared array. This function runs indefinitely until externally terminated.
+
+    Only one connection is served at a time. For sessions with several devices use
+    run_ingest() from [M][Com]Async_Ingest.py, which connects to every sender and
+    writes each stream into its own shared-memory ring.
     
     Args:
         shared_array (multiprocessing.managers.ListProxy): A shared list reference where received data will be added.
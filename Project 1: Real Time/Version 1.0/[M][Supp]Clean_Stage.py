@@ -0,0 +1,184 @@
+"""
+Streaming cleaning stage.
+
+Runs a configurable chain of filters over every incoming chunk, channel by channel,
+and publishes the cleaned samples into a SharedRing of their own
+([M][Supp]Shared_Ring.py). Downstream consumers read the cleaned ring instead of
+re-cleaning the full window inside every feature call, so cleaning runs once per
+sample.
+
+A chain is a list of filter steps, compiled into one second-order-sections cascade:
+
+    {"type": "bandpass", "low": 0.05, "high": 3, "order": 2}
+    {"type": "lowpass", "high": 3, "order": 4}
+    {"type": "highpass", "low": 0.5, "order": 5}
+    {"type": "notch", "freq": 50, "quality": 30}
+    {"type": "powerline", "freq": 50}     moving average over one powerline period
+    {"type": "detrend", "low": 0.01}      first-order high-pass removing slow drift
+
+Butterworth steps default to order 2. The filter state of each channel is carried
+from chunk to chunk, so the cleaned stream is identical to filtering the whole
+recording in one causal pass. NEUROKIT_CHAINS holds the steps of the default neurokit
+cleaners. Neurokit runs each one forwards and backwards (zero phase, squared magnitude
+response); here they run once, causally, so the output is delayed and rolls off less
+steeply than nk's.
+"""
+import numpy as np
+import scipy.signal
+
+from M_Supp_Loader import load_project_module
+
+shared_ring = load_project_module("[M][Supp]Shared_Ring.py")
+
+# Causal versions of nk.eda_clean, nk.rsp_clean and nk.ecg_clean (method="neurokit"/"khodadad2018")
+NEUROKIT_CHAINS = {
+    "EDA": [{"type": "lowpass", "high": 3, "order": 4}],
+    "RSP": [{"type": "bandpass", "low": 0.05, "high": 3, "order": 2}],
+    "ECG": [{"type": "highpass", "low": 0.5, "order": 5}, {"type": "powerline", "freq": 50}],
+}
+
+
+def design_sos(steps, sampling_rate):
+    """
+    Compile a list of filter steps into one SOS array.
+
+    Raises:
+        ValueError: For an unknown step type.
+    """
+    sections = []
+    for step in steps:
+        kind = step["type"]
+        order = step.get("order", 2)
+        if kind == "bandpass":
+            sos = scipy.signal.butter(order, [step["low"], step["high"]], btype="bandpass", output="sos",
+                                      fs=sampling_rate)
+        elif kind == "lowpass":
+            sos = scipy.signal.butter(order, step["high"], btype="lowpass", output="sos", fs=sampling_rate)
+        elif kind == "highpass":
+            sos = scipy.signal.butter(order, step["low"], btype="highpass", output="sos", fs=sampling_rate)
+        elif kind == "detrend":
+            sos = scipy.signal.butter(1, step.get("low", 0.01), btype="highpass", output="sos", fs=sampling_rate)
+        elif kind == "notch":
+            b, a = scipy.signal.iirnotch(step["freq"], step.get("quality", 30), fs=sampling_rate)
+            sos = scipy.signal.tf2sos(b, a)
+        elif kind == "powerline":
+            # nk.signal_filter(method="powerline"): one period of the powerline frequency,
+            # or two samples below 100 Hz
+            width = int(sampling_rate / step.get("freq", 50)) if sampling_rate >= 100 else 2
+            sos = scipy.signal.tf2sos(np.ones(width) / width, [1.0])
+        else:
+            raise ValueError(f"Unknown filter step type: {kind!r}")
+        sections.append(sos)
+    return np.vstack(sections) if sections else np.empty((0, 6))
+
+
+class FilterChain:
+    """
+    A filter cascade with per-channel state carried across chunks.
+
+    Args:
+        steps (list of dict): Filter steps (see the module docstring).
+        sampling_rate (float): Sample rate in Hz.
+        n_channels (int): Channels filtered together; each keeps its own state.
+    """
+    def __init__(self, steps, sampling_rate, n_channels=1):
+        self.steps = list(steps)
+        self.sos = design_sos(self.steps, sampling_rate)
+        self.n_channels = n_channels
+        self.zi = None
+        self._last = np.zeros(n_channels)
+
+    def process(self, chunk):
+        """
+        Filter a chunk of shape (n_samples, n_channels) or (n_samples,).
+
+        NaN samples are held at the channel's previous value so the state stays finite;
+        they are NaN again in the output.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        flat = chunk.ndim == 1
+        x = chunk.reshape(len(chunk), -1)
+        if len(self.sos) == 0 or len(x) == 0:
+            return chunk.copy()
+        missing = np.isnan(x)
+        if missing.any():
+            x = _hold_previous(x, missing, self._last)
+        self._last = x[-1].copy()
+        if self.zi is None:
+            # Steady state for the first sample of every channel: no start-up transient
+            self.zi = scipy.signal.sosfilt_zi(self.sos)[:, :, None] * x[0][None, None, :]
+        out, self.zi = scipy.signal.sosfilt(self.sos, x, axis=0, zi=self.zi)
+        out[missing] = np.nan
+        return out.ravel() if flat else out
+
+
+def _hold_previous(x, missing, last):
+    """Forward-fill NaN samples column by column, starting from `last`."""
+    index = np.where(~missing, np.arange(len(x))[:, None], -1)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = np.take_along_axis(x, np.maximum(index, 0), axis=0)
+    return np.where(index >= 0, filled, np.nan_to_num(last)[None, :])
+
+
+class CleaningStage:
+    """
+    Per-channel filter chains from one ring into another.
+
+    Args:
+        chains (dict): Channel name -> list of filter steps. Channels without a chain
+                       are copied through unchanged.
+        channel_names (list of str): Channels of the input ring, in order.
+        sampling_rate (float): Sample rate in Hz.
+    """
+    def __init__(self, chains, channel_names, sampling_rate):
+        self.channel_names = list(channel_names)
+        self.filters = {}
+        for name, steps in chains.items():
+            if name in self.channel_names and steps:
+                self.filters[self.channel_names.index(name)] = FilterChain(steps, sampling_rate)
+
+    def process(self, chunk):
+        """Clean a (n_samples, n_channels) chunk; returns a new array."""
+        out = np.array(chunk, dtype=np.float64)
+        for index, chain in self.filters.items():
+            out[:, index] = chain.process(out[:, index])
+        return out
+
+
+def cleaning_process(stop_event, in_ring_name, out_ring_name, chains, sampling_rate,
+                     in_doorbell=None, out_doorbell=None, heartbeat=None):
+    """
+    Process target: clean everything published on the input ring into the output ring.
+
+    Both rings are created by the caller (the output ring with the same channels as the
+    input); this process attaches to them by name. Readers of the output ring can wait
+    on out_doorbell. Under a StageSupervisor ([M][Supp]Stage_Supervisor.py) the stage
+    beats its heartbeat every pass; a restarted stage resumes at the write head with
+    fresh filter state.
+    """
+    if heartbeat is not None:
+        # Held doorbell locks are marked, so the supervisor can free them if this process dies
+        heartbeat.watch(in_doorbell)
+        heartbeat.watch(out_doorbell)
+    source = shared_ring.SharedRing.attach(in_ring_name, in_doorbell)
+    target = shared_ring.SharedRing.attach(out_ring_name, out_doorbell)
+    reader = source.reader()
+    stage = CleaningStage(chains, source.channel_names, sampling_rate)
+    print(f"[Cleaning] Filtering {sorted(source.channel_names[i] for i in stage.filters)} "
+          f"from {in_ring_name} into {out_ring_name}")
+    try:
+        while not stop_event.is_set():
+            if heartbeat is not None:
+                heartbeat.keep_up(reader)
+            if not reader.wait(timeout=0.5):
+                continue
+            samples, first_seq, end_seq = reader.read_new()
+            if len(samples):
+                target.write(stage.process(samples))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[Cleaning] {reader.missed} samples missed")
+        del reader
+        source.close()
+        target.close()
@@ -0,0 +1,168 @@
+"""
+How many cores the pipeline may use for its workers, and where each stage runs.
+
+Ingest (the receiver process) and the Qt UI must never wait for a core, so a reserve is
+kept for them and the worker pools are sized from what is left:
+
+    worker_budget(reserve=2)  ->  3 on a 4-core laptop, 30 on a 32-core workstation
+
+The reserve never takes the last core: on a 2-core machine only 1 core is reserved,
+and on 1 core none is (reserved_cores()). describe() reports the reserve in effect.
+
+available_cores() counts the cores this process may run on (its affinity mask, e.g. a
+container or taskset limit), not every core in the machine, so a pipeline confined to
+some cores does not start more workers than it can run.
+
+plan_layout() turns the same split into a Placement per role, applied by whoever
+spawns the process (StageSupervisor, FeaturePool, the client) right after start:
+
+    ingest:  the first reserved core; optionally SCHED_FIFO, so socket reads run as
+             soon as data arrives
+    ui:      the other reserved cores
+    stage:   the remaining cores at nice 0 (cleaning, decimation, ring consumers)
+    worker:  the remaining cores at nice `worker_nice`, so a burst of neurokit work
+             yields to the streaming stages instead of delaying them
+
+Placement uses os.sched_setaffinity, os.setpriority and os.sched_setscheduler, which
+exist on Linux only. Elsewhere, or when a setting is not permitted (a negative nice
+or SCHED_FIFO needs CAP_SYS_NICE), it is skipped and reported rather than raised.
+"""
+import os
+
+# Cores kept free for ingest and the UI
+DEFAULT_RESERVE = 2
+
+
+def available_cores():
+    """Cores this process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def reserved_cores(reserve=DEFAULT_RESERVE):
+    """Cores actually set aside for a requested reserve: at most all but one, at least 0."""
+    return max(0, min(reserve, available_cores() - 1))
+
+
+def worker_budget(reserve=DEFAULT_RESERVE, minimum=1):
+    """
+    Worker processes to run at most: the available cores less the reserve in effect,
+    but never fewer than minimum.
+    """
+    return max(minimum, available_cores() - reserved_cores(reserve))
+
+
+def describe(reserve=DEFAULT_RESERVE):
+    """One-line summary for the logs and the UI, with the reserve in effect."""
+    used = reserved_cores(reserve)
+    requested = f" ({reserve} requested)" if used != reserve else ""
+    return (f"{available_cores()} of {os.cpu_count()} cores available, {used} reserved for ingest/UI{requested}, "
+            f"up to {worker_budget(reserve)} workers")
+
+
+def _format_cores(cores):
+    """Compact core list: [0, 1, 2, 5] -> "0-2,5"."""
+    cores = sorted(cores)
+    ranges = []
+    for core in cores:
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+class Placement:
+    """
+    Where and how urgently one process runs.
+
+    Args:
+        cores (iterable of int or None): Cores the process may run on (None: unchanged).
+        nice (int or None): Nice level (None: unchanged).
+        fifo_priority (int or None): Run under SCHED_FIFO at this priority (1-99).
+    """
+    def __init__(self, cores=None, nice=None, fifo_priority=None):
+        self.cores = sorted(cores) if cores is not None else None
+        self.nice = nice
+        self.fifo_priority = fifo_priority
+
+    def __repr__(self):
+        return f"Placement(cores={self.cores}, nice={self.nice}, fifo_priority={self.fifo_priority})"
+
+    def describe(self):
+        """The requested settings, e.g. "cores 0, nice 0, SCHED_FIFO 10"."""
+        parts = []
+        if self.cores is not None:
+            parts.append(f"cores {_format_cores(self.cores)}")
+        if self.nice is not None:
+            parts.append(f"nice {self.nice}")
+        if self.fifo_priority is not None:
+            parts.append(f"SCHED_FIFO {self.fifo_priority}")
+        return ", ".join(parts) or "unchanged"
+
+    def apply(self, pid=0):
+        """
+        Apply the settings to a process (0: this one).
+
+        Returns:
+            A summary of what was applied, naming any setting that was skipped.
+        """
+        applied = []
+        if self.cores is not None:
+            applied.append(self._try(f"cores {_format_cores(self.cores)}", "sched_setaffinity",
+                                     lambda: os.sched_setaffinity(pid, self.cores)))
+        if self.nice is not None:
+            applied.append(self._try(f"nice {self.nice}", "setpriority",
+                                     lambda: os.setpriority(os.PRIO_PROCESS, pid, self.nice)))
+        if self.fifo_priority is not None:
+            applied.append(self._try(f"SCHED_FIFO {self.fifo_priority}", "sched_setscheduler",
+                                     lambda: os.sched_setscheduler(pid, os.SCHED_FIFO,
+                                                                   os.sched_param(self.fifo_priority))))
+        return ", ".join(applied) or "unchanged"
+
+    @staticmethod
+    def _try(label, function_name, call):
+        if not hasattr(os, function_name):
+            return f"{label} (unsupported here)"
+        try:
+            call()
+        except PermissionError:
+            return f"{label} (not permitted)"
+        except (OSError, ValueError) as e:
+            return f"{label} (failed: {e})"
+        return label
+
+
+def plan_layout(reserve=DEFAULT_RESERVE, worker_nice=5, ingest_fifo=None):
+    """
+    Placement per role ("ingest", "ui", "stage", "worker") over the available cores.
+
+    The reserve is clamped as in reserved_cores(). With a single core there is nothing
+    to set aside, so every role shares it and only the nice levels separate them.
+
+    Args:
+        reserve (int): Cores to set aside for ingest and the UI.
+        worker_nice (int): Nice level of the feature workers.
+        ingest_fifo (int or None): SCHED_FIFO priority for ingest (None: normal scheduling).
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    reserve = reserved_cores(reserve)
+    if reserve >= 1:
+        ingest = cores[:1]
+        ui = cores[1:reserve] or ingest
+        rest = cores[reserve:]
+    else:
+        ingest = ui = rest = cores
+    return {"ingest": Placement(ingest, nice=0, fifo_priority=ingest_fifo),
+            "ui": Placement(ui, nice=0),
+            "stage": Placement(rest, nice=0),
+            "worker": Placement(rest, nice=worker_nice)}
+
+
+def describe_layout(layout):
+    """One line per role, for the startup report."""
+    return [f"{role}: {placement.describe()}" for role, placement in layout.items()]
@@ -0,0 +1,169 @@
+"""
+Streaming decimation stage.
+
+The BIOPAC stream arrives at 2000 Hz, while the feature code is written for lower rates
+(FEATURE_RATES: nk.ecg_peaks and nk.rsp_process at 100 Hz, nk.eda_phasic at 250 Hz in
+[M][Lead]Main_thread_V2.py). This stage resamples each channel to the rate its
+features expect and publishes it as a derived stream in a SharedRing of its own
+([M][Supp]Shared_Ring.py), so extractors see the rate they were written for and work
+on 8-20x fewer samples.
+
+PolyphaseResampler is a streaming scipy.signal.resample_poly: the same Kaiser-windowed
+anti-aliasing FIR, applied in polyphase form so only the output samples are computed,
+with the input history carried between chunks. Output sample j is aligned to input
+time j * input_rate / output_rate, as in resample_poly; it is published once the
+half-filter look-ahead (10 output periods) has arrived.
+"""
+from fractions import Fraction
+import numpy as np
+import scipy.signal
+from numpy.lib.stride_tricks import sliding_window_view
+
+from M_Supp_Loader import load_project_module
+
+shared_ring = load_project_module("[M][Supp]Shared_Ring.py")
+
+# Sample rates the neurokit features in [M][Lead]Main_thread_V2.py are written for
+FEATURE_RATES = {"ECG": 100, "EDA": 250, "RSP": 100}
+
+
+class PolyphaseResampler:
+    """
+    Rational-rate resampler with state carried across chunks.
+
+    Args:
+        input_rate (float): Sample rate of the input in Hz.
+        output_rate (float): Sample rate of the output in Hz.
+        n_channels (int): Channels resampled together.
+        half_len_factor (int): Half filter length in periods of the lower rate (10 as in
+                               resample_poly).
+        beta (float): Kaiser window shape.
+    """
+    def __init__(self, input_rate, output_rate, n_channels=1, half_len_factor=10, beta=5.0):
+        ratio = Fraction(output_rate).limit_denominator(1000) / Fraction(input_rate).limit_denominator(1000)
+        self.up, self.down = ratio.numerator, ratio.denominator
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.n_channels = n_channels
+        max_rate = max(self.up, self.down)
+        self.half_len = half_len_factor * max_rate
+        taps = scipy.signal.firwin(2 * self.half_len + 1, 1.0 / max_rate, window=("kaiser", beta)) * self.up
+        # One sub-filter per phase of the up-sampled grid, reversed to dot with input windows
+        self.n_taps = -(-len(taps) // self.up)
+        phases = np.zeros((self.up, self.n_taps))
+        for phase in range(self.up):
+            sub = taps[phase::self.up]
+            phases[phase, :len(sub)] = sub
+        self._phases = phases[:, ::-1].copy()
+        self._history = None      # last n_taps - 1 input samples
+        self._last = np.zeros(n_channels)
+        self.n_in = 0             # input samples consumed
+        self.n_out = 0            # output samples produced
+
+    @property
+    def delay(self):
+        """Input samples that must arrive after an output's time before it is produced."""
+        return self.half_len / self.up
+
+    def process(self, chunk):
+        """
+        Resample a chunk of shape (n_samples, n_channels) or (n_samples,).
+
+        NaN samples are held at the previous value. Before the first sample the input
+        is taken to be constant, so a DC offset does not cause a start-up transient.
+
+        Returns:
+            The output samples that became complete, in the shape of the input.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        flat = chunk.ndim == 1
+        x = chunk.reshape(len(chunk), -1)
+        if len(x) == 0:
+            return np.empty((0,) if flat else (0, x.shape[1]))
+        if np.isnan(x).any():
+            valid = np.where(~np.isnan(x), np.arange(len(x))[:, None], -1)
+            np.maximum.accumulate(valid, axis=0, out=valid)
+            x = np.where(valid >= 0, np.take_along_axis(x, np.maximum(valid, 0), axis=0), self._last[None, :])
+        self._last = x[-1].copy()
+        if self._history is None:
+            self._history = np.repeat(x[:1], self.n_taps - 1, axis=0)
+
+        # Input index range covered: [start, n_in_new)
+        buffer = np.concatenate((self._history, x))
+        start = self.n_in - (self.n_taps - 1)
+        self.n_in += len(x)
+        self._history = buffer[len(buffer) - (self.n_taps - 1):]
+
+        # Output j sits at up-sampled time j * down; it needs input up to index
+        # (j * down + half_len) // up, with phase (j * down + half_len) % up.
+        end = (self.n_in * self.up - self.half_len - 1) // self.down + 1
+        if end <= self.n_out:
+            return np.empty((0,) if flat else (0, x.shape[1]))
+        t = np.arange(self.n_out, end) * self.down + self.half_len
+        newest, phase = np.divmod(t, self.up)
+        windows = sliding_window_view(buffer, self.n_taps, axis=0)[newest - (self.n_taps - 1) - start]
+        out = np.einsum("jk,jck->jc", self._phases[phase], windows)
+        self.n_out = end
+        return out.ravel() if flat else out
+
+
+class DecimationStage:
+    """
+    Resamplers for several channels of one ring, each to its own rate.
+
+    Args:
+        channel_rates (dict): Channel name -> output rate in Hz.
+        channel_names (list of str): Channels of the input ring, in order.
+        input_rate (float): Sample rate of the input ring in Hz.
+    """
+    def __init__(self, channel_rates, channel_names, input_rate):
+        self.channel_names = list(channel_names)
+        self.resamplers = {name: PolyphaseResampler(input_rate, rate)
+                           for name, rate in channel_rates.items() if name in self.channel_names}
+
+    def process(self, chunk):
+        """Resample a (n_samples, n_channels) chunk; returns {channel name: new samples}."""
+        return {name: resampler.process(chunk[:, self.channel_names.index(name)])
+                for name, resampler in self.resamplers.items()}
+
+
+def decimation_process(stop_event, in_ring_name, out_ring_names, channel_rates, input_rate,
+                       in_doorbell=None, out_doorbell=None, heartbeat=None):
+    """
+    Process target: publish every channel of channel_rates as a derived stream.
+
+    Args:
+        out_ring_names (dict): Channel name -> name of a one-channel SharedRing created by
+                               the caller. Rings sharing out_doorbell are all rung on write.
+        heartbeat (Heartbeat or None): Beaten every pass when run under a StageSupervisor
+                                       ([M][Supp]Stage_Supervisor.py).
+    """
+    if heartbeat is not None:
+        # Held doorbell locks are marked, so the supervisor can free them if this process dies
+        heartbeat.watch(in_doorbell)
+        heartbeat.watch(out_doorbell)
+    source = shared_ring.SharedRing.attach(in_ring_name, in_doorbell)
+    targets = {name: shared_ring.SharedRing.attach(ring_name, out_doorbell)
+               for name, ring_name in out_ring_names.items()}
+    reader = source.reader()
+    stage = DecimationStage(channel_rates, source.channel_names, input_rate)
+    print("[Decimation] " + (", ".join(f"{name} {input_rate:g} -> {resampler.output_rate:g} Hz"
+                                       for name, resampler in stage.resamplers.items()) or "no channels to resample"))
+    try:
+        while not stop_event.is_set():
+            if heartbeat is not None:
+                heartbeat.keep_up(reader)
+            if not reader.wait(timeout=0.5):
+                continue
+            samples, first_seq, end_seq = reader.read_new()
+            for name, derived in stage.process(samples).items():
+                if len(derived):
+                    targets[name].write(derived[:, None])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[Decimation] {reader.missed} samples missed")
+        del reader
+        source.close()
+        for ring in targets.values():
+            ring.close()
@@ -0,0 +1,97 @@
+"""
+Memoization of feature results by the sample range they were computed from.
+
+A feature computed over ring samples [first_seq, end_seq) cannot change until new
+samples are published, so FeatureCache keys every result by
+
+    (feature name, parameters, channel, first_seq, end_seq)
+
+and hands the stored result to every later request for the same key. Entries are
+evicted least recently used first, and hit/miss counters show how much work is being
+saved.
+
+The cache lives in one process. FeaturePool ([M][Supp]Feature_Pool.py) keeps one in
+the calling process, where every feature's windows are dispatched, so features that
+ask for the same window share one computation however their runs are spread over the
+workers.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class FeatureCache:
+    """
+    LRU cache of feature results keyed by feature name, parameters and sample range.
+
+    Args:
+        max_entries (int): Results kept before the least recently used is evicted.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(name, params, channel, first_seq, end_seq):
+        """Hashable key; parameters are sorted so keyword order does not matter."""
+        frozen = tuple(sorted((key, _freeze(value)) for key, value in (params or {}).items()))
+        return (name, frozen, channel, int(first_seq), int(end_seq))
+
+    def get(self, key):
+        """Stored result for key (marking it recently used), or None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, name, params, channel, first_seq, end_seq, compute):
+        """
+        Return the cached result for this feature and sample range, or call compute()
+        and cache what it returns.
+
+        Args:
+            compute (callable): Takes no arguments and returns the feature result.
+        """
+        key = self.make_key(name, params, channel, first_seq, end_seq)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters as a dict: hits, misses, evictions, entries and hit_rate."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "hit_rate": self.hits / requests if requests else 0.0}
+
+
+def _freeze(value):
+    """Hashable stand-in for parameter values such as lists, dicts and arrays."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return (value.dtype.str, value.shape, value.tobytes())
+    return value
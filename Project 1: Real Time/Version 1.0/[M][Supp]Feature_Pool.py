@@ -0,0 +1,629 @@
+"""
+Feature execution pool over the shared ring.
+
+Main_thread_V2 runs the ECG/EDA/RSP extractors as threads of one process, so the
+CPU-bound neurokit work is serialized by the GIL. FeaturePool runs them in long-lived
+worker processes instead:
+
+    - Every worker attaches to the SharedRing ([M][Supp]Shared_Ring.py) by name and
+      reads its channel in place; sample data is never pickled or sent to a worker.
+    - A scheduling thread in the calling process (FeatureScheduler,
+      [M][Supp]Feature_Scheduler.py) releases one window per job stride and hands
+      windows to idle workers earliest deadline first, coalescing windows a slow job
+      could not keep up with. Tasks and results are small messages on a Pipe per
+      worker.
+    - A worker that dies or runs one task for longer than task_timeout is replaced by
+      a fresh process; its window is abandoned and a feature that keeps taking its
+      worker down is disabled, so the other features carry on. Each worker has its own
+      Pipe, which holds no lock a dying worker could leave taken.
+
+A job names its extractor as (project file, attribute) so workers can load it
+themselves with any start method:
+
+    Streaming engines (a class, e.g. ("[M][Feat]RSP_Stream.py", "RSPStream")) are
+    created once per worker with (sampling_rate, **params), fed every new chunk via
+    update() and report features().
+
+    Window functions (a function, e.g. ("[M][Supp]Feature_Pool.py", "nk_rsp_features"))
+    are called as function(window, sampling_rate, **params) on the `window` seconds of
+    the channel that end at each release, once every `interval` seconds. Their results
+    are kept in a FeatureCache ([M][Supp]Feature_Cache.py) in the calling process, so
+    features that ask for the same window (e.g. one for the UI every second and one
+    for the CSV every five) share one computation: the second is answered from the
+    cache, or waits for the run already in flight, without using a worker.
+
+A job may read a ring other than the pool's, such as a derived stream resampled to the
+rate its extractor expects ([M][Supp]Decimate_Stage.py); it then names that ring and
+its sample rate.
+
+Extractors registered in the feature registry ([M][Supp]Feature_Registry.py) carry
+their channels, rate, window, stride and cost; FeatureJob.from_spec builds a job from
+that metadata. Distinct jobs are spread over the cores left after a reserve for ingest
+and the UI ([M][Supp]Core_Layout.py), balanced by declared cost, so throughput grows
+with the number of cores until every job has its own process. While running, the pool
+adds a worker when windows wait for a free one and are skipped or late, and retires
+one when the workers are mostly idle.
+"""
+import os
+import sys
+import time
+import queue
+import threading
+import multiprocessing
+import multiprocessing.connection
+import numpy as np
+
+from M_Supp_Loader import load_project_module
+
+shared_ring = load_project_module("[M][Supp]Shared_Ring.py")
+feature_cache = load_project_module("[M][Supp]Feature_Cache.py")
+feature_registry = load_project_module("[M][Supp]Feature_Registry.py")
+feature_scheduler = load_project_module("[M][Supp]Feature_Scheduler.py")
+core_layout = load_project_module("[M][Supp]Core_Layout.py")
+
+
+class FeatureJob:
+    """
+    One feature extractor bound to one ring channel.
+
+    Args:
+        name (str): Name the results are reported under.
+        channel (str or int): Ring channel the extractor reads.
+        extractor (tuple): (project file name, class or function name).
+        window (float or None): Seconds of signal passed to a window function.
+        interval (float): Stride: seconds of published signal between two runs.
+        params (dict or None): Extra keyword arguments for the extractor.
+        ring (str or None): SharedRing to read instead of the pool's ring.
+        sampling_rate (float or None): Sample rate of that ring; defaults to the pool's.
+        cost (float or None): Expected CPU seconds per run, used to balance the workers.
+        deadline (float or None): Seconds after a window is released by which its result
+                                  is due; defaults to the interval.
+    """
+    def __init__(self, name, channel, extractor, window=None, interval=1.0, params=None, ring=None,
+                 sampling_rate=None, cost=None, deadline=None):
+        self.name = name
+        self.channel = channel
+        self.extractor = tuple(extractor)
+        self.window = window
+        self.interval = interval
+        self.params = dict(params or {})
+        self.ring = ring
+        self.sampling_rate = sampling_rate
+        self.cost = cost
+        self.deadline = deadline
+
+    @classmethod
+    def from_spec(cls, spec, channel=None, ring=None, sampling_rate=None, params=None):
+        """
+        Job for a registered FeatureSpec, reading its first channel at its declared rate
+        unless told otherwise.
+        """
+        return cls(spec.name, channel or spec.channels[0], spec.extractor, window=spec.window,
+                   interval=spec.stride, params=params, ring=ring,
+                   sampling_rate=sampling_rate or spec.sampling_rate, cost=spec.cost)
+
+    def __repr__(self):
+        return f"FeatureJob({self.name!r}, channel={self.channel!r}, extractor={self.extractor})"
+
+
+class _Runner:
+    """A job as it runs inside a worker."""
+    def __init__(self, job, ring, sampling_rate):
+        self.job = job
+        self.ring = ring
+        self.sampling_rate = sampling_rate
+        # Loaded once per worker; the module stays in sys.modules for later jobs
+        target = feature_registry.load_extractor(job.extractor)
+        self.streaming = isinstance(target, type)
+        self.reader = ring.reader()
+        if self.streaming:
+            self.engine = target(sampling_rate, **job.params)
+        else:
+            self.function = target
+            self.window_samples = window_samples(job, ring.capacity, sampling_rate)
+
+    def run(self, end_seq):
+        """
+        Run the job: a window function on the window ending at end_seq, a streaming
+        engine on everything new. Returns a result dict, or None if there is nothing new.
+        """
+        if self.streaming:
+            segments, first_seq, end_seq = self.reader.view_new(channel=self.job.channel)
+            if end_seq == first_seq:
+                return None
+            start = time.perf_counter()
+            for segment in segments:
+                self.engine.update(segment)
+            del segments
+            features = self.engine.features()
+            intact = self.reader.intact(first_seq)
+        else:
+            start = time.perf_counter()
+            first_seq = max(0, end_seq - self.window_samples)
+            segments = self.reader.view_range(first_seq, end_seq, channel=self.job.channel)
+            # A window that wraps is joined in this process
+            window = segments[0] if len(segments) == 1 else np.concatenate(segments)
+            del segments
+            features = self.function(window, self.sampling_rate, **self.job.params)
+            del window
+            intact = self.reader.intact(first_seq)
+            if not intact:
+                # The writer overwrote part of the window while it was being used
+                features = None
+        return {"job": self.job.name, "first_seq": first_seq, "end_seq": end_seq, "features": features,
+                "intact": intact, "elapsed": time.perf_counter() - start, "worker": os.getpid()}
+
+
+def window_samples(job, capacity, sampling_rate):
+    """Samples in the window of a window-function job (the whole ring when it gives none)."""
+    return min(int((job.window or capacity / sampling_rate) * sampling_rate), capacity)
+
+
+def feature_worker(index, ring_name, sampling_rate, connection, stop_event):
+    """
+    Process target: run the (job, end_seq) tasks the scheduler sends on connection until
+    it sends None or stop_event is set. Rings and extractors are set up the first time a
+    job needs them; every task is answered with exactly one message on the same connection.
+    """
+    rings = {}
+    runners = {}
+    try:
+        while not stop_event.is_set():
+            if not connection.poll(0.5):
+                continue
+            message = connection.recv()
+            if message is None:
+                break
+            job, end_seq = message
+            try:
+                runner = runners.get(job.name)
+                if runner is None:
+                    name = job.ring or ring_name
+                    if name not in rings:
+                        rings[name] = shared_ring.SharedRing.attach(name)
+                    runner = runners[job.name] = _Runner(job, rings[name], job.sampling_rate or sampling_rate)
+                result = runner.run(end_seq) or {"job": job.name, "features": None}
+            except Exception as e:
+                result = {"job": job.name, "error": repr(e)}
+            result["worker"] = os.getpid()
+            result["worker_index"] = index
+            connection.send(result)
+    except (KeyboardInterrupt, EOFError, BrokenPipeError):
+        pass
+    finally:
+        # Streaming readers hold no views between runs; drop everything before closing
+        del runners
+        for ring in rings.values():
+            ring.close()
+
+
+class FeaturePool:
+    """
+    Long-lived worker processes running FeatureJobs over a SharedRing, dispatched by a
+    FeatureScheduler ([M][Supp]Feature_Scheduler.py) in a thread of the calling process.
+
+    Args:
+        ring_name (str): Name of the SharedRing to read.
+        jobs (list of FeatureJob): Extractors to run.
+        sampling_rate (float): Sample rate of the ring's channels in Hz.
+        doorbell (Doorbell or None): Doorbell rung by every ring the jobs read; the
+                                     scheduler sleeps on it while nothing is running
+                                     (without one, it polls).
+        workers (int or None): Most processes; defaults to the core budget
+                               (Core_Layout.worker_budget(reserve)), and is never more
+                               than the number of distinct jobs.
+        tick (float): Seconds between scheduling passes while work is in flight.
+        task_timeout (float): Seconds a task may run before its worker counts as hung and
+                              is replaced.
+        max_failures (int): Lost tasks after which a feature is disabled.
+        reserve (int): Cores kept free for ingest and the UI.
+        autoscale (bool): Grow and shrink the pool at runtime (see _scale).
+        scale_interval (float): Seconds between scaling decisions.
+        placement (Placement or None): Cores and nice level of every worker
+                                       (Core_Layout.plan_layout()["worker"]).
+        cache_entries (int): Window results kept for features that ask for the same window.
+    """
+    def __init__(self, ring_name, jobs, sampling_rate, doorbell=None, workers=None, tick=0.005,
+                 task_timeout=30.0, max_failures=3, reserve=core_layout.DEFAULT_RESERVE, autoscale=True,
+                 scale_interval=5.0, placement=None, cache_entries=256):
+        self.ring_name = ring_name
+        self.jobs = list(jobs)
+        self.sampling_rate = sampling_rate
+        self.doorbell = doorbell
+        self.tick = tick
+        self.task_timeout = task_timeout
+        self.max_failures = max_failures
+        # Jobs computing the same feature of the same samples share one run
+        groups = {}
+        for job in self.jobs:
+            key = feature_cache.FeatureCache.make_key(job.extractor, job.params, job.channel, 0, 0) + (
+                job.window, job.interval, job.ring, job.sampling_rate)
+            groups.setdefault(key, []).append(job)
+        self.job_groups = list(groups.values())
+        # Start with every worker the budget allows; _scale retires the ones not needed
+        self.reserve = reserve
+        self.max_workers = max(1, min(workers or core_layout.worker_budget(reserve), len(self.job_groups)))
+        self.n_workers = self.max_workers
+        self.min_workers = 1
+        self.autoscale = autoscale
+        self.scale_interval = scale_interval
+        self.placement = placement
+        self.results = queue.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.processes = []
+        self.scheduler = None
+        self.restarts = 0
+        self._connections = []
+        self._busy = 0.0      # seconds of completed tasks since the last scaling decision
+        self._starved = False  # a ready task waited while every worker was busy
+        self._lost = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._rings = {}
+        # Window results by (extractor@ring, params, channel, range), shared by all features
+        self.cache = feature_cache.FeatureCache(cache_entries)
+        self._windows = []     # per group: (name, params, channel, window samples), None when streaming
+        self._computing = {}   # cache key -> tasks waiting for the run in flight
+
+    def assign(self):
+        """
+        Split the groups of identical jobs over the workers: the most expensive group
+        goes to the least loaded worker first. Jobs without a declared cost count as
+        the mean declared cost (or 1 when none is declared). Streaming engines keep
+        state, so they always run on the worker they are assigned to here.
+
+        Returns:
+            list of list of FeatureJob, one list per worker.
+        """
+        costs = [group[0].cost for group in self.job_groups if group[0].cost is not None]
+        default = sum(costs) / len(costs) if costs else 1.0
+        loads = [0.0] * self.n_workers
+        assignment = [[] for _ in range(self.n_workers)]
+        order = sorted(self.job_groups, key=lambda group: -(group[0].cost if group[0].cost is not None else default))
+        for group in order:
+            index = loads.index(min(loads))
+            assignment[index].extend(group)
+            loads[index] += group[0].cost if group[0].cost is not None else default
+        return assignment
+
+    def start(self):
+        """Start the workers and the scheduling thread."""
+        pins = {}
+        worker_of = {id(job): index for index, jobs in enumerate(self.assign()) for job in jobs}
+        for job in self.jobs:
+            name = job.ring or self.ring_name
+            if name not in self._rings:
+                self._rings[name] = shared_ring.SharedRing.attach(name, self.doorbell)
+        self._windows = []
+        for index, group in enumerate(self.job_groups):
+            job = group[0]
+            if isinstance(feature_registry.load_extractor(job.extractor), type):
+                pins[index] = worker_of[id(job)]
+                self._windows.append(None)
+                continue
+            # Derived rings reuse sequence numbers, so the ring is part of the cache key
+            name = job.ring or self.ring_name
+            self._windows.append(("/".join(job.extractor) + "@" + name, job.params, job.channel,
+                                  window_samples(job, self._rings[name].capacity,
+                                                 job.sampling_rate or self.sampling_rate)))
+        # Workers holding streaming engines are never retired
+        self.min_workers = max(pins.values()) + 1 if pins else 1
+        self.scheduler = feature_scheduler.FeatureScheduler(self.job_groups, self._rings, self.ring_name,
+                                                            self.sampling_rate, pins)
+        self.processes = [None] * self.n_workers
+        self._connections = [None] * self.n_workers
+        for index in range(self.n_workers):
+            self._start_worker(index)
+        self._thread = threading.Thread(target=self._dispatch, name="FeatureScheduler", daemon=True)
+        self._thread.start()
+        print(f"[FeaturePool] {len(self.jobs)} jobs on {self.n_workers} worker processes "
+              f"({core_layout.describe(self.reserve)})")
+
+    def _start_worker(self, index):
+        """Start (or replace) worker `index` with a fresh Pipe."""
+        connection, worker_end = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=feature_worker, name=f"FeatureWorker-{index}",
+            args=(index, self.ring_name, self.sampling_rate, worker_end, self.stop_event))
+        process.start()
+        # Only the worker keeps its end open, so its death shows up as EOF here
+        worker_end.close()
+        if self.placement is not None:
+            print(f"[FeaturePool] Worker {index} (pid {process.pid}): {self.placement.apply(process.pid)}")
+        self.processes[index] = process
+        self._connections[index] = connection
+
+    def _replace_worker(self, index, task, reason, failed=True):
+        """
+        Kill worker `index`, abandon the task it was running and start a new worker in
+        its place. Streaming engines it held restart from the next samples.
+
+        With failed=False the task (if any) never reached the worker: it is handed back
+        to the scheduler to run on the new worker, and nothing is charged to its feature.
+        """
+        process = self.processes[index]
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+        process.join(timeout=1)
+        self._connections[index].close()
+        if task is None or not failed:
+            if task is not None:
+                with self._lock:
+                    self.scheduler.abandon(task, failed=False)
+            print(f"[FeaturePool] Worker {index} {reason} while idle; starting a new worker")
+            self.restarts += 1
+            self._start_worker(index)
+            return
+        self._hand_back_waiters(task)
+        with self._lock:
+            failures = self.scheduler.abandon(task)
+            jobs = self.scheduler.jobs(task)
+            if failures >= self.max_failures:
+                self.scheduler.disable(task.group)
+        names = ", ".join(job.name for job in jobs)
+        print(f"[FeaturePool] Worker {index} {reason} while running {names}; starting a new worker")
+        error = f"worker {reason}"
+        if failures >= self.max_failures:
+            print(f"[FeaturePool] {names} disabled after {failures} lost tasks")
+            error += f"; disabled after {failures} lost tasks"
+        for job in jobs:
+            self.results.put({"job": job.name, "error": error, "worker": process.pid, "worker_index": index})
+        self.restarts += 1
+        self._start_worker(index)
+
+    def _window_key(self, task):
+        """Cache key of the window a task computes, or None for a streaming engine."""
+        window = self._windows[task.group]
+        if window is None:
+            return None
+        name, params, channel, n = window
+        return feature_cache.FeatureCache.make_key(name, params, channel, max(0, task.end_seq - n), task.end_seq)
+
+    def _hand_back_waiters(self, task):
+        """The run of `task` was lost: the tasks waiting for its window run themselves."""
+        waiters = self._computing.pop(self._window_key(task), [])
+        with self._lock:
+            for waiter in waiters:
+                self.scheduler.abandon(waiter, failed=False)
+
+    def _deliver(self, task, result):
+        """Complete a task and queue its result for every job of its feature."""
+        with self._lock:
+            lag, late = self.scheduler.complete(task)
+            jobs = self.scheduler.jobs(task)
+        if result.get("features") is None and "error" not in result:
+            return
+        for job in jobs:
+            self.results.put(dict(result, job=job.name, lag=lag, late=late, skipped=task.skipped))
+
+    def _scale(self, in_flight, started, elapsed):
+        """
+        Scaling decision over the last `elapsed` seconds. A worker is added when windows
+        were skipped or late while a ready task waited for a free worker, or when the
+        workers were more than 80% busy; windows lost to one slow feature do not count,
+        since a feature never runs on two workers at once. The newest worker is retired
+        when nothing was lost and the workers were less than 25% busy.
+        """
+        with self._lock:
+            lost = self.scheduler.lost()
+        new_lost = lost - self._lost
+        self._lost = lost
+        busy = self._busy / (len(self.processes) * elapsed)
+        starved = self._starved
+        self._busy = 0.0
+        self._starved = False
+        count = len(self.processes)
+        if ((new_lost and starved) or busy > 0.8) and count < self.max_workers:
+            self.processes.append(None)
+            self._connections.append(None)
+            in_flight.append(None)
+            started.append(0.0)
+            self._start_worker(count)
+            print(f"[FeaturePool] {busy:.0%} busy, {new_lost} windows lost: added worker {count} "
+                  f"({count + 1} running)")
+        elif not new_lost and busy < 0.25 and count > self.min_workers and in_flight[-1] is None:
+            process = self.processes.pop()
+            connection = self._connections.pop()
+            in_flight.pop()
+            started.pop()
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+            connection.close()
+            print(f"[FeaturePool] {busy:.0%} busy: retired worker {count - 1} ({count - 1} running)")
+        self.n_workers = len(self.processes)
+
+    def _check_workers(self, in_flight, started):
+        """Replace workers that died (running a task or idle) or hung while running a task."""
+        if self.stop_event.is_set():
+            # Workers exit on their own once the pool is stopping
+            return
+        now = time.monotonic()
+        for index, task in enumerate(in_flight):
+            process = self.processes[index]
+            if task is None:
+                if not process.is_alive():
+                    self._replace_worker(index, None, f"exited with code {process.exitcode}")
+                continue
+            if not process.is_alive():
+                reason = f"exited with code {process.exitcode}"
+            elif now - started[index] > self.task_timeout:
+                reason = f"hung for {now - started[index]:.1f} s"
+            else:
+                continue
+            in_flight[index] = None
+            self._replace_worker(index, task, reason)
+
+    def _dispatch(self):
+        """
+        Scheduling thread: release windows, hand them to idle workers, forward results
+        and replace workers that died or hung.
+        """
+        in_flight = [None] * self.n_workers
+        started = [0.0] * self.n_workers
+        window_start = time.monotonic()
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            if self.autoscale and now - window_start >= self.scale_interval:
+                self._scale(in_flight, started, now - window_start)
+                window_start = now
+            unsent = []
+            served = []
+            with self._lock:
+                self.scheduler.release()
+                for index, task in enumerate(in_flight):
+                    if task is None:
+                        task = self.scheduler.next_task(index)
+                        if task is None:
+                            continue
+                        key = self._window_key(task)
+                        if key in self._computing:
+                            # Another feature is computing this very window; share its run
+                            self._computing[key].append(task)
+                            continue
+                        cached = self.cache.get(key) if key is not None else None
+                        if cached is not None:
+                            served.append((task, cached))
+                            continue
+                        try:
+                            self._connections[index].send((self.scheduler.jobs(task)[0], task.end_seq))
+                        except (BrokenPipeError, OSError):
+                            # The worker died while idle; the task goes back to the scheduler
+                            unsent.append((index, task))
+                            continue
+                        if key is not None:
+                            self._computing[key] = []
+                        in_flight[index] = task
+                        started[index] = time.monotonic()
+                if all(in_flight) and self.scheduler.waiting():
+                    self._starved = True
+            for task, result in served:
+                self._deliver(task, result)
+            for index, task in unsent:
+                process = self.processes[index]
+                process.join(timeout=0.1)
+                self._replace_worker(index, task, f"exited with code {process.exitcode}", failed=False)
+            if not any(in_flight):
+                # Nothing running: sleep until a ring crosses a stride boundary
+                if self.doorbell is not None:
+                    self.doorbell.wait_for(lambda: self.stop_event.is_set() or self.scheduler.due(), 0.5)
+                else:
+                    time.sleep(self.tick)
+                continue
+            busy = [self._connections[index] for index, task in enumerate(in_flight) if task is not None]
+            for connection in multiprocessing.connection.wait(busy, timeout=self.tick):
+                index = self._connections.index(connection)
+                try:
+                    result = connection.recv()
+                except (EOFError, OSError):
+                    # The worker is gone; _check_workers replaces it
+                    continue
+                task = in_flight[index]
+                in_flight[index] = None
+                self._busy += time.monotonic() - started[index]
+                self._deliver(task, result)
+                key = self._window_key(task)
+                waiters = self._computing.pop(key, [])
+                if key is not None and result.get("features") is not None and "error" not in result:
+                    self.cache.put(key, result)
+                    for waiter in waiters:
+                        self._deliver(waiter, self.cache.get(key))
+                else:
+                    # A torn window or an error: the features waiting for it get the same
+                    for waiter in waiters:
+                        self._deliver(waiter, result)
+            self._check_workers(in_flight, started)
+
+    def get(self, timeout=None):
+        """Next result dict, or None if none arrives within timeout seconds."""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def report(self):
+        """Per-feature lag, deadline misses and skipped windows (see FeatureScheduler.report)."""
+        if self.scheduler is None:
+            return {}
+        with self._lock:
+            return self.scheduler.report()
+
+    def stop(self, timeout=5):
+        """Signal the workers to finish and wait for them; stragglers are terminated."""
+        self.stop_event.set()
+        if self.doorbell is not None:
+            self.doorbell.ring()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        self.processes = []
+        self._connections = []
+        for name, stats in self.report().items():
+            print(f"[FeaturePool] {name}: {stats['runs']} runs, {stats['skipped']} windows skipped, "
+                  f"{stats['misses']} deadlines missed, lag {stats['lag_mean'] * 1000:.1f} ms mean / "
+                  f"{stats['lag_max'] * 1000:.1f} ms max"
+                  + (f", {stats['failures']} tasks lost" if stats["failures"] else "")
+                  + (" (disabled)" if stats["disabled"] else ""))
+        if self.restarts:
+            print(f"[FeaturePool] {self.restarts} workers replaced")
+        if self.cache.hits or self.cache.misses:
+            print(f"[FeaturePool] Window cache: {self.cache.stats()}")
+        for ring in self._rings.values():
+            ring.close()
+        self._rings = {}
+
+
+# Window functions: the batch neurokit features of [M][Lead]Main_thread_V2.py as plain
+# functions of one window, registered at the rates and windows used there. neurokit is
+# only imported inside the workers that use them.
+
+@feature_registry.feature("ECG_HRV", channels=["ECG"], sampling_rate=100, window=60, stride=1.0,
+                          outputs=["HRV_RMSSD", "HRV_SDNN", "HRV_pNN50"], cost=0.01)
+def nk_ecg_features(window, sampling_rate):
+    """RMSSD, SDNN and pNN50 of a window of ECG (nk.ecg_peaks + nk.hrv_time)."""
+    import neurokit2 as nk
+    peaks, _ = nk.ecg_peaks(window, sampling_rate=sampling_rate)
+    hrv = nk.hrv_time(peaks, sampling_rate=sampling_rate)
+    return {"HRV_RMSSD": float(hrv["HRV_RMSSD"].iloc[0]), "HRV_SDNN": float(hrv["HRV_SDNN"].iloc[0]),
+            "HRV_pNN50": float(hrv["HRV_pNN50"].iloc[0])}
+
+
+@feature_registry.feature("EDA_Phasic", channels=["EDA"], sampling_rate=250, window=10, stride=1.0,
+                          outputs=["EDA_Tonic_Mean", "EDA_Tonic_Min", "EDA_Tonic_Max",
+                                   "EDA_Phasic_Mean", "EDA_Phasic_Min", "EDA_Phasic_Max"], cost=0.004)
+def nk_eda_features(window, sampling_rate):
+    """Tonic and phasic mean, min and max of a standardized window of EDA (nk.eda_phasic)."""
+    import neurokit2 as nk
+    decomposed = nk.eda_phasic(nk.standardize(window), sampling_rate=sampling_rate)
+    tonic = decomposed["EDA_Tonic"].to_numpy()
+    phasic = decomposed["EDA_Phasic"].to_numpy()
+    return {"EDA_Tonic_Mean": tonic.mean(), "EDA_Tonic_Min": tonic.min(), "EDA_Tonic_Max": tonic.max(),
+            "EDA_Phasic_Mean": phasic.mean(), "EDA_Phasic_Min": phasic.min(), "EDA_Phasic_Max": phasic.max()}
+
+
+@feature_registry.feature("RSP_Process", channels=["RSP"], sampling_rate=100, window=480, stride=1.0,
+                          outputs=["RSP_Rate", "RSP_Amplitude"], cost=0.2)
+def nk_rsp_features(window, sampling_rate):
+    """Mean breath rate and median amplitude of a window of respiration (nk.rsp_process)."""
+    import neurokit2 as nk
+    signals, _ = nk.rsp_process(window, sampling_rate=sampling_rate)
+    return {"RSP_Rate": float(np.nanmean(signals["RSP_Rate"])),
+            "RSP_Amplitude": float(np.nanmedian(signals["RSP_Amplitude"]))}
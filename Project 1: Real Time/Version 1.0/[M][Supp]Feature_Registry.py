@@ -0,0 +1,142 @@
+"""
+Registry of feature extractors and what they need to run.
+
+A feature module registers its extractors with the @feature decorator:
+
+    @feature_registry.feature("RSP", channels=["RSP"], sampling_rate=100, window=480, stride=1.0,
+                              outputs=["RSP_Rate", "RSP_Amplitude"], cost=0.2)
+    def nk_rsp_features(window, sampling_rate): ...
+
+The metadata (FeatureSpec) says which channels an extractor reads, the sample rate it
+is written for, how many seconds of signal it looks at, how often it runs, what it
+reports and roughly how much CPU one run takes. FeaturePool turns specs into jobs
+(FeatureJob.from_spec), spreads them over its workers by cost, and the ring and
+decimation stage can be sized from the windows and rates instead of every feature
+re-reading the full buffer at its own pace.
+
+Plugins are loaded with load_plugin(). A module is executed once per process (it is
+kept in sys.modules), so a worker that loads its extractors pays the import once.
+"""
+import os
+import sys
+
+from M_Supp_Loader import PROJECT_DIR, module_name_for, load_project_module
+
+# Feature name -> FeatureSpec, for every plugin loaded in this process
+REGISTRY = {}
+
+
+class FeatureSpec:
+    """
+    Metadata of one registered extractor.
+
+    Args:
+        name (str): Feature name results are reported under.
+        extractor (tuple): (project file name or path, class or function name).
+        channels (list of str): Ring channels the extractor reads.
+        sampling_rate (float or None): Sample rate it is written for (None: any rate).
+        window (float or None): Seconds of signal per run; None for streaming engines,
+                                which see every sample once.
+        stride (float): Seconds between runs.
+        outputs (list of str): Names of the values it reports.
+        cost (float or None): Expected CPU seconds per run.
+        streaming (bool): True for an engine class with update()/features().
+    """
+    def __init__(self, name, extractor, channels, sampling_rate=None, window=None, stride=1.0, outputs=(),
+                 cost=None, streaming=False):
+        self.name = name
+        self.extractor = tuple(extractor)
+        self.channels = list(channels)
+        self.sampling_rate = sampling_rate
+        self.window = window
+        self.stride = stride
+        self.outputs = list(outputs)
+        self.cost = cost
+        self.streaming = streaming
+
+    def window_samples(self, sampling_rate=None):
+        """Samples one run reads at sampling_rate (defaults to the declared rate)."""
+        rate = sampling_rate or self.sampling_rate
+        return int(round((self.window or self.stride) * rate)) if rate else None
+
+    @property
+    def load(self):
+        """Expected fraction of one core the extractor keeps busy (cost / stride)."""
+        return self.cost / self.stride if self.cost is not None and self.stride else None
+
+    def __repr__(self):
+        return (f"FeatureSpec({self.name!r}, extractor={self.extractor}, channels={self.channels}, "
+                f"sampling_rate={self.sampling_rate}, window={self.window}, stride={self.stride})")
+
+
+def feature(name, channels, sampling_rate=None, window=None, stride=1.0, outputs=(), cost=None):
+    """
+    Decorator registering a window function or streaming engine class as a feature.
+
+    The decorated object is returned unchanged, with its FeatureSpec attached as
+    `feature_spec`.
+
+    Raises:
+        ValueError: If a different extractor is already registered under the name.
+    """
+    def register(target):
+        module = sys.modules[target.__module__]
+        path = os.path.abspath(module.__file__)
+        # Project files are referred to by name so workers can load them with any start method
+        file_name = os.path.basename(path) if os.path.dirname(path) == PROJECT_DIR else path
+        spec = FeatureSpec(name, (file_name, target.__qualname__), channels, sampling_rate, window, stride,
+                           outputs, cost, streaming=isinstance(target, type))
+        existing = REGISTRY.get(name)
+        if existing is not None and existing.extractor != spec.extractor:
+            raise ValueError(f"Feature {name!r} is already registered by {existing.extractor}")
+        REGISTRY[name] = spec
+        target.feature_spec = spec
+        return target
+    return register
+
+
+def load_plugin(file_name):
+    """
+    Load a feature module (a project file name or a path) and return its FeatureSpecs.
+
+    The module is executed only the first time it is loaded in this process.
+    """
+    module = load_project_module(file_name)
+    module_name = module.__name__
+    return [value.feature_spec for value in vars(module).values()
+            if getattr(value, "feature_spec", None) is not None
+            and getattr(value, "__module__", None) == module_name]
+
+
+def load_extractor(extractor):
+    """The class or function named by an extractor tuple (file name or path, attribute)."""
+    file_name, attribute = extractor
+    load_plugin(file_name)
+    return getattr(sys.modules[module_name_for(file_name)], attribute)
+
+
+def get(name):
+    """Registered FeatureSpec by feature name. Raises KeyError if it is not loaded."""
+    return REGISTRY[name]
+
+
+def ring_seconds(specs):
+    """Seconds of history a ring must hold for every spec to read a full window."""
+    return max([spec.window or spec.stride for spec in specs] or [0.0])
+
+
+def channel_rates(specs):
+    """
+    Channel -> sample rate the specs reading it are written for, for the decimation stage.
+
+    Raises:
+        ValueError: If two specs want the same channel at different rates.
+    """
+    rates = {}
+    for spec in specs:
+        if spec.sampling_rate is None:
+            continue
+        for channel in spec.channels:
+            if rates.setdefault(channel, spec.sampling_rate) != spec.sampling_rate:
+                raise ValueError(f"Channel {channel!r} is wanted at {rates[channel]} and {spec.sampling_rate} Hz")
+    return rates
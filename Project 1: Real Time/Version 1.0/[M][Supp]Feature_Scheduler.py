@@ -0,0 +1,208 @@
+"""
+Deadline-aware scheduling of feature runs.
+
+Every feature (a group of identical FeatureJobs, [M][Supp]Feature_Pool.py) is released
+once per stride of published samples: when its ring's write count crosses the next
+multiple of stride * sampling_rate, a Task for the window ending there becomes ready,
+due `deadline` seconds later (the stride unless the job says otherwise).
+
+    - Ready tasks are handed to idle workers earliest deadline first.
+    - A feature has at most one task waiting. If it is released again before its
+      waiting task was dispatched (the system is behind), the stale window is replaced
+      by the newest one and counted as skipped instead of being queued.
+    - A feature never runs on two workers at once, and a streaming engine always runs
+      on the worker that holds its state.
+
+A slow extractor therefore loses windows of its own feature while the others keep to
+their strides. report() gives per-feature lag (release to result), deadline misses and
+skipped windows.
+
+A task whose worker crashed or hung is abandoned: its window counts as skipped and the
+failure is charged to the feature, which the pool disables once it keeps failing so
+one bad feature script cannot take the session down. A task that never reached its
+worker (the worker had already died) is handed back ready instead, without a failure.
+"""
+import time
+
+
+class Task:
+    """One window of one feature, ready to run."""
+    __slots__ = ("group", "end_seq", "release", "deadline", "skipped")
+
+    def __init__(self, group, end_seq, release, deadline, skipped=0):
+        self.group = group
+        self.end_seq = end_seq
+        self.release = release
+        self.deadline = deadline
+        self.skipped = skipped
+
+    def __repr__(self):
+        return f"Task(group={self.group}, end_seq={self.end_seq}, deadline={self.deadline:.3f})"
+
+
+class _Slot:
+    """Scheduling state and statistics of one feature."""
+    def __init__(self, jobs, ring, stride_samples, deadline, pin):
+        self.jobs = jobs
+        self.ring = ring
+        self.stride_samples = stride_samples
+        self.deadline = deadline
+        self.pin = pin
+        # Windows are released from the first stride boundary after the pool starts, not
+        # for the samples published before it (which would start the feature behind)
+        count = ring.write_count
+        self.released = count - count % stride_samples
+        self.pending = None
+        self.running = None
+        self.runs = 0
+        self.skipped = 0
+        self.misses = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.lag_last = 0.0
+        self.failures = 0
+        self.disabled = False
+
+
+class FeatureScheduler:
+    """
+    Earliest-deadline-first release and dispatch of feature windows.
+
+    Args:
+        groups (list of list of FeatureJob): Features; the jobs of a group share one run.
+        rings (dict): Ring name -> SharedRing, used only to read write counts.
+        default_ring (str): Ring of jobs that do not name one.
+        sampling_rate (float): Sample rate of jobs that do not give one.
+        pins (dict or None): Group index -> worker index for groups that must always run
+                             on the same worker (streaming engines).
+    """
+    def __init__(self, groups, rings, default_ring, sampling_rate, pins=None):
+        pins = pins or {}
+        self.slots = []
+        for index, jobs in enumerate(groups):
+            job = jobs[0]
+            rate = job.sampling_rate or sampling_rate
+            stride = job.interval
+            deadline = job.deadline or stride
+            self.slots.append(_Slot(jobs, rings[job.ring or default_ring], max(1, int(round(stride * rate))),
+                                    deadline, pins.get(index)))
+
+    def _due_end(self, slot):
+        count = slot.ring.write_count
+        return count - count % slot.stride_samples
+
+    def due(self):
+        """True if some feature has crossed a stride boundary since it was last released."""
+        return any(not slot.disabled and self._due_end(slot) > slot.released for slot in self.slots)
+
+    def release(self, now=None):
+        """Create tasks for every feature whose ring crossed a stride boundary."""
+        now = time.monotonic() if now is None else now
+        for index, slot in enumerate(self.slots):
+            end = self._due_end(slot)
+            if slot.disabled or end <= slot.released:
+                continue
+            # Only the newest window is kept; older ones (and a waiting task) are coalesced into it
+            dropped = (end - slot.released) // slot.stride_samples - 1
+            carried = 0
+            if slot.pending is not None:
+                dropped += 1
+                carried = slot.pending.skipped
+            slot.skipped += dropped
+            slot.pending = Task(index, end, now, now + slot.deadline, dropped + carried)
+            slot.released = end
+
+    def waiting(self):
+        """Ready tasks that could run now if a worker were free."""
+        return sum(slot.pending is not None and slot.running is None for slot in self.slots)
+
+    def lost(self):
+        """Windows skipped plus deadlines missed so far, over all features."""
+        return sum(slot.skipped + slot.misses for slot in self.slots)
+
+    def next_task(self, worker):
+        """
+        Ready task with the earliest deadline that this worker may run, or None. The task
+        is marked as running until complete() is called for it.
+        """
+        best = None
+        for slot in self.slots:
+            task = slot.pending
+            if task is None or slot.running is not None or slot.pin not in (None, worker):
+                continue
+            if best is None or task.deadline < best.deadline:
+                best = task
+        if best is not None:
+            slot = self.slots[best.group]
+            slot.pending = None
+            slot.running = best
+        return best
+
+    def complete(self, task, now=None):
+        """
+        Record that a task finished.
+
+        Returns:
+            (lag, late): seconds from release to completion and whether the deadline
+            was missed.
+        """
+        now = time.monotonic() if now is None else now
+        slot = self.slots[task.group]
+        slot.running = None
+        lag = now - task.release
+        late = now > task.deadline
+        slot.runs += 1
+        slot.misses += late
+        slot.lag_total += lag
+        slot.lag_max = max(slot.lag_max, lag)
+        slot.lag_last = lag
+        return lag, late
+
+    def abandon(self, task, failed=True):
+        """
+        Record that a task was lost with its worker. The window counts as skipped.
+
+        With failed=False the task never reached the worker: it is ready again (unless a
+        newer window of the feature replaced it meanwhile) and no failure is charged.
+
+        Returns:
+            Number of tasks of this feature lost so far.
+        """
+        slot = self.slots[task.group]
+        slot.running = None
+        if not failed:
+            if slot.pending is None:
+                slot.pending = task
+            else:
+                slot.pending.skipped += 1 + task.skipped
+                slot.skipped += 1
+            return slot.failures
+        slot.skipped += 1
+        slot.failures += 1
+        return slot.failures
+
+    def disable(self, group):
+        """Stop releasing windows of a feature (e.g. one that keeps crashing its worker)."""
+        slot = self.slots[group]
+        slot.disabled = True
+        slot.pending = None
+
+    def jobs(self, task):
+        return self.slots[task.group].jobs
+
+    def report(self):
+        """
+        Per-feature statistics keyed by job name: runs, skipped windows, deadline misses,
+        mean/max/last lag in seconds, whether a window is waiting, lost tasks and whether
+        the feature was disabled.
+        """
+        report = {}
+        for slot in self.slots:
+            stats = {"runs": slot.runs, "skipped": slot.skipped, "misses": slot.misses,
+                     "lag_mean": slot.lag_total / slot.runs if slot.runs else 0.0,
+                     "lag_max": slot.lag_max, "lag_last": slot.lag_last,
+                     "waiting": slot.pending is not None, "failures": slot.failures,
+                     "disabled": slot.disabled}
+            for job in slot.jobs:
+                report[job.name] = stats
+        return report
@@ -0,0 +1,202 @@
+"""
+Incremental per-channel statistics over a sliding window of samples.
+
+RollingStats is fed each newly published chunk (e.g. from RingReader.read_new()) and
+keeps, for every channel, the count, sum, mean, variance, min and max of the newest
+`window` samples. An update costs O(chunk) no matter how long the window is:
+
+    - sum / mean / variance: the chunk entering and the samples leaving the window are
+      each summarized in one vectorized pass and merged into (or removed from) the
+      window's Welford state with the Chan et al. pairwise formulas.
+    - min / max: monotonic deques holding only the samples that can still become the
+      window's extreme; each sample is pushed and popped at most once.
+
+NaN samples (the BIOPAC bridge sends NaN when no sample is available) are ignored
+by every statistic, like numpy's nan* functions; valid_count gives the number of
+non-NaN samples per channel.
+"""
+from collections import deque
+import numpy as np
+
+
+class RollingStats:
+    """
+    Rolling statistics for a (samples x channels) stream.
+
+    Args:
+        window (int): Number of most recent samples the statistics cover.
+        n_channels (int): Values per sample.
+        resync_every (int): Recompute the moments exactly every this many updates, to
+                            wash out floating point drift from repeated removals.
+    """
+    def __init__(self, window, n_channels, resync_every=1000):
+        self.window = int(window)
+        self.n_channels = int(n_channels)
+        self.resync_every = resync_every
+
+        # Copy of the samples currently in the window (needed to remove them later)
+        self._values = np.zeros((self.window, self.n_channels), dtype=np.float64)
+        self.seen = 0  # samples fed so far; sample k is stored at slot k % window
+
+        # Welford state of the window
+        self.count = 0                                  # samples in the window
+        self._n = np.zeros(self.n_channels)             # non-NaN samples per channel
+        self.sum = np.zeros(self.n_channels)
+        self._mean = np.zeros(self.n_channels)
+        self._m2 = np.zeros(self.n_channels)
+        self._updates = 0
+
+        # Monotonic deques of (sample index, value), one per channel
+        self._max_deques = [deque() for _ in range(self.n_channels)]
+        self._min_deques = [deque() for _ in range(self.n_channels)]
+
+    def update(self, chunk):
+        """
+        Add a chunk of new samples; samples pushed out of the window are removed.
+
+        Args:
+            chunk (array-like): Shape (n_samples, n_channels).
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(-1, self.n_channels)
+        if len(chunk) == 0:
+            return
+        if len(chunk) >= self.window:
+            # The whole window is replaced: start over from the newest samples
+            self.seen += len(chunk) - self.window
+            chunk = chunk[-self.window:]
+            self._reset_moments()
+            for dq in self._max_deques + self._min_deques:
+                dq.clear()
+
+        first = self.seen
+        n_new = len(chunk)
+        n_out = max(0, self.count + n_new - self.window)
+
+        # Remove the oldest samples that fall out of the window
+        if n_out:
+            self._remove(self._slots(first - self.count, n_out))
+
+        # Add the new chunk
+        self._add(chunk)
+        self._store(first, chunk)
+        self._push_extremes(first, chunk)
+        self.seen += n_new
+
+        # Drop deque entries that left the window
+        window_start = self.seen - self.count
+        for dq in self._max_deques + self._min_deques:
+            while dq and dq[0][0] < window_start:
+                dq.popleft()
+
+        self._updates += 1
+        if self.resync_every and self._updates % self.resync_every == 0:
+            self.resync()
+
+    def _slots(self, start, n):
+        """Stored values of samples [start, start + n) in order."""
+        idx = np.arange(start, start + n) % self.window
+        return self._values[idx]
+
+    def _store(self, first, chunk):
+        start = first % self.window
+        head = min(len(chunk), self.window - start)
+        self._values[start:start + head] = chunk[:head]
+        self._values[:len(chunk) - head] = chunk[head:]
+
+    def _reset_moments(self):
+        self.count = 0
+        self._n[:] = 0
+        self.sum[:] = 0
+        self._mean[:] = 0
+        self._m2[:] = 0
+
+    @staticmethod
+    def _block_moments(block):
+        """Per-channel (count, sum, mean, M2) of a block, ignoring NaN."""
+        valid = ~np.isnan(block)
+        n_b = valid.sum(axis=0).astype(np.float64)
+        sum_b = np.where(valid, block, 0.0).sum(axis=0)
+        mean_b = np.divide(sum_b, n_b, out=np.zeros_like(sum_b), where=n_b > 0)
+        m2_b = np.where(valid, (block - mean_b) ** 2, 0.0).sum(axis=0)
+        return n_b, sum_b, mean_b, m2_b
+
+    def _add(self, block):
+        """Merge a block into the window's Welford state (Chan et al.)."""
+        n_b, sum_b, mean_b, m2_b = self._block_moments(block)
+        n = self._n + n_b
+        has = n > 0
+        delta = mean_b - self._mean
+        self._m2 += m2_b + np.divide(delta ** 2 * self._n * n_b, n, out=np.zeros_like(n), where=has)
+        self._mean += np.divide(delta * n_b, n, out=np.zeros_like(n), where=has)
+        self.sum += sum_b
+        self._n = n
+        self.count += len(block)
+
+    def _remove(self, block):
+        """Remove a block from the window's Welford state (inverse of _add)."""
+        n_b, sum_b, mean_b, m2_b = self._block_moments(block)
+        n_a = self._n - n_b
+        has = n_a > 0
+        mean_a = np.divide(self._n * self._mean - n_b * mean_b, n_a, out=np.zeros_like(n_a), where=has)
+        delta = mean_b - mean_a
+        correction = np.divide(delta ** 2 * n_a * n_b, self._n, out=np.zeros_like(n_a), where=has)
+        self._m2 = np.where(has, np.maximum(self._m2 - m2_b - correction, 0.0), 0.0)
+        self._mean = mean_a
+        self.sum = np.where(has, self.sum - sum_b, 0.0)
+        self._n = n_a
+        self.count -= len(block)
+
+    def _push_extremes(self, first, chunk):
+        """Push the chunk's max/min candidates onto the monotonic deques."""
+        for c in range(self.n_channels):
+            values = chunk[:, c]
+            for dq, accumulate, beats in ((self._max_deques[c], np.fmax, np.greater),
+                                          (self._min_deques[c], np.fmin, np.less)):
+                # A sample can become the window extreme only if it beats every later
+                # sample of the chunk; those candidates form a monotonic run.
+                suffix = accumulate.accumulate(values[::-1])[::-1]
+                later = np.append(suffix[1:], np.nan)
+                idx = np.nonzero(beats(values, later) | (np.isnan(later) & ~np.isnan(values)))[0]
+                if len(idx) == 0:
+                    continue
+                best = values[idx[0]]
+                # Older entries that the chunk beats can never be the extreme again
+                while dq and not beats(dq[-1][1], best):
+                    dq.pop()
+                dq.extend(zip((first + idx).tolist(), values[idx].tolist()))
+
+    def resync(self):
+        """Recompute sum, mean and variance exactly from the stored window."""
+        block = self._slots(self.seen - self.count, self.count)
+        self._n, self.sum, self._mean, self._m2 = self._block_moments(block)
+
+    @property
+    def valid_count(self):
+        """Non-NaN samples per channel in the window."""
+        return self._n.astype(np.int64)
+
+    @property
+    def mean(self):
+        return np.where(self._n > 0, self._mean, np.nan)
+
+    @property
+    def var(self):
+        """Population variance (ddof=0, as numpy.nanvar)."""
+        return np.divide(self._m2, self._n, out=np.full(self.n_channels, np.nan), where=self._n > 0)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    @property
+    def max(self):
+        return np.array([dq[0][1] if dq else np.nan for dq in self._max_deques])
+
+    @property
+    def min(self):
+        return np.array([dq[0][1] if dq else np.nan for dq in self._min_deques])
+
+    def summary(self):
+        """All statistics as a dict of per-channel arrays."""
+        return {"count": self.count, "valid_count": self.valid_count, "sum": self.sum.copy(),
+                "mean": self.mean, "var": self.var, "min": self.min, "max": self.max}
@@ -0,0 +1,427 @@
+"""
+Shared-memory ring buffer for sample streams.
+
+One process (the writer) appends blocks of samples; any number of processes attach
+to the same segment by name and read from it. The segment starts with a small int64
+header, then the channel names, then the sample storage:
+
+    | header (8 x int64) | channel names (utf-8, comma separated) | samples (float64) |
+
+Header fields:
+    WRITE_COUNT: Total number of samples published. The write head is WRITE_COUNT % capacity.
+    CAPACITY:    Number of samples the ring holds.
+    CHANNELS:    Number of values per sample.
+    WRITE_CLAIM: Sample count the writer will reach once its current write is published.
+    NAMES_BYTES: Size of the channel-name block (padded to 8 bytes).
+    LAYOUT:      LAYOUT_ROW_MAJOR    -> samples stored as (capacity, n_channels)
+                 LAYOUT_CHANNEL_MAJOR -> samples stored as (n_channels, capacity), so each
+                                         channel is one contiguous array that a feature
+                                         process can map without copying.
+
+Every sample has a sequence number (its position in the stream, starting at 0), and
+the header counts are sequence numbers. No lock is shared between writer and readers;
+instead they follow a seqlock-style protocol:
+
+    Writer: WRITE_CLAIM = end  ->  copy samples into their slots  ->  WRITE_COUNT = end
+    Reader: hi = WRITE_COUNT   ->  copy samples [lo, hi)           ->  claim = WRITE_CLAIM
+            The copy is valid when lo >= claim - capacity, i.e. the writer has not
+            started overwriting any slot that was read. Otherwise the read was torn and
+            is retried with fresh counts.
+
+The writer never waits for readers, and a publish costs O(chunk) no matter how
+large the ring is.
+
+Readers that would otherwise poll can block on a Doorbell instead: the writer rings
+it after every publish and RingReader.wait() returns as soon as new samples are
+available, so a consumer reacts within milliseconds of the data arriving.
+"""
+import time
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+
+# Header layout (int64 slots)
+HEADER_SLOTS = 8
+HEADER_BYTES = HEADER_SLOTS * np.dtype(np.int64).itemsize
+WRITE_COUNT = 0
+CAPACITY = 1
+CHANNELS = 2
+WRITE_CLAIM = 3
+NAMES_BYTES = 4
+LAYOUT = 5
+
+LAYOUT_ROW_MAJOR = 0
+LAYOUT_CHANNEL_MAJOR = 1
+
+
+class TornReadError(RuntimeError):
+    """Raised when a reader keeps being overtaken by the writer."""
+
+
+class Doorbell:
+    """
+    Publish notification for one or more rings.
+
+    Waiters register under `lock` and sleep on a semaphore; ring() hands out one token
+    per registered sleeper. Unlike a multiprocessing Condition, ring() never waits for
+    the sleepers to acknowledge, so a consumer that is killed while waiting cannot
+    block the writer. A stale registration only costs one spurious wake-up, after
+    which the waiter re-checks its predicate. `lock` is held just long enough to check
+    the predicate and register, so a supervisor can safely release it if its holder
+    died ([M][Supp]Stage_Supervisor.py).
+
+    These primitives cannot be looked up by name like the shared memory segment, so the
+    doorbell is created next to the ring and handed to every process that attaches
+    (as a Process argument). One doorbell may serve several rings; waiters simply
+    re-check their own ring when woken.
+
+    Args:
+        context (multiprocessing context or None): Context to create the primitives in.
+    """
+    def __init__(self, context=None):
+        context = context or multiprocessing
+        self.lock = context.Lock()
+        # [sleepers, generation], guarded by lock
+        self._state = context.RawArray("q", 2)
+        self._wake = context.Semaphore(0)
+
+    def ring(self):
+        """Wake every process waiting on this doorbell."""
+        with self.lock:
+            sleepers = self._state[0]
+            self._state[0] = 0
+            self._state[1] += 1
+        for _ in range(sleepers):
+            self._wake.release()
+
+    def wait_for(self, predicate, timeout=None):
+        """Block until predicate() is true or timeout seconds pass. Returns the last result."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            with self.lock:
+                result = predicate()
+                if result or (remaining is not None and remaining <= 0):
+                    return result
+                self._state[0] += 1
+                generation = self._state[1]
+            if self._wake.acquire(timeout=remaining):
+                continue
+            with self.lock:
+                # Not rung since registering: withdraw, or a later ring would wake a waiter for nothing
+                if self._state[1] == generation:
+                    self._state[0] -= 1
+
+
+class SharedRing:
+    """
+    A fixed-capacity ring of float64 samples in shared memory.
+
+    Use SharedRing.create() in the owning process and SharedRing.attach(name)
+    everywhere else. Only one process may write to a ring. Pass the same Doorbell
+    to the writer and the readers to let readers block until data is published.
+    """
+    def __init__(self, shm, owner=False, doorbell=None):
+        self.shm = shm
+        self.owner = owner  # the owner unlinks the segment on close()
+        self.doorbell = doorbell
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self.header[CAPACITY])
+        self.n_channels = int(self.header[CHANNELS])
+        self.layout = int(self.header[LAYOUT])
+        names_bytes = int(self.header[NAMES_BYTES])
+        names = bytes(shm.buf[HEADER_BYTES:HEADER_BYTES + names_bytes]).rstrip(b"\0").decode("utf-8")
+        self.channel_names = names.split(",") if names else [f"CH{i}" for i in range(self.n_channels)]
+
+        # self.data is always indexed (sample, channel); in channel-major layout it is a
+        # transposed view of the contiguous per-channel storage in self.channels.
+        offset = HEADER_BYTES + names_bytes
+        if self.layout == LAYOUT_CHANNEL_MAJOR:
+            self.channels = np.ndarray((self.n_channels, self.capacity), dtype=np.float64,
+                                       buffer=shm.buf, offset=offset)
+            self.data = self.channels.T
+        else:
+            self.data = np.ndarray((self.capacity, self.n_channels), dtype=np.float64,
+                                   buffer=shm.buf, offset=offset)
+            self.channels = self.data.T
+
+    @classmethod
+    def create(cls, capacity, n_channels=None, name=None, channel_names=None, layout=LAYOUT_ROW_MAJOR,
+               doorbell=None):
+        """
+        Allocate a new zeroed ring. `name` is chosen by the OS when None.
+
+        Args:
+            capacity (int): Samples held.
+            n_channels (int or None): Values per sample; defaults to len(channel_names).
+            name (str or None): Shared memory segment name.
+            channel_names (list of str or None): Defaults to CH0, CH1, ...
+            layout (int): LAYOUT_ROW_MAJOR or LAYOUT_CHANNEL_MAJOR.
+            doorbell (Doorbell or None): Rung after every write().
+        """
+        if n_channels is None:
+            n_channels = len(channel_names)
+        if channel_names is not None and len(channel_names) != n_channels:
+            raise ValueError(f"{len(channel_names)} channel names given for {n_channels} channels")
+        names = ",".join(channel_names).encode("utf-8") if channel_names else b""
+        names_bytes = -(-len(names) // 8) * 8  # keep the samples 8-byte aligned
+
+        size = HEADER_BYTES + names_bytes + int(capacity) * int(n_channels) * np.dtype(np.float64).itemsize
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[CAPACITY] = capacity
+        header[CHANNELS] = n_channels
+        header[NAMES_BYTES] = names_bytes
+        header[LAYOUT] = layout
+        del header
+        shm.buf[HEADER_BYTES:HEADER_BYTES + names_bytes] = names.ljust(names_bytes, b"\0")
+        return cls(shm, owner=True, doorbell=doorbell)
+
+    @classmethod
+    def attach(cls, name, doorbell=None):
+        """Attach to a ring created by another process, optionally with its Doorbell."""
+        return cls(shared_memory.SharedMemory(name=name), owner=False, doorbell=doorbell)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_count(self):
+        """Total number of samples written so far."""
+        return int(self.header[WRITE_COUNT])
+
+    def channel_index(self, channel):
+        """Index of a channel given by name or index."""
+        if isinstance(channel, str):
+            return self.channel_names.index(channel)
+        return int(channel)
+
+    def write(self, rows):
+        """
+        Publish a block of samples at the write head, wrapping around the end of
+        the ring, then ring the doorbell. Costs O(len(rows)); nothing already in the
+        ring is moved.
+
+        Args:
+            rows (array-like): Shape (n_samples, n_channels).
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.n_channels)
+        count = self.write_count
+        end = count + len(rows)
+        if len(rows) > self.capacity:
+            # Only the newest `capacity` samples can be kept
+            rows = rows[-self.capacity:]
+            count = end - self.capacity
+        # Announce which slots are about to change before touching them
+        self.header[WRITE_CLAIM] = end
+        start = count % self.capacity
+        first = min(len(rows), self.capacity - start)
+        self.data[start:start + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+        self.header[WRITE_COUNT] = end
+        if self.doorbell is not None:
+            self.doorbell.ring()
+
+    def is_intact(self, first_seq):
+        """
+        True when no slot holding sample `first_seq` or later has been claimed by the
+        writer since it was published. Call after copying to validate the copy.
+        """
+        return first_seq >= int(self.header[WRITE_CLAIM]) - self.capacity
+
+    def copy_range(self, first_seq, end_seq, out=None):
+        """
+        Copy samples [first_seq, end_seq) out of the ring without validating them.
+        Use read_latest() unless you validate with is_intact() yourself.
+        """
+        n = end_seq - first_seq
+        if out is None:
+            out = np.empty((n, self.n_channels), dtype=np.float64)
+        start = first_seq % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:n] = self.data[:n - first]
+        return out
+
+    def read_latest(self, n=None, retries=100):
+        """
+        Consistent copy of the newest `n` samples (default: the whole ring) in time order.
+
+        Returns:
+            (samples, first_seq, end_seq): the copy and the sequence range it covers.
+            Before the ring fills up, fewer than `n` samples are returned.
+
+        Raises:
+            TornReadError: If the writer overtook every attempt.
+        """
+        n = self.capacity if n is None else min(int(n), self.capacity)
+        for _ in range(retries):
+            end_seq = self.write_count
+            first_seq = max(0, end_seq - n)
+            samples = self.copy_range(first_seq, end_seq)
+            if self.is_intact(first_seq):
+                return samples, first_seq, end_seq
+            time.sleep(0)  # let the writer finish its publish
+        raise TornReadError(f"Ring {self.name}: read overtaken by the writer {retries} times")
+
+    def latest(self, n=None):
+        """
+        Copy of the newest `n` samples (default: the whole ring) in time order,
+        zero-padded at the front until the ring has filled up once.
+        """
+        n = self.capacity if n is None else min(int(n), self.capacity)
+        samples = self.read_latest(n)[0]
+        if len(samples) == n:
+            return samples
+        padded = np.zeros((n, self.n_channels), dtype=np.float64)
+        padded[n - len(samples):] = samples
+        return padded
+
+    def reader(self, from_start=False):
+        """Create a RingReader over this ring (see RingReader)."""
+        return RingReader(self, from_start)
+
+    def close(self):
+        """Detach from the segment; the owner also frees it."""
+        # numpy views must be released before the segment can be closed
+        del self.header
+        del self.data
+        del self.channels
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    """
+    A consumer's handle on a SharedRing.
+
+    Each reader keeps its own cursor (the sequence number of the next sample it has
+    not seen), so a consumer can ask for just the samples published since its last
+    call and do work proportional to new data instead of the window size.
+
+    Args:
+        ring (SharedRing): The ring to read.
+        from_start (bool): Start at the oldest sample still held instead of at the
+                           current write head.
+    """
+    def __init__(self, ring, from_start=False):
+        self.ring = ring
+        self.cursor = max(0, ring.write_count - ring.capacity) if from_start else ring.write_count
+        self.missed = 0  # samples overwritten before this reader got to them
+
+    def available(self):
+        """Number of published samples this reader has not consumed yet."""
+        return self.ring.write_count - self.cursor
+
+    def wait(self, timeout=None, poll_interval=0.005):
+        """
+        Block until there are unread samples or timeout seconds pass.
+
+        Uses the ring's Doorbell when it has one; otherwise falls back to polling the
+        write count every poll_interval seconds.
+
+        Returns:
+            True if unread samples are available.
+        """
+        if self.available() > 0:
+            return True
+        if self.ring.doorbell is not None:
+            return self.ring.doorbell.wait_for(lambda: self.available() > 0, timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.available() <= 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    def read_new(self, max_samples=None, retries=100):
+        """
+        Copy the samples published since the last call and advance the cursor.
+
+        If the reader fell more than a ring's worth behind, the oldest samples
+        are gone; it skips to the oldest intact sample and counts the gap in `missed`.
+
+        Args:
+            max_samples (int or None): Upper bound on samples returned (the rest stay queued).
+
+        Returns:
+            (samples, first_seq, end_seq): possibly empty when nothing new was published.
+        """
+        ring = self.ring
+        for _ in range(retries):
+            end_seq = ring.write_count
+            first_seq = max(self.cursor, end_seq - ring.capacity)
+            if max_samples is not None:
+                end_seq = min(end_seq, first_seq + max_samples)
+            samples = ring.copy_range(first_seq, end_seq)
+            if ring.is_intact(first_seq):
+                self.missed += first_seq - self.cursor
+                self.cursor = end_seq
+                return samples, first_seq, end_seq
+            time.sleep(0)  # let the writer finish its publish
+        raise TornReadError(f"Ring {ring.name}: read overtaken by the writer {retries} times")
+
+    def view_latest(self, n=None, channel=None):
+        """
+        Zero-copy views of the newest `n` samples (default: the whole ring) and their
+        sequence range. Does not move the cursor.
+
+        The samples come back as one or two contiguous segments (two when the range
+        wraps around the end of the ring); concatenated in order they are the window.
+        The views alias live shared memory, so once finished with them call
+        intact(first_seq): if it returns False the writer overwrote part of the window
+        while it was being used and the result should be discarded.
+
+        Args:
+            n (int or None): Number of samples.
+            channel (str, int or None): Return 1-D views of this channel only. In a
+                                        channel-major ring these are contiguous.
+
+        Returns:
+            (segments, first_seq, end_seq)
+        """
+        n = self.ring.capacity if n is None else min(int(n), self.ring.capacity)
+        end_seq = self.ring.write_count
+        first_seq = max(0, end_seq - n)
+        return self.view_range(first_seq, end_seq, channel), first_seq, end_seq
+
+    def view_new(self, channel=None):
+        """
+        Zero-copy views of the samples published since the last call, advancing the
+        cursor. Segments and validation work as in view_latest().
+
+        Returns:
+            (segments, first_seq, end_seq)
+        """
+        end_seq = self.ring.write_count
+        first_seq = max(self.cursor, end_seq - self.ring.capacity)
+        self.missed += first_seq - self.cursor
+        self.cursor = end_seq
+        return self.view_range(first_seq, end_seq, channel), first_seq, end_seq
+
+    def view_range(self, first_seq, end_seq, channel=None):
+        """
+        Zero-copy segments of samples [first_seq, end_seq), e.g. a second channel of the
+        range just returned by view_new(). The range must fit in the ring.
+        """
+        ring = self.ring
+        if channel is None:
+            storage = ring.data
+        else:
+            storage = ring.channels[ring.channel_index(channel)]
+        start = first_seq % ring.capacity
+        stop = start + (end_seq - first_seq)
+        if stop <= ring.capacity:
+            return (storage[start:stop],)
+        return (storage[start:], storage[:stop - ring.capacity])
+
+    def intact(self, first_seq):
+        """True when samples from `first_seq` onward have not been overwritten."""
+        return self.ring.is_intact(first_seq)
+
+    def skip_to_latest(self):
+        """Drop everything queued for this reader."""
+        self.cursor = self.ring.write_count
@@ -0,0 +1,607 @@
+"""
+Supervision of the processing stages.
+
+Every stage process (cleaning, decimation, the consumers of a ring, ...) gets a row of
+a HeartbeatTable in shared memory and beats it from its main loop. A StageSupervisor
+in the owning process checks the rows a few times per second:
+
+    - A stage whose process exited while the pipeline is running is restarted.
+    - A stage that has not beaten for stall_timeout seconds is killed and restarted.
+    - Registered locks a dead stage held are released. A stage marks every registered
+      lock it holds in its row: its own locks through Heartbeat.guard, and the lock
+      inside a Doorbell or a queue's QueueSync through Heartbeat.watch. Only the locks
+      marked in the dead process's row are released; a lock that is merely taken may
+      belong to a live process and is never touched.
+    - Registered repairs (e.g. ChunkQueue.repair, for slots a dead stage claimed but
+      never finished) run once its locks are released.
+    - A stage that reports how far it has read (Heartbeat.keep_up) and falls more than
+      max_lag of its source ring behind is told to skip to the newest samples, so it
+      reads live data again instead of a window that is being overwritten under it.
+
+A restarted stage is a new process running the same target with the same arguments,
+so it attaches to the existing shared memory segments by name; the ingest process and
+the other stages keep running. Restarts back off exponentially, and a stage that fails
+max_restarts times within restart_window seconds is given up.
+
+Interchangeable stages, such as processors sharing one ChunkQueue, can form a
+ScalingGroup: the supervisor adds a member while the group's load (e.g. queue depth)
+stays high and retires one while it stays low, between a minimum and a maximum taken
+from the core budget ([M][Supp]Core_Layout.py). A retired member finishes its current
+item and leaves its loop when it sees heartbeat.retiring.
+
+A stage may carry a Placement ([M][Supp]Core_Layout.py): its cores, nice level and
+scheduling policy are applied as soon as the process is started (and again on every
+restart), and the result is printed.
+
+A stage target takes a `heartbeat` keyword argument (a Heartbeat, or None when run
+unsupervised). A class target (e.g. a multiprocessing.Process subclass) is instantiated
+in the child and its run() is called.
+
+Row layout (float64):
+    PID:      Process id of the current incarnation.
+    BEAT:     time.monotonic() of the last beat.
+    PROGRESS: Sequence number of the next sample the stage will read (-1 if unknown).
+    STATE:    STARTING, RUNNING, STOPPED or FAILED.
+    HOLDING:  Bit mask of the registered locks the stage holds (bit i: lock i).
+    SHED:     Set by the supervisor to make the stage skip ahead.
+    RETIRE:   Set by the supervisor to make the stage exit.
+"""
+import os
+import time
+import signal
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+
+# Row layout (float64 fields per stage)
+ROW_FIELDS = 8
+PID = 0
+BEAT = 1
+PROGRESS = 2
+STATE = 3
+HOLDING = 4
+SHED = 5
+RETIRE = 6
+
+STARTING = 0
+RUNNING = 1
+STOPPED = 2
+FAILED = 3
+STATE_NAMES = {STARTING: "starting", RUNNING: "running", STOPPED: "stopped", FAILED: "failed"}
+
+
+class HeartbeatTable:
+    """
+    One row of liveness and progress fields per stage, in shared memory.
+
+    Use HeartbeatTable.create() in the supervising process; a table passed to a child
+    process attaches there by name.
+    """
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner  # the owner unlinks the segment on close()
+        self._owner_pid = os.getpid()
+        self.rows = np.ndarray((shm.size // (ROW_FIELDS * 8), ROW_FIELDS), dtype=np.float64, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, n_rows, name=None):
+        """Allocate a table of n_rows rows."""
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(1, n_rows) * ROW_FIELDS * 8)
+        table = cls(shm, owner=True)
+        table.rows[:] = 0
+        table.rows[:, PROGRESS] = -1
+        return table
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to a table created by another process."""
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    def __reduce__(self):
+        # Sent to a child process: attach there instead of copying the rows
+        return (self.attach, (self.name,))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        """Detach from the segment; the owner also frees it."""
+        del self.rows
+        self.shm.close()
+        if self.owner and os.getpid() == self._owner_pid:
+            self.shm.unlink()
+
+
+class Heartbeat:
+    """
+    A stage's handle on its row of the HeartbeatTable.
+
+    Args:
+        table (HeartbeatTable): The table.
+        row (int): This stage's row.
+        lock_names (list of str): Names of the supervisor's registered locks, in order.
+        locks (list or None): The registered locks themselves, in the same order. They
+                              reach the stage together with its arguments, so a lock
+                              inside an argument is the same object as the one here.
+    """
+    def __init__(self, table, row, lock_names=(), locks=None):
+        self.table = table
+        self.row = table.rows[row]
+        self.lock_names = list(lock_names)
+        self.locks = list(locks or [])
+
+    def beat(self, progress=None):
+        """
+        Record that the stage is alive (and how far it has read).
+
+        Returns:
+            True if the supervisor asked the stage to skip ahead since the last beat.
+        """
+        self.row[BEAT] = time.monotonic()
+        if progress is not None:
+            self.row[PROGRESS] = progress
+        if self.row[SHED]:
+            self.row[SHED] = 0
+            return True
+        return False
+
+    @property
+    def retiring(self):
+        """True once the supervisor wants this stage to exit (its group is shrinking)."""
+        return bool(self.row[RETIRE])
+
+    def keep_up(self, reader):
+        """
+        Beat with a RingReader's position and, if the supervisor asks for it, move the
+        reader to the write head. Skipped samples are counted in reader.missed.
+
+        Returns:
+            Number of samples skipped.
+        """
+        if not self.beat(reader.cursor):
+            return 0
+        behind = max(0, reader.available())
+        reader.missed += behind
+        reader.skip_to_latest()
+        self.row[PROGRESS] = reader.cursor
+        return behind
+
+    def guard(self, lock, name):
+        """
+        Wrap a registered lock so that holding it is marked in this stage's row, and the
+        supervisor can release it if the stage dies while holding it. The returned
+        context manager can be used any number of times in place of the lock.
+        """
+        return _HeldLock(self, lock, 1 << self.lock_names.index(name))
+
+    def watch(self, owner, attribute="lock"):
+        """
+        Guard a registered lock held by another object, e.g. watch(doorbell) or
+        watch(chunk_queue.sync, "claim_lock"): owner.<attribute> is replaced by its
+        guarded version, so every `with` on it by the owner is marked in this row.
+
+        Returns:
+            True if the lock is registered with the supervisor (otherwise, or if owner is
+            None, nothing is changed).
+        """
+        if owner is None:
+            return False
+        lock = getattr(owner, attribute)
+        for index, registered in enumerate(self.locks):
+            if lock is registered:
+                setattr(owner, attribute, _HeldLock(self, lock, 1 << index))
+                return True
+        return False
+
+
+class _HeldLock:
+    """A lock that records in a heartbeat row while it is held."""
+    def __init__(self, heartbeat, lock, bit):
+        self.heartbeat = heartbeat
+        self.lock = lock
+        self.bit = bit
+
+    def __enter__(self):
+        self.lock.acquire()
+        row = self.heartbeat.row
+        row[HOLDING] = int(row[HOLDING]) | self.bit
+        return self.lock
+
+    def __exit__(self, *exc_info):
+        # Unmarked before the release: a marked lock is always one this process holds
+        row = self.heartbeat.row
+        row[HOLDING] = int(row[HOLDING]) & ~self.bit
+        self.lock.release()
+
+
+class Stage:
+    """
+    A supervised stage process.
+
+    Args:
+        name (str): Name used in logs and reports.
+        target (callable): Function or class run in the child as
+                           target(*args, heartbeat=heartbeat, **kwargs).
+        args (tuple): Positional arguments.
+        kwargs (dict or None): Keyword arguments.
+        restart (bool): Restart the stage when it fails.
+        stall_timeout (float): Seconds without a beat after which the stage is restarted.
+        source (SharedRing or None): Ring the stage reads, for the lag check.
+        max_lag (float): Fraction of the source ring the stage may fall behind before it
+                         is told to skip ahead.
+        placement (Placement or None): Cores and priority of the process.
+    """
+    def __init__(self, name, target, args=(), kwargs=None, restart=True, stall_timeout=5.0, source=None,
+                 max_lag=0.5, placement=None):
+        self.name = name
+        self.target = target
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.restart = restart
+        self.stall_timeout = stall_timeout
+        self.source = source
+        self.max_lag = max_lag
+        self.placement = placement
+        self.process = None
+        self.row = None
+        self.retiring = False
+        self.started = 0.0
+        self.restart_at = None
+        self.restart_times = []
+        self.restarts = 0
+        self.stalls = 0
+        self.skips = 0
+        self.given_up = False
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, target={getattr(self.target, '__name__', self.target)})"
+
+
+def _run_stage(table, row, lock_names, locks, target, args, kwargs):
+    """Child side of a supervised stage: run the target with a Heartbeat."""
+    # The supervising process owns the stage's lifetime and stops it through its stop event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    heartbeat = Heartbeat(table, row, lock_names, locks)
+    heartbeat.row[PID] = os.getpid()
+    heartbeat.row[HOLDING] = 0
+    heartbeat.row[PROGRESS] = -1
+    heartbeat.beat()
+    heartbeat.row[STATE] = RUNNING
+    try:
+        if isinstance(target, type):
+            target(*args, heartbeat=heartbeat, **kwargs).run()
+        else:
+            target(*args, heartbeat=heartbeat, **kwargs)
+        heartbeat.row[STATE] = STOPPED
+    except BaseException:
+        heartbeat.row[STATE] = FAILED
+        raise
+    finally:
+        # The row view must be released before the segment can be closed
+        heartbeat.row = None
+        table.close()
+
+
+class ScalingGroup:
+    """
+    Interchangeable stages whose number follows a load signal.
+
+    Args:
+        name (str): Name used in logs.
+        factory (callable): factory(index) -> Stage for a new member. Its target must
+                            return when heartbeat.retiring is set.
+        load (callable): Current load, e.g. queue depth / queue slots.
+        maximum (int): Most members, e.g. Core_Layout.worker_budget().
+        minimum (int): Fewest members.
+        initial (int or None): Members at start; defaults to minimum.
+        high (float): Mean load over `interval` above which a member is added.
+        low (float): Mean load below which the newest member is retired.
+        interval (float): Seconds of load averaged per decision.
+    """
+    def __init__(self, name, factory, load, maximum, minimum=1, initial=None, high=0.5, low=0.05, interval=2.0):
+        self.name = name
+        self.factory = factory
+        self.load = load
+        self.maximum = max(minimum, maximum)
+        self.minimum = minimum
+        self.initial = min(self.maximum, max(minimum, initial or minimum))
+        self.high = high
+        self.low = low
+        self.interval = interval
+        self.stages = []
+        self.created = 0
+        self._samples = []
+        self._window_start = 0.0
+
+    @property
+    def size(self):
+        """Members that are not being retired."""
+        return sum(not stage.retiring and not stage.given_up for stage in self.stages)
+
+    def new_stage(self):
+        stage = self.factory(self.created)
+        self.created += 1
+        self.stages.append(stage)
+        return stage
+
+
+class StageSupervisor:
+    """
+    Starts stage processes and keeps them alive (see the module docstring).
+
+    Args:
+        stages (list of Stage): Stages to run; more can be added at any time.
+        stop_event (multiprocessing.Event or None): The pipeline's stop event. Stages that
+                                                    exit after it is set are not restarted.
+        interval (float): Seconds between checks.
+        max_restarts (int): Restarts within restart_window after which a stage is given up.
+        restart_window (float): Seconds over which restarts are counted.
+        context (multiprocessing context or None): Context to start the processes in.
+        rows (int or None): Heartbeat rows to allocate, i.e. the most stages running at
+                            once; defaults to the stages given plus every group's maximum.
+    """
+    def __init__(self, stages=(), stop_event=None, interval=0.25, max_restarts=5, restart_window=60.0,
+                 context=None, rows=None):
+        self.stages = list(stages)
+        self.groups = []
+        self.rows = rows
+        self.stop_event = stop_event
+        self.interval = interval
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.context = context or multiprocessing
+        self.locks = []  # (name, lock)
+        self.repairs = []  # (name, repair)
+        self.table = None
+        self._free_rows = []
+        self._running = threading.Event()
+        # Held by every pass of the monitor; re-entrant because scaling adds stages
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def add(self, stage):
+        """Add a stage; after start() it is launched right away. Returns the stage."""
+        with self._lock:
+            if self.table is not None and not self._free_rows:
+                raise RuntimeError(f"No heartbeat row left for {stage.name}; raise `rows`")
+            self.stages.append(stage)
+            if self.table is not None:
+                stage.row = self._free_rows.pop(0)
+                self._launch(stage)
+        return stage
+
+    def add_group(self, group):
+        """Add a ScalingGroup and its initial members. Returns the group."""
+        self.groups.append(group)
+        for _ in range(group.initial):
+            self.add(group.new_stage())
+        return group
+
+    def retire(self, stage):
+        """Ask a stage to exit; it is removed once it has, without a restart."""
+        with self._lock:
+            stage.retiring = True
+            if stage.row is not None:
+                self.table.rows[stage.row, RETIRE] = 1
+
+    def register_lock(self, name, lock):
+        """
+        Register a lock the stages share. A stage that dies while its row marks the lock
+        as held (Heartbeat.guard / Heartbeat.watch) has it released. At most 52 locks.
+
+        Args:
+            name (str): Name stages pass to Heartbeat.guard().
+            lock (multiprocessing.Lock): The lock. Must be a plain Lock: an RLock cannot
+                                         be released by another process.
+        """
+        self.locks.append((name, lock))
+
+    def register_repair(self, name, repair):
+        """
+        Register a callable run after a stage died and its locks were released, to undo
+        what the stage left half done in shared state. It returns the number of items
+        it repaired, which is logged under `name`.
+        """
+        self.repairs.append((name, repair))
+
+    @property
+    def processes(self):
+        """The current process of every stage that has one."""
+        return [stage.process for stage in self.stages if stage.process is not None]
+
+    def start(self):
+        """Start every stage and the monitoring thread."""
+        headroom = sum(max(0, group.maximum - len(group.stages)) for group in self.groups)
+        self.table = HeartbeatTable.create(max(self.rows or 0, len(self.stages) + headroom))
+        self._free_rows = list(range(len(self.table.rows)))
+        for stage in self.stages:
+            stage.row = self._free_rows.pop(0)
+            self._launch(stage)
+        for group in self.groups:
+            group._window_start = time.monotonic()
+        self._running.set()
+        self._thread = threading.Thread(target=self._monitor, name="StageSupervisor", daemon=True)
+        self._thread.start()
+        print(f"[Supervisor] Watching {len(self.stages)} stages")
+
+    def _launch(self, stage):
+        fields = self.table.rows[stage.row]
+        fields[:] = 0
+        fields[PROGRESS] = -1
+        fields[STATE] = STARTING
+        stage.process = self.context.Process(
+            target=_run_stage, name=stage.name,
+            args=(self.table, stage.row, [name for name, _ in self.locks], [lock for _, lock in self.locks],
+                  stage.target, stage.args, stage.kwargs))
+        stage.started = time.monotonic()
+        stage.restart_at = None
+        stage.process.start()
+        if stage.placement is not None:
+            print(f"[Supervisor] {stage.name} (pid {stage.process.pid}): {stage.placement.apply(stage.process.pid)}")
+
+    def _monitor(self):
+        while self._running.is_set():
+            with self._lock:
+                if self._running.is_set():
+                    self.poll()
+            time.sleep(self.interval)
+
+    def _stopping(self):
+        return not self._running.is_set() or (self.stop_event is not None and self.stop_event.is_set())
+
+    def poll(self):
+        """One pass of health checks, restarts, lag checks and group scaling."""
+        now = time.monotonic()
+        for stage in list(self.stages):
+            fields = self.table.rows[stage.row]
+            if stage.process is None:
+                if stage.retiring:
+                    self._remove(stage)
+                elif stage.restart_at is not None and now >= stage.restart_at and not self._stopping():
+                    print(f"[Supervisor] Restarting {stage.name}")
+                    self._launch(stage)
+                continue
+            if not stage.process.is_alive():
+                if stage.retiring and not fields[HOLDING]:
+                    stage.process.join()
+                    self._remove(stage)
+                    continue
+                if self._stopping():
+                    continue
+                self._failed(stage, f"exited with code {stage.process.exitcode}", now)
+                continue
+            last = max(fields[BEAT], stage.started)
+            if now - last > stage.stall_timeout:
+                stage.stalls += 1
+                self._kill(stage.process)
+                self._failed(stage, f"stalled for {now - last:.1f} s", now)
+                continue
+            if stage.source is not None and fields[PROGRESS] >= 0 and not fields[SHED]:
+                lag = stage.source.write_count - fields[PROGRESS]
+                if lag > stage.max_lag * stage.source.capacity:
+                    fields[SHED] = 1
+                    stage.skips += 1
+                    print(f"[Supervisor] {stage.name} is {int(lag)} samples behind; skipping it to the newest data")
+        if not self._stopping():
+            for group in self.groups:
+                self._scale(group, now)
+
+    def _scale(self, group, now):
+        """Add or retire a member of a group from its mean load over the last interval."""
+        group._samples.append(group.load())
+        if now - group._window_start < group.interval:
+            return
+        load = sum(group._samples) / len(group._samples)
+        group._samples = []
+        group._window_start = now
+        size = group.size
+        if load > group.high and size < group.maximum and self._free_rows:
+            stage = self.add(group.new_stage())
+            print(f"[Supervisor] {group.name} load {load:.2f}: added {stage.name} ({size + 1} running)")
+        elif load < group.low and size > group.minimum:
+            stage = [stage for stage in group.stages if not stage.retiring and not stage.given_up][-1]
+            self.retire(stage)
+            print(f"[Supervisor] {group.name} load {load:.2f}: retiring {stage.name} ({size - 1} running)")
+
+    def _remove(self, stage):
+        """Forget a retired stage and free its row."""
+        self.stages.remove(stage)
+        for group in self.groups:
+            if stage in group.stages:
+                group.stages.remove(stage)
+        self._free_rows.append(stage.row)
+        stage.process = None
+        stage.row = None
+
+    def _kill(self, process):
+        process.terminate()
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+            process.join(timeout=1)
+
+    def _failed(self, stage, reason, now):
+        """Release what a dead stage held and schedule its restart."""
+        fields = self.table.rows[stage.row]
+        fields[STATE] = FAILED
+        print(f"[Supervisor] {stage.name} (pid {stage.process.pid}) {reason}")
+        # A row the process never took over (it died first) still holds no marks from it
+        holding = int(fields[HOLDING]) if int(fields[PID]) == stage.process.pid else 0
+        self._release_locks(stage, holding)
+        fields[HOLDING] = 0
+        for name, repair in self.repairs:
+            repaired = repair()
+            if repaired:
+                print(f"[Supervisor] Repaired {repaired} {name} left by {stage.name}")
+        stage.process = None
+        if stage.retiring:
+            return
+        if not stage.restart:
+            stage.given_up = True
+            return
+        stage.restart_times = [t for t in stage.restart_times if now - t < self.restart_window] + [now]
+        if len(stage.restart_times) > self.max_restarts:
+            stage.given_up = True
+            print(f"[Supervisor] Giving up on {stage.name} after {self.max_restarts} restarts "
+                  f"in {self.restart_window:g} s")
+            return
+        stage.restarts += 1
+        stage.restart_at = now + min(5.0, 0.1 * 2 ** (len(stage.restart_times) - 1))
+
+    def _release_locks(self, stage, holding):
+        """Release the registered locks marked in the `holding` mask of a dead stage."""
+        for index, (name, lock) in enumerate(self.locks):
+            if not holding >> index & 1:
+                continue
+            try:
+                lock.release()
+                print(f"[Supervisor] Released {name} left held by {stage.name}")
+            except ValueError:
+                pass
+
+    def report(self):
+        """Per-stage state, pid, seconds since the last beat, restarts, stalls and skips."""
+        now = time.monotonic()
+        report = {}
+        for stage in self.stages:
+            fields = self.table.rows[stage.row] if self.table is not None else np.zeros(ROW_FIELDS)
+            report[stage.name] = {
+                "state": "given up" if stage.given_up else STATE_NAMES.get(int(fields[STATE]), "unknown"),
+                "pid": int(fields[PID]), "since_beat": float(now - fields[BEAT]) if fields[BEAT] else None,
+                "restarts": stage.restarts, "stalls": stage.stalls, "skips": stage.skips}
+        return report
+
+    def halt(self):
+        """Stop monitoring: nothing is restarted from now on."""
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 4 + 1)
+            self._thread = None
+
+    def stop(self, timeout=5):
+        """
+        Stop monitoring, wait for the stages to exit (the caller sets the stop event
+        first), terminate stragglers and free the heartbeat table.
+        """
+        self.halt()
+        deadline = time.monotonic() + timeout
+        for stage in self.stages:
+            if stage.process is None:
+                continue
+            stage.process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if stage.process.is_alive():
+                print(f"[Supervisor] Terminating {stage.name}")
+                self._kill(stage.process)
+        for name, stats in self.report().items():
+            if stats["restarts"] or stats["stalls"] or stats["skips"]:
+                print(f"[Supervisor] {name}: {stats['restarts']} restarts, {stats['stalls']} stalls, "
+                      f"{stats['skips']} skips")
+        self.close()
+
+    def close(self):
+        """Free the heartbeat table."""
+        if self.table is not None:
+            self.table.close()
+            self.table = None
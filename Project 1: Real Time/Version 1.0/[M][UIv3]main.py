@@ -1,279 +1,389 @@
-import os
-import ast
-import sys
-import time
-import numpy as np
-import random
-import multiprocessing
-import matplotlib.pyplot as plt
-
-from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
-    QWidget, QTextEdit, QPushButton, QMessageBox, QLabel, QListWidget, QFileDialog
-)
-from PyQt5.QtCore import Qt, QTimer
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from M_UIv2_Supp import UniqueFunctionProcessor, Echo, FileManagerWidget, DynamicGraphWidget
-
-
-class ProcessingManeger:
-    """
-    This class encapsulates all process-related operations.
-    It uses shared resources (via multiprocessing.Manager) to set up and run processes,
-    and it takes care of cleaning up in case of errors or interrupts.
-    """
-    def __init__(self):
-        self.processes = []
-        self.manager = None
-        self.buffer = None
-        self.result_queue = None
-        self.lock = None
-        self.flag = None
-        print("ProcessingManeger initialized")
-
-    def setup_processes(self):
-        """Set up shared resources and instantiate your processes."""
-        self.manager = multiprocessing.Manager()
-        self.buffer = self.manager.list()  # shared buffer for inter-process communication
-        self.result_queue = multiprocessing.Queue()
-        self.lock = multiprocessing.Lock()
-        self.flag = multiprocessing.Value('i', 0)  # shared flag
-
-        # Create process instances using classes imported from M_UIv2_Supp
-        processor_1 = UniqueFunctionProcessor(
-            process_id=0,
-            buffer=self.buffer,
-            lock=self.lock,
-            flag=self.flag,
-            result_queue=self.result_queue
-        )
-        processor_2 = UniqueFunctionProcessor(
-            process_id=1,
-            buffer=self.buffer,
-            lock=self.lock,
-            flag=self.flag,
-            result_queue=self.result_queue
-        )
-        echo = Echo(
-            buffer=self.buffer,
-            lock=self.lock,
-            flag=self.flag
-        )
-        self.processes = [processor_1, processor_2, echo]
-
-    def run_processes(self):
-        """Start and join all processes, handling errors independently of the UI."""
-        self.setup_processes()
-        try:
-            # Start each process
-            for process in self.processes:
-                process.start()
-
-            # Wait for the processes to finish
-            for process in self.processes:
-                process.join()
-
-        except KeyboardInterrupt:
-            print("\nKeyboardInterrupt detected! Cleaning up processes...")
-            self.cleanup_processes()
-
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-            self.cleanup_processes()
-
-        finally:
-            # Show the final state of the shared buffer
-            print("Final buffer state:", list(self.buffer))
-
-        # Process any remaining results
-        while not self.result_queue.empty():
-            process_id, result = self.result_queue.get()
-            print(f"Result from Process {process_id}: {result}")
-
-        print("Processing completed gracefully.")
-
-    def cleanup_processes(self):
-        """
-        Terminates all running processes and ensures proper cleanup.
-        This helps keep your main window safe from process termination glitches.
-        """
-        print("\nInitiating cleanup of processes...")
-        for process in self.processes:
-            if process.is_alive():
-                process.terminate()
-                process.join()
-        print("All processes have been terminated successfully.")
-        
-    @staticmethod
-    def check_process_running(process_name):
-        """
-        Check if a process with the given name is running.
-        Useful for verifying that no rogue processes are still active.
-        """
-        import psutil
-        for proc in psutil.process_iter(attrs=["name"]):
-            if proc.info["name"].lower() == process_name.lower():
-                return True
-        return False
-
-
-class Support:
-    """
-    A helper class that provides utilitarian functions used throughout
-    the application. This can include logging, configuration reading, and
-    other miscellaneous tasks.
-    """
-    def __init__(self):
-        self.log_file = "support_log.txt"
-        self.log("Support initialized.", level="DEBUG")
-
-    def log(self, message, level="INFO"):
-        """
-        Logs a message with a timestamp and a severity level.
-        This can help you trace errors or events later on.
-        """
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[{timestamp}] [{level}] {message}"
-        with open(self.log_file, "a") as log_file:
-            log_file.write(log_message + "\n")
-        print(log_message)
-
-    @staticmethod
-    def read_config(file_path):
-        """
-        Reads and parses a configuration file.
-        Supports files containing a dictionary literal.
-        """
-        if not os.path.exists(file_path):
-            print(f"Configuration file {file_path} not found.")
-            return None
-        try:
-            with open(file_path, 'r') as f:
-                data = f.read()
-                config = ast.literal_eval(data)
-            return config
-        except Exception as e:
-            print(f"Error reading configuration: {e}")
-            return None
-
-
-class WindowManager(QMainWindow):
-    """
-    The main window class handles UI elements.
-    All process manipulation has been offloaded to the ProcessingManeger,
-    so issues arising in the main UI are less likely to disrupt critical backend functionality.
-    """
-    def __init__(self):
-        super().__init__()
-
-        # Main window settings
-        self.setWindowTitle("Realtime Feature Exstraction Manager")
-        self.resize(1000, 400)
-        # Create an instance of the processing manager
-        self.processing_manager = ProcessingManeger()
-        # Main layout container
-        main_layout = QHBoxLayout()
-
-        # Layout for the main window's content
-        self.layout = QVBoxLayout(self)
-
-        # Initialize the dynamic graph widget (hidden by default)
-        self.graph_widget = DynamicGraphWidget()
-        main_layout.addWidget(self.graph_widget)
-        self.graph_widget.hide()
-
-        # Button to toggle dynamic graph visibility
-        self.GraphButton = QPushButton("Hide Graph")
-        self.GraphButton.clicked.connect(self.toggle_graph)
-        main_layout.addWidget(self.GraphButton, alignment=Qt.AlignBottom | Qt.AlignRight)
-        self.GraphButton.hide()
-
-        # Terminal view configuration
-        self.terminal_view = QTextEdit()
-        self.terminal_view.setReadOnly(True)
-        self.terminal_view.setStyleSheet("background-color: black; color: green;")
-        self.terminal_view.setPlaceholderText("Python instance terminal view...")
-        main_layout.addWidget(self.terminal_view)
-
-        # Side layout holds CPU info and file managers
-        self.side_layout = QVBoxLayout()
-
-        # CPU info widget
-        self.cpu_info_view = QTextEdit()
-        self.cpu_info_view.setReadOnly(True)
-        self.cpu_info_view.setStyleSheet("background-color: lightgray; color: black;")
-        self.cpu_info_view.setFixedHeight(50)
-        self.cpu_info_view.setText(f"Number of CPUs: {os.cpu_count()}")
-        self.side_layout.addWidget(self.cpu_info_view)
-
-        # File management widgets
-        self.FeatureFiles = FileManagerWidget("Feature Scripts", self.terminal_view)
-        self.side_layout.addWidget(self.FeatureFiles)
-        self.CleaningFiles = FileManagerWidget("Cleaning Scripts", self.terminal_view)
-        self.side_layout.addWidget(self.CleaningFiles)
-        self.RoutingFiles = FileManagerWidget("Routing Scripts", self.terminal_view)
-        self.side_layout.addWidget(self.RoutingFiles)
-
-        main_layout.addLayout(self.side_layout)
-
-        # Swap button to toggle visibility of UI components
-        self.swap_button = QPushButton("Begin")
-        self.swap_button.clicked.connect(self.SwapStage3)
-        self.side_layout.addWidget(self.swap_button)
-
-        # A dedicated button to initiate process management
-        self.process_button = QPushButton("Start Processing")
-        self.process_button.clicked.connect(self.start_processing)
-        self.side_layout.addWidget(self.process_button)
-
-        # Set the main container widget for the window
-        container = QWidget()
-        container.setLayout(main_layout)
-        self.setCentralWidget(container)
-
-    def SwapStage2(self):
-        """Toggle visibility for side widgets while ensuring the graph remains visible."""
-        self.graph_widget.show()
-        self.GraphButton.show()
-        for i in range(self.side_layout.count()):
-            widget = self.side_layout.itemAt(i).widget()
-            if widget:
-                widget.setVisible(not widget.isVisible())
-        print(self.FeatureFiles.file_functions)
-
-    def SwapStage3(self):
-        """Toggle visibility for side widgets while ensuring the graph remains visible."""
-        self.graph_widget.show()
-        self.GraphButton.show()
-        for i in range(self.side_layout.count()):
-            widget = self.side_layout.itemAt(i).widget()
-            if widget:
-                widget.setVisible(not widget.isVisible())
-        print(self.FeatureFiles.file_functions)
-
-    def toggle_graph(self):
-        """
-        Check the current visibility of the graph widget and toggle it.
-        Updates the GraphButton text accordingly.
-        """
-        if self.graph_widget.isVisible():
-            self.graph_widget.hide()
-            self.GraphButton.setText("Show Graph")
-        else:
-            self.graph_widget.show()
-            self.GraphButton.setText("Hide Graph")
-
-    def start_processing(self):
-        """
-        Trigger the process management.
-        This delegates the process manipulation to the ProcessingManeger,
-        keeping the main window logic as lean as possible.
-        """
-        self.processing_manager.run_processes()
-
-
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = WindowManager()
-    window.show()
+import os
+import ast
+import sys
+import time
+import queue
+import numpy as np
+import random
+import multiprocessing
+import matplotlib.pyplot as plt
+
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
+    QWidget, QTextEdit, QPushButton, QMessageBox, QLabel, QListWidget, QFileDialog
+)
+from PyQt5.QtCore import Qt, QTimer, QThread
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from M_UIv2_Supp import (UniqueFunctionProcessor, Echo, ChunkQueue, FileManagerWidget, DynamicGraphWidget,
+                          PipelineSupervisor, Stage, StageSupervisor, ScalingGroup, core_layout)
+
+
+class ProcessingManeger:
+    """
+    This class encapsulates all process-related operations.
+    It uses shared resources (a shared-memory ChunkQueue) to set up and run processes,
+    and it takes care of cleaning up in case of errors or interrupts. The processes run
+    under a StageSupervisor: one that crashes or stops beating its heartbeat is
+    restarted against the same queue while the others keep running.
+
+    The processors form a ScalingGroup sized from the cores left after `reserve` cores
+    for ingest and the UI: one runs while the queue keeps draining, and more are added
+    (up to the core budget) while chunks pile up.
+
+    On Linux every process is placed at spawn by the layout of [M][Supp]Core_Layout.py:
+    Echo (the ingest side) on a reserved core, the processors niced on the rest.
+
+    Args:
+        reserve (int): Cores kept free for ingest and the UI.
+        ingest_fifo (int or None): SCHED_FIFO priority for Echo (needs CAP_SYS_NICE).
+    """
+    def __init__(self, reserve=core_layout.DEFAULT_RESERVE, ingest_fifo=None):
+        self.reserve = reserve
+        self.layout = core_layout.plan_layout(reserve, ingest_fifo=ingest_fifo)
+        self.supervisor = None
+        self.chunk_queue = None
+        self.result_queue = None
+        self.stop_event = None
+        print("ProcessingManeger initialized")
+
+    def setup_processes(self):
+        """Set up shared resources and instantiate your processes."""
+        # Shared-memory chunk queue for inter-process communication
+        self.chunk_queue = ChunkQueue.create(slots=10, max_rows=3)
+        self.result_queue = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+
+        self.supervisor = StageSupervisor(stop_event=self.stop_event)
+        # The processors mark the claim lock while they hold it; the supervisor frees it if they die
+        self.supervisor.register_lock("chunk claim", self.chunk_queue.sync.claim_lock)
+        # A processor or Echo killed mid-chunk leaves its slot claimed; the supervisor steps past it
+        self.supervisor.register_repair("chunk queue slots", self.chunk_queue.repair)
+
+        # Stages built from classes imported from M_UIv2_Supp; each is instantiated inside
+        # its own process. Whichever processor is idle takes the next chunk, and the group
+        # grows while the queue stays more than half full.
+        def processor(process_id):
+            return Stage(f"Processor {process_id}", UniqueFunctionProcessor,
+                         kwargs=dict(process_id=process_id, chunk_queue=self.chunk_queue,
+                                     result_queue=self.result_queue, stop_event=self.stop_event),
+                         placement=self.layout["worker"])
+        self.supervisor.add_group(ScalingGroup(
+            "Processors", processor, load=lambda: self.chunk_queue.qsize() / self.chunk_queue.slots,
+            maximum=core_layout.worker_budget(self.reserve)))
+        self.supervisor.add(Stage("Echo", Echo, kwargs=dict(chunk_queue=self.chunk_queue, stop_event=self.stop_event),
+                                  placement=self.layout["ingest"]))
+        print(f"ProcessingManeger: {core_layout.describe(self.reserve)}")
+        for line in core_layout.describe_layout(self.layout):
+            print(f"ProcessingManeger: {line}")
+
+    @property
+    def processes(self):
+        """The current process of every stage (a restarted stage has a new one)."""
+        return self.supervisor.processes if self.supervisor is not None else []
+
+    def start_processes(self):
+        """Set up the shared resources and start every process without waiting for them."""
+        self.setup_processes()
+        self.supervisor.start()
+
+    def stop_processes(self, timeout=5):
+        """
+        Signal the processes to finish, terminate stragglers and free the shared queue.
+
+        A process cannot exit while results it put on result_queue are unread, so the
+        queue is drained while waiting. Returns the results collected meanwhile.
+        """
+        remaining = []
+        if self.stop_event is not None:
+            self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        while any(process.is_alive() for process in self.processes) and time.monotonic() < deadline:
+            try:
+                remaining.append(self.result_queue.get(timeout=0.05))
+            except queue.Empty:
+                pass
+        self.cleanup_processes()
+        if self.chunk_queue is not None:
+            self.chunk_queue.close()
+            self.chunk_queue = None
+        return remaining
+
+    def run_processes(self):
+        """
+        Start all processes, handling errors independently of the UI.
+        This blocks until stop_event is set; the window runs them through a
+        PipelineSupervisor instead.
+        """
+        self.setup_processes()
+        try:
+            # Start each process
+            self.supervisor.start()
+
+            # Run until stopped; processes that fail meanwhile are restarted
+            self.stop_event.wait()
+
+        except KeyboardInterrupt:
+            print("\nKeyboardInterrupt detected! Cleaning up processes...")
+            self.cleanup_processes()
+
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+            self.cleanup_processes()
+
+        finally:
+            # Show the final state of the shared queue
+            self.stop_event.set()
+            print("Chunks left in queue:", self.chunk_queue.qsize())
+
+        # Process any remaining results
+        while not self.result_queue.empty():
+            process_id, result = self.result_queue.get()
+            print(f"Result from Process {process_id}: {result}")
+
+        self.chunk_queue.close()
+        print("Processing completed gracefully.")
+
+    def cleanup_processes(self):
+        """
+        Terminates all running processes and ensures proper cleanup.
+        This helps keep your main window safe from process termination glitches.
+        """
+        print("\nInitiating cleanup of processes...")
+        if self.supervisor is None:
+            return
+        # No restarts from here on
+        self.supervisor.halt()
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.supervisor.close()
+        print("All processes have been terminated successfully.")
+        
+    @staticmethod
+    def check_process_running(process_name):
+        """
+        Check if a process with the given name is running.
+        Useful for verifying that no rogue processes are still active.
+        """
+        import psutil
+        for proc in psutil.process_iter(attrs=["name"]):
+            if proc.info["name"].lower() == process_name.lower():
+                return True
+        return False
+
+
+class Support:
+    """
+    A helper class that provides utilitarian functions used throughout
+    the application. This can include logging, configuration reading, and
+    other miscellaneous tasks.
+    """
+    def __init__(self):
+        self.log_file = "support_log.txt"
+        self.log("Support initialized.", level="DEBUG")
+
+    def log(self, message, level="INFO"):
+        """
+        Logs a message with a timestamp and a severity level.
+        This can help you trace errors or events later on.
+        """
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        log_message = f"[{timestamp}] [{level}] {message}"
+        with open(self.log_file, "a") as log_file:
+            log_file.write(log_message + "\n")
+        print(log_message)
+
+    @staticmethod
+    def read_config(file_path):
+        """
+        Reads and parses a configuration file.
+        Supports files containing a dictionary literal.
+        """
+        if not os.path.exists(file_path):
+            print(f"Configuration file {file_path} not found.")
+            return None
+        try:
+            with open(file_path, 'r') as f:
+                data = f.read()
+                config = ast.literal_eval(data)
+            return config
+        except Exception as e:
+            print(f"Error reading configuration: {e}")
+            return None
+
+
+class WindowManager(QMainWindow):
+    """
+    The main window class handles UI elements.
+    All process manipulation has been offloaded to the ProcessingManeger,
+    so issues arising in the main UI are less likely to disrupt critical backend functionality.
+    """
+    def __init__(self):
+        super().__init__()
+
+        # Main window settings
+        self.setWindowTitle("Realtime Feature Exstraction Manager")
+        self.resize(1000, 400)
+        # Create an instance of the processing manager; it runs under a supervisor thread
+        self.processing_manager = ProcessingManeger()
+        self.supervisor = None
+        self.supervisor_thread = None
+        # Main layout container
+        main_layout = QHBoxLayout()
+
+        # Layout for the main window's content
+        self.layout = QVBoxLayout(self)
+
+        # Initialize the dynamic graph widget (hidden by default)
+        self.graph_widget = DynamicGraphWidget()
+        main_layout.addWidget(self.graph_widget)
+        self.graph_widget.hide()
+
+        # Button to toggle dynamic graph visibility
+        self.GraphButton = QPushButton("Hide Graph")
+        self.GraphButton.clicked.connect(self.toggle_graph)
+        main_layout.addWidget(self.GraphButton, alignment=Qt.AlignBottom | Qt.AlignRight)
+        self.GraphButton.hide()
+
+        # Terminal view configuration
+        self.terminal_view = QTextEdit()
+        self.terminal_view.setReadOnly(True)
+        self.terminal_view.setStyleSheet("background-color: black; color: green;")
+        self.terminal_view.setPlaceholderText("Python instance terminal view...")
+        main_layout.addWidget(self.terminal_view)
+
+        # Side layout holds CPU info and file managers
+        self.side_layout = QVBoxLayout()
+
+        # CPU info widget
+        self.cpu_info_view = QTextEdit()
+        self.cpu_info_view.setReadOnly(True)
+        self.cpu_info_view.setStyleSheet("background-color: lightgray; color: black;")
+        self.cpu_info_view.setFixedHeight(50)
+        self.cpu_info_view.setText(f"Number of CPUs: {os.cpu_count()}\n"
+                                   f"{core_layout.describe(self.processing_manager.reserve)}")
+        self.side_layout.addWidget(self.cpu_info_view)
+
+        # Keep the UI on its reserved cores; the processes get their own placement at spawn
+        self.terminal_view.append(
+            f"[Layout] UI (pid {os.getpid()}): {self.processing_manager.layout['ui'].apply()}")
+        for line in core_layout.describe_layout(self.processing_manager.layout):
+            self.terminal_view.append(f"[Layout] {line}")
+
+        # File management widgets
+        self.FeatureFiles = FileManagerWidget("Feature Scripts", self.terminal_view)
+        self.side_layout.addWidget(self.FeatureFiles)
+        self.CleaningFiles = FileManagerWidget("Cleaning Scripts", self.terminal_view)
+        self.side_layout.addWidget(self.CleaningFiles)
+        self.RoutingFiles = FileManagerWidget("Routing Scripts", self.terminal_view)
+        self.side_layout.addWidget(self.RoutingFiles)
+
+        main_layout.addLayout(self.side_layout)
+
+        # Swap button to toggle visibility of UI components
+        self.swap_button = QPushButton("Begin")
+        self.swap_button.clicked.connect(self.SwapStage3)
+        self.side_layout.addWidget(self.swap_button)
+
+        # A dedicated button to initiate process management
+        self.process_button = QPushButton("Start Processing")
+        self.process_button.clicked.connect(self.start_processing)
+        self.side_layout.addWidget(self.process_button)
+
+        # Set the main container widget for the window
+        container = QWidget()
+        container.setLayout(main_layout)
+        self.setCentralWidget(container)
+
+    def SwapStage2(self):
+        """Toggle visibility for side widgets while ensuring the graph remains visible."""
+        self.graph_widget.show()
+        self.GraphButton.show()
+        for i in range(self.side_layout.count()):
+            widget = self.side_layout.itemAt(i).widget()
+            if widget:
+                widget.setVisible(not widget.isVisible())
+        print(self.FeatureFiles.file_functions)
+
+    def SwapStage3(self):
+        """Toggle visibility for side widgets while ensuring the graph remains visible."""
+        self.graph_widget.show()
+        self.GraphButton.show()
+        for i in range(self.side_layout.count()):
+            widget = self.side_layout.itemAt(i).widget()
+            if widget:
+                widget.setVisible(not widget.isVisible())
+        print(self.FeatureFiles.file_functions)
+
+    def toggle_graph(self):
+        """
+        Check the current visibility of the graph widget and toggle it.
+        Updates the GraphButton text accordingly.
+        """
+        if self.graph_widget.isVisible():
+            self.graph_widget.hide()
+            self.GraphButton.setText("Show Graph")
+        else:
+            self.graph_widget.show()
+            self.GraphButton.setText("Hide Graph")
+
+    def start_processing(self):
+        """
+        Start or stop the process management.
+        The ProcessingManeger is driven by a PipelineSupervisor in its own QThread, so
+        the window keeps handling events while the processes run; the supervisor
+        reports back through signals at a bounded rate.
+        """
+        if self.supervisor is not None:
+            self.process_button.setEnabled(False)
+            self.supervisor.stop()
+            return
+        self.supervisor_thread = QThread(self)
+        self.supervisor = PipelineSupervisor(self.processing_manager)
+        self.supervisor.moveToThread(self.supervisor_thread)
+        self.supervisor_thread.started.connect(self.supervisor.run)
+        self.supervisor.status.connect(self.terminal_view.append)
+        self.supervisor.throughput.connect(self.show_throughput)
+        self.supervisor.results.connect(self.show_results)
+        self.supervisor.finished.connect(self.supervisor_thread.quit)
+        self.supervisor_thread.finished.connect(self.processing_finished)
+        self.supervisor_thread.start()
+        self.process_button.setText("Stop Processing")
+
+    def show_throughput(self, stats):
+        """Show the supervisor's throughput report in the CPU info box."""
+        depth = stats["queue_depth"]
+        self.cpu_info_view.setText(
+            f"Number of CPUs: {os.cpu_count()} "
+            f"(up to {core_layout.worker_budget(self.processing_manager.reserve)} workers)\n"
+            f"Processes alive: {stats['alive']}  Results/s: {stats['results_per_s']:.1f}"
+            + (f"  Queue depth: {depth}" if depth is not None else ""))
+
+    def show_results(self, results):
+        """Append the newest results to the terminal view."""
+        for process_id, result in results:
+            self.terminal_view.append(f"[Result] Process {process_id}: {result}")
+
+    def processing_finished(self):
+        """Supervisor thread ended: reset the controls."""
+        self.supervisor.deleteLater()
+        self.supervisor_thread.deleteLater()
+        self.supervisor = None
+        self.supervisor_thread = None
+        self.process_button.setText("Start Processing")
+        self.process_button.setEnabled(True)
+
+    def closeEvent(self, event):
+        """Stop the pipeline before the window closes."""
+        if self.supervisor is not None:
+            self.supervisor.stop()
+            self.supervisor_thread.wait(10000)
+        super().closeEvent(event)
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = WindowManager()
+    window.show()
     sys.exit(app.exec_())
\ No newline at end of file
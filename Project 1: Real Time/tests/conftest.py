@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Project files are loaded by path through M_Supp_Loader, which lives in "Version 1.0"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Version 1.0"))
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from M_Supp_Loader import load_project_module
+
+chunk_queue = load_project_module("[M][Supp]Chunk_Queue.py")
+
+context = mp.get_context("fork")
+
+
+@pytest.fixture(autouse=True)
+def short_stall(monkeypatch):
+    # Check a late turn's claimant after 50 ms instead of a second
+    monkeypatch.setattr(chunk_queue, "STALL", 0.05)
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(slots, max_rows=4, n_channels=1):
+        queue = chunk_queue.ChunkQueue.create(slots, max_rows, n_channels, context=context)
+        queues.append(queue)
+        return queue
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def produce(queue, producer, count):
+    for index in range(count):
+        queue.put(np.full((index % 4 + 1, 2), index), tag=producer)
+
+
+def consume(queue, results, stop):
+    while not stop.is_set():
+        item = queue.get(timeout=0.1)
+        if item is not None:
+            chunk, tag = item
+            results.put((tag, int(chunk[0, 0]), len(chunk)))
+
+
+def claim_and_die(queue, counter):
+    """Claim the next write (ENQUEUE) or read (DEQUEUE) position and die holding it."""
+    if counter == chunk_queue.ENQUEUE:
+        queue.sync.free.acquire()
+        queue._claim(counter, chunk_queue.PRODUCER_CLAIM)
+    else:
+        queue.sync.filled.acquire()
+        queue._claim(counter, chunk_queue.CONSUMER_CLAIM)
+    os._exit(0)
+
+
+def kill_mid_turn(queue, counter):
+    process = context.Process(target=claim_and_die, args=(queue, counter))
+    process.start()
+    process.join()
+
+
+def values(queue, count):
+    return [int(queue.get(timeout=5)[0][0, 0]) for _ in range(count)]
+
+
+def test_single_producer_keeps_order_and_tags(make_queue):
+    queue = make_queue(3, max_rows=5, n_channels=2)
+    for index in range(3):
+        assert queue.put(np.full((index + 1, 2), index), tag=10 + index)
+    assert not queue.put(np.zeros((1, 2)), timeout=0.05)  # full
+    for index in range(3):
+        chunk, tag = queue.get()
+        assert tag == 10 + index
+        np.testing.assert_array_equal(chunk, np.full((index + 1, 2), index))
+    assert queue.get(timeout=0.05) is None
+
+
+def test_consumers_share_every_chunk_exactly_once(make_queue):
+    queue = make_queue(4, n_channels=2)
+    results, stop = context.Queue(), context.Event()
+    producers = [context.Process(target=produce, args=(queue, producer, 200)) for producer in range(3)]
+    consumers = [context.Process(target=consume, args=(queue, results, stop)) for _ in range(3)]
+    for process in producers + consumers:
+        process.start()
+    received = [results.get(timeout=10) for _ in range(600)]
+    stop.set()
+    for process in producers + consumers:
+        process.join(timeout=5)
+
+    assert sorted(received) == sorted((producer, index, index % 4 + 1)
+                                      for producer in range(3) for index in range(200))
+    assert queue.qsize() == 0
+
+
+def test_single_consumer_sees_each_producer_in_order(make_queue):
+    queue = make_queue(3, n_channels=2)
+    producers = [context.Process(target=produce, args=(queue, producer, 100)) for producer in range(3)]
+    for process in producers:
+        process.start()
+    received = {producer: [] for producer in range(3)}
+    for _ in range(300):
+        chunk, tag = queue.get(timeout=10)
+        received[tag].append(int(chunk[0, 0]))
+    for process in producers:
+        process.join(timeout=5)
+
+    assert all(indices == list(range(100)) for indices in received.values())
+
+
+def test_dead_producer_does_not_block_later_turns_of_its_slot(make_queue, monkeypatch):
+    # Long enough for position 3 to be claimed before the dead claimant is checked
+    monkeypatch.setattr(chunk_queue, "STALL", 0.5)
+    queue = make_queue(3)
+    kill_mid_turn(queue, chunk_queue.ENQUEUE)  # the producer of position 0 dies
+    assert queue.put([1.0], timeout=5) and queue.put([2.0], timeout=5)
+    first = []
+    waiting = threading.Thread(target=lambda: first.append(queue.get(timeout=5)))
+    waiting.start()  # claims position 0 and waits for the dead producer's turn
+    while queue.header[chunk_queue.DEQUEUE] < 1:
+        time.sleep(0.001)
+    assert values(queue, 1) == [1]
+    # Position 3 is on the dead producer's slot; its claim must not hide the dead one
+    assert queue.put([3.0], timeout=5)
+    waiting.join()
+    assert int(first[0][0][0, 0]) == 2
+    assert values(queue, 1) == [3]
+
+    # More traffic than slots, with the producer and consumer running concurrently
+    kill_mid_turn(queue, chunk_queue.ENQUEUE)
+    producer = threading.Thread(target=lambda: [queue.put([float(v)], timeout=5) for v in range(10, 20)])
+    producer.start()
+    assert values(queue, 10) == list(range(10, 20))
+    producer.join()
+    assert queue.header[chunk_queue.ENQUEUE] == queue.header[chunk_queue.DEQUEUE] == 15
+
+
+def test_dead_consumer_hands_its_slot_back(make_queue):
+    queue = make_queue(3)
+    queue.put([0.0])
+    kill_mid_turn(queue, chunk_queue.DEQUEUE)  # chunk 0 is lost with it
+    producer = threading.Thread(target=lambda: [queue.put([float(v)], timeout=5) for v in range(1, 11)])
+    producer.start()
+    assert values(queue, 10) == list(range(1, 11))
+    producer.join()
+    assert queue.get(timeout=0.2) is None
+
+
+def test_put_that_times_out_waiting_for_its_turn_gives_the_claim_up(make_queue):
+    queue = make_queue(2)
+    queue.put([0.0])
+    queue.put([1.0])
+    # A live consumer holds position 0 without handing its slot back
+    queue.sync.filled.acquire()
+    held = queue._claim(chunk_queue.DEQUEUE, chunk_queue.CONSUMER_CLAIM)
+    assert values(queue, 1) == [1]
+    # Position 2 is on the held slot: the put gives up instead of hanging
+    assert not queue.put([2.0], timeout=0.2)
+
+    # The consumer finishes; the given-up turn is stepped past and later chunks flow
+    queue.descriptors[held % queue.slots, chunk_queue.SEQUENCE] = held + queue.slots
+    queue.sync.free.release()
+    assert queue.put([3.0], timeout=5)
+    assert values(queue, 1) == [3]
+
+
+def test_fewer_than_two_slots_is_rejected():
+    with pytest.raises(ValueError):
+        chunk_queue.ChunkQueue.create(1, 4)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from M_Supp_Loader import load_project_module
+
+ecg_stream = load_project_module("[M][Feat]ECG_Stream.py")
+
+
+@pytest.mark.parametrize("capacity", [2, 3, 50])
+def test_rr_indices_match_the_window(capacity):
+    rng = np.random.default_rng(capacity)
+    intervals = 800 + rng.normal(size=400) * 60
+    rr = ecg_stream.RRIntervals(capacity)
+    for count, interval in enumerate(intervals, start=1):
+        rr.append(interval)
+        window = intervals[max(0, count - capacity):count]
+        diffs = np.diff(window)
+        assert len(rr) == len(window)
+        np.testing.assert_allclose(rr.mean_nn, window.mean(), rtol=1e-12)
+        if len(window) < 2:
+            assert np.isnan(rr.sdnn) and np.isnan(rr.rmssd) and np.isnan(rr.pnn50)
+            continue
+        np.testing.assert_allclose(rr.sdnn, np.std(window, ddof=1), rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(rr.rmssd, np.sqrt(np.mean(diffs ** 2)), rtol=1e-6)
+        np.testing.assert_allclose(rr.pnn50, 100 * np.sum(np.abs(diffs) > 50) / len(window))
+
+
+@pytest.mark.parametrize("capacity", [0, 1])
+def test_rr_capacity_below_two_is_rejected(capacity):
+    with pytest.raises(ValueError):
+        ecg_stream.RRIntervals(capacity)
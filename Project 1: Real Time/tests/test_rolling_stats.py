@@ -0,0 +1,60 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from M_Supp_Loader import load_project_module
+
+rolling_stats = load_project_module("[M][Supp]Rolling_Stats.py")
+
+
+def random_chunks(rng, samples, max_chunk):
+    """Split samples into chunks of random length, including empty ones."""
+    start = 0
+    while start < len(samples):
+        size = int(rng.integers(0, max_chunk + 1))
+        yield samples[start:start + size]
+        start += size
+
+
+def expected(window_samples):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN channels
+        return {"valid_count": np.sum(~np.isnan(window_samples), axis=0),
+                "sum": np.nansum(window_samples, axis=0),
+                "mean": np.nanmean(window_samples, axis=0),
+                "var": np.nanvar(window_samples, axis=0),
+                "min": np.nanmin(window_samples, axis=0),
+                "max": np.nanmax(window_samples, axis=0)}
+
+
+@pytest.mark.parametrize("window, max_chunk", [(50, 7), (50, 80), (200, 45)])
+def test_matches_numpy_nan_functions_on_random_chunking(window, max_chunk):
+    rng = np.random.default_rng(window + max_chunk)
+    samples = 1000 + rng.normal(size=(3000, 3)) * [1, 100, 0.01]
+    samples[rng.random(samples.shape) < 0.1] = np.nan
+    samples[1000:1400, 2] = np.nan  # a channel with no valid sample for a whole window
+    stats = rolling_stats.RollingStats(window, 3, resync_every=37)
+
+    seen = 0
+    for chunk in random_chunks(rng, samples, max_chunk):
+        stats.update(chunk)
+        seen += len(chunk)
+        window_samples = samples[max(0, seen - window):seen]
+        if not len(window_samples):
+            continue
+        summary = stats.summary()
+        assert summary["count"] == len(window_samples)
+        for name, value in expected(window_samples).items():
+            np.testing.assert_allclose(summary[name], value, rtol=1e-9, atol=1e-9, err_msg=name)
+    assert seen == len(samples)
+
+
+def test_without_resync_drift_stays_small():
+    rng = np.random.default_rng(1)
+    samples = 5 + rng.normal(size=(50000, 1))
+    stats = rolling_stats.RollingStats(500, 1, resync_every=0)
+    for chunk in random_chunks(rng, samples, 30):
+        stats.update(chunk)
+    np.testing.assert_allclose(stats.mean, samples[-500:].mean(axis=0), rtol=1e-9)
+    np.testing.assert_allclose(stats.var, samples[-500:].var(axis=0), rtol=1e-6)
@@ -0,0 +1,192 @@
+import time
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from M_Supp_Loader import load_project_module
+
+shared_ring = load_project_module("[M][Supp]Shared_Ring.py")
+
+LAYOUTS = [shared_ring.LAYOUT_ROW_MAJOR, shared_ring.LAYOUT_CHANNEL_MAJOR]
+
+
+@pytest.fixture
+def make_ring():
+    rings = []
+
+    def make(capacity, n_channels=2, **kwargs):
+        ring = shared_ring.SharedRing.create(capacity, n_channels, **kwargs)
+        rings.append(ring)
+        return ring
+    yield make
+    for ring in rings:
+        ring.close()
+
+
+def stream(first, end, n_channels=2):
+    """Samples [first, end) of a stream whose sample k holds k + channel / 10."""
+    return np.arange(first, end)[:, None] + np.arange(n_channels)[None, :] / 10
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_writes_wrap_around_the_end(make_ring, layout):
+    ring = make_ring(10, layout=layout)
+    written = 0
+    for size in (3, 4, 6, 1, 9, 7):  # wraps several times, with writes straddling the end
+        ring.write(stream(written, written + size))
+        written += size
+        samples, first_seq, end_seq = ring.read_latest()
+        assert (first_seq, end_seq) == (max(0, written - 10), written)
+        np.testing.assert_array_equal(samples, stream(first_seq, end_seq))
+    np.testing.assert_array_equal(ring.latest(4), stream(written - 4, written))
+
+
+def test_write_larger_than_the_ring_keeps_the_newest(make_ring):
+    ring = make_ring(8)
+    ring.write(stream(0, 3))
+    ring.write(stream(3, 23))
+    samples, first_seq, end_seq = ring.read_latest()
+    assert (first_seq, end_seq) == (15, 23)
+    np.testing.assert_array_equal(samples, stream(15, 23))
+
+
+def test_latest_pads_until_the_ring_fills(make_ring):
+    ring = make_ring(6)
+    ring.write(stream(0, 2))
+    np.testing.assert_array_equal(ring.latest(), np.vstack([np.zeros((4, 2)), stream(0, 2)]))
+
+
+def test_channel_major_channels_are_contiguous(make_ring):
+    ring = make_ring(5, 3, channel_names=["ECG", "EDA", "RSP"], layout=shared_ring.LAYOUT_CHANNEL_MAJOR)
+    ring.write(stream(0, 5, 3))
+    eda = ring.channels[ring.channel_index("EDA")]
+    assert eda.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(eda, np.arange(5) + 0.1)
+
+    attached = shared_ring.SharedRing.attach(ring.name)
+    try:
+        assert attached.channel_names == ["ECG", "EDA", "RSP"]
+        assert attached.layout == shared_ring.LAYOUT_CHANNEL_MAJOR
+        np.testing.assert_array_equal(attached.read_latest()[0], stream(0, 5, 3))
+    finally:
+        attached.close()
+
+
+def test_read_during_an_unfinished_write_is_torn(make_ring):
+    ring = make_ring(4)
+    ring.write(stream(0, 4))
+    # The writer has claimed the next two slots but not published them yet
+    ring.header[shared_ring.WRITE_CLAIM] = 6
+    with pytest.raises(shared_ring.TornReadError):
+        ring.read_latest(retries=3)
+    assert ring.read_latest(2, retries=3)[1:] == (2, 4)
+
+
+def test_reader_gets_every_sample_once_across_wraps(make_ring):
+    ring = make_ring(10)
+    reader = ring.reader()
+    received = []
+    written = 0
+    for size in (3, 7, 5, 9, 2, 10):
+        ring.write(stream(written, written + size))
+        written += size
+        samples, first_seq, end_seq = reader.read_new()
+        assert (first_seq, end_seq) == (written - size, written)
+        received.append(samples)
+    np.testing.assert_array_equal(np.vstack(received), stream(0, written))
+    assert reader.missed == 0
+    assert len(reader.read_new()[0]) == 0
+
+
+def test_reader_overrun_skips_to_the_oldest_intact_sample(make_ring):
+    ring = make_ring(8)
+    reader = ring.reader()
+    ring.write(stream(0, 5))
+    assert reader.read_new(max_samples=2)[1:] == (0, 2)
+    ring.write(stream(5, 20))  # samples 2..11 are overwritten before the reader gets to them
+    samples, first_seq, end_seq = reader.read_new()
+    assert (first_seq, end_seq) == (12, 20)
+    np.testing.assert_array_equal(samples, stream(12, 20))
+    assert reader.missed == 10
+
+    late = ring.reader(from_start=True)
+    assert late.cursor == 12 and late.available() == 8
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_views_split_at_the_end_and_detect_overwrites(make_ring, layout):
+    ring = make_ring(10, layout=layout)
+    reader = ring.reader()
+    ring.write(stream(0, 8))
+    reader.read_new()
+    ring.write(stream(8, 14))
+    segments, first_seq, end_seq = reader.view_new()
+    assert (first_seq, end_seq) == (8, 14) and len(segments) == 2
+    np.testing.assert_array_equal(np.vstack(segments), stream(8, 14))
+    rsp = reader.view_range(first_seq, end_seq, channel=1)
+    np.testing.assert_array_equal(np.concatenate(rsp), np.arange(8, 14) + 0.1)
+    assert reader.intact(first_seq)
+
+    ring.write(stream(14, 19))  # reuses the slots of samples 8 and 9
+    assert not reader.intact(first_seq)
+    segments, first_seq, end_seq = reader.view_new()
+    assert (first_seq, end_seq, reader.missed) == (14, 19, 0)
+    np.testing.assert_array_equal(np.vstack(segments), stream(14, 19))
+
+
+def write_stream(name, total):
+    ring = shared_ring.SharedRing.attach(name)
+    sizes = np.random.default_rng(0).integers(1, 40, total)
+    written = 0
+    for size in sizes:
+        size = min(int(size), total - written)
+        ring.write(stream(written, written + size))
+        written += size
+        if written == total:
+            break
+    ring.close()
+
+
+def test_concurrent_reader_copies_are_never_torn(make_ring):
+    total = 200000
+    ring = make_ring(64)
+    reader = ring.reader()
+    writer = mp.get_context("fork").Process(target=write_stream, args=(ring.name, total))
+    writer.start()
+    received = 0
+    while reader.cursor < total:
+        samples, first_seq, end_seq = reader.read_new()
+        np.testing.assert_array_equal(samples, stream(first_seq, end_seq))
+        received += len(samples)
+    writer.join()
+    assert received + reader.missed == total
+
+
+def wait_and_report(name, doorbell, woken):
+    ring = shared_ring.SharedRing.attach(name, doorbell=doorbell)
+    reader = ring.reader()
+    woken.put(reader.wait(timeout=0.05))  # nothing published yet
+    woken.put("waiting")
+    woken.put((reader.wait(timeout=10), time.monotonic()))
+    ring.close()
+
+
+def test_doorbell_wakes_a_waiting_reader_in_another_process(make_ring):
+    context = mp.get_context("fork")
+    doorbell = shared_ring.Doorbell(context)
+    ring = make_ring(16, doorbell=doorbell)
+    woken = context.Queue()
+    process = context.Process(target=wait_and_report, args=(ring.name, doorbell, woken))
+    process.start()
+    assert woken.get(timeout=5) is False
+    assert woken.get(timeout=5) == "waiting"
+    time.sleep(0.1)
+    published = time.monotonic()
+    ring.write(stream(0, 4))
+    available, wake_time = woken.get(timeout=5)
+    process.join(timeout=5)
+    assert available and wake_time - published < 1.0
+    # Nobody is waiting any more: ringing must not block or leave tokens behind
+    ring.write(stream(4, 8))
+    assert not doorbell._wake.acquire(timeout=0)
@@ -0,0 +1,103 @@
+import socket
+import threading
+
+import numpy as np
+
+from M_Supp_Loader import load_project_module
+
+protocol = load_project_module("[M][Com]Stream_Protocol.py")
+
+
+def serve(sender, header, samples, timeout=2.0):
+    """Sender side: negotiate, then send every sample in the agreed mode."""
+    mode = protocol.negotiate_stream_mode(sender, header, timeout=timeout)
+    if mode == protocol.MODE_BINARY:
+        sender.sendall(protocol.pack_frames(samples, 0, header))
+    else:
+        sender.sendall("".join(",".join(repr(float(v)) for v in row) + "\n" for row in samples).encode())
+    sender.close()
+    return mode
+
+
+def read_all(reader):
+    chunks = []
+    while True:
+        values = reader.read()
+        if values is None:
+            return np.concatenate(chunks) if chunks else np.empty((0, reader.n_channels))
+        chunks.append(values)
+
+
+def test_binary_round_trip():
+    samples = np.random.default_rng(0).standard_normal((5000, 3))
+    header = protocol.StreamHeader(3, 2000, channel_names=["ECG", "EDA", "RSP"])
+    client, sender = socket.socketpair()
+    thread = threading.Thread(target=serve, args=(sender, header, samples))
+    thread.start()
+    received, leftover = protocol.request_stream_mode(client)
+    reader = protocol.StreamReader(client, None, header=received, buffer_size=1000, initial=leftover)
+    values = read_all(reader)
+    thread.join()
+    client.close()
+
+    assert received.channel_names == ["ECG", "EDA", "RSP"]
+    assert received.sample_rate == 2000
+    np.testing.assert_array_equal(values, samples)
+    assert reader.frames_missed == 0
+
+
+def test_csv_fallback_for_legacy_client():
+    samples = np.round(np.random.default_rng(1).standard_normal((2000, 2)), 6)
+    header = protocol.StreamHeader(2, 2000)
+    client, sender = socket.socketpair()
+    result = {}
+    # A legacy client never sends a request, so the sender times out into CSV
+    thread = threading.Thread(target=lambda: result.update(mode=serve(sender, header, samples, 0.2)))
+    thread.start()
+    reader = protocol.StreamReader(client, 2, buffer_size=257)
+    values = read_all(reader)
+    thread.join()
+    client.close()
+
+    assert result["mode"] == protocol.MODE_CSV
+    np.testing.assert_array_equal(values, samples)
+    assert reader.rows_skipped == 0
+
+
+def test_binary_frames_with_sequence_gap_are_counted():
+    header = protocol.StreamHeader(1, 100, dtype=np.float32)
+    payload = protocol.pack_frames(np.arange(4.0), 0, header) + protocol.pack_frames(np.arange(3.0), 10, header)
+    client, sender = socket.socketpair()
+    sender.sendall(payload)
+    sender.close()
+    reader = protocol.StreamReader(client, None, header=header)
+    values = read_all(reader)
+    client.close()
+
+    assert len(values) == 7
+    assert reader.frames_missed == 6
+
+
+def test_misaligned_csv_rows_are_skipped_not_merged():
+    values, skipped = protocol.parse_csv_rows(b"1,2,3\n4\n", 2)
+    assert values.shape == (0, 2)
+    assert skipped == [b"1,2,3", b"4"]
+
+    values, skipped = protocol.parse_csv_rows(b"1,2\n3,4,5\n6\n7,8\n", 2)
+    np.testing.assert_array_equal(values, [[1, 2], [7, 8]])
+    assert skipped == [b"3,4,5", b"6"]
+
+
+def test_csv_rows_split_across_reads_are_reassembled():
+    client, sender = socket.socketpair()
+    reader = protocol.StreamReader(client, 2)
+    sender.sendall(b"1.5,2.5\n3.")
+    first = reader.read()
+    sender.sendall(b"5,4.5\n")
+    second = reader.read()
+    sender.close()
+    client.close()
+
+    np.testing.assert_array_equal(first, [[1.5, 2.5]])
+    np.testing.assert_array_equal(second, [[3.5, 4.5]])
+    assert reader.rows_skipped == 0